@@ -0,0 +1,344 @@
+import heapq
+import itertools
+from operator import itemgetter
+
+from change_events import AccountCreated, AccountDeleted, change_events
+from concurrency import ReadWriteLock, shard_index
+from email_index import EmailIndex
+from metrics import metrics
+from password_hashing import password_hasher
+from recipe_manager_cache import recipe_manager_cache
+from session_cache import session_cache
+from storage.data_access import in_memory_data_access
+
+DEFAULT_SHARDS = 16
+
+
+class AccountRegistry:
+    """
+    Holds every user account in the system, indexed by email address.
+
+    Accounts are stored in dictionaries keyed by the normalised (stripped and
+    lower-cased) email address, so looking up, adding and removing an account
+    costs O(1) regardless of how many accounts exist. Iteration yields the
+    accounts in the order they were added, so callers that used to loop over
+    the plain list keep working.
+
+    The registry is safe to use from many threads. Accounts are spread over
+    shards by a hash of their email, and each shard has its own reader-writer
+    lock: lookups and logins only take a shard's read lock, so they never wait
+    for each other, and adding or removing an account locks only the one shard
+    it belongs to. Password checks run outside any lock.
+
+    The emails are also kept in a sorted EmailIndex, behind a reader-writer
+    lock of its own, so administrators can page through the accounts in
+    email order from a cursor, filter them by prefix or domain, and read
+    counts without the registry materialising every account.
+
+    Accounts are written through to a storage backend as they are added and
+    removed. The default backend keeps nothing beyond the registry itself.
+
+    Attributes:
+        shards (list[dict[str, tuple[int, User]]]): The registered accounts keyed by
+        their normalised email address, each with the sequence number it was added under.
+        locks (list[ReadWriteLock]): The lock guarding each shard.
+        email_index (EmailIndex): Every normalised email in sorted order, with counts.
+        index_lock (ReadWriteLock): The lock guarding email_index.
+        storage (DataAccess): The backend accounts are persisted to.
+    """
+
+    def __init__(self, accounts=None, storage=None, shard_count=DEFAULT_SHARDS):
+        """
+        Initializes a new instance of AccountRegistry.
+
+        Args:
+            accounts (iterable[User], optional): Accounts to register straight away.
+             Defaults to None.
+            storage (DataAccess, optional): The storage backend. Defaults to the
+             in-memory backend.
+            shard_count (int, optional): How many shards to spread the accounts over.
+             Defaults to DEFAULT_SHARDS.
+        """
+        self.shards = [{} for _ in range(shard_count)]
+        self.locks = [ReadWriteLock() for _ in range(shard_count)]
+        self.sequence = itertools.count()
+        self.email_index = EmailIndex()
+        self.index_lock = ReadWriteLock()
+        self.storage = storage or in_memory_data_access
+        for account in accounts or ():
+            self.add(account)
+
+    def shard_of(self, key):
+        """
+        Returns the shard and lock responsible for a normalised email address.
+        """
+        index = shard_index(key, len(self.shards))
+        return self.shards[index], self.locks[index]
+
+    def attach_storage(self, storage, user_factory):
+        """
+        Switches the registry to a different storage backend. Accounts already
+        stored there replace any in-memory account with the same email, and
+        accounts only held in memory are written to it along with their recipes.
+
+        Args:
+            storage (DataAccess): The new storage backend.
+            user_factory (callable): Builds a User from the email, password hash,
+             admin flag and backend of a stored account, such as User.from_record.
+        """
+        for lock in self.locks:
+            lock.acquire_write()
+        try:
+            self.storage = storage
+            stored = {}
+            for email, password_hash, is_admin in storage.load_accounts():
+                stored[self.normalise_email(email)] = user_factory(email, password_hash, is_admin, storage)
+            for _, account in heapq.merge(*(shard.values() for shard in self.shards), key=itemgetter(0)):
+                key = self.normalise_email(account.email)
+                if key not in stored:
+                    storage.save_account(account.email, account.password_hash, account.is_admin)
+                    account.attach_storage(storage)
+                    stored[key] = account
+            for shard in self.shards:
+                shard.clear()
+            with self.index_lock.write_locked():
+                self.email_index = EmailIndex()
+                for key, account in stored.items():
+                    self.shard_of(key)[0][key] = (next(self.sequence), account)
+                    self.email_index.add(key, account.is_admin)
+        finally:
+            for lock in self.locks:
+                lock.release_write()
+
+    def flush(self):
+        """
+        Makes any buffered writes to the storage backend durable.
+        """
+        recipe_manager_cache.flush()
+        self.storage.flush()
+
+    @staticmethod
+    def normalise_email(email):
+        """
+        Normalises an email address so lookups are case-insensitive.
+
+        Args:
+            email (str): The email address to normalise.
+
+        Returns:
+            str: The stripped, lower-cased email address.
+        """
+        return email.strip().lower()
+
+    @metrics.timed("account.add")
+    def add(self, account):
+        """
+        Registers a new account.
+
+        Args:
+            account (User): The account to register.
+
+        Returns:
+            bool: True if the account was added, False if the email is already taken.
+        """
+        key = self.normalise_email(account.email)
+        shard, lock = self.shard_of(key)
+        with lock.write_locked():
+            if key in shard:
+                return False
+            shard[key] = (next(self.sequence), account)
+            with self.index_lock.write_locked():
+                self.email_index.add(key, account.is_admin)
+            self.storage.save_account(account.email, account.password_hash, account.is_admin)
+            change_events.publish(AccountCreated(account.email, account.is_admin))
+        change_events.deliver()
+        return True
+
+    def append(self, account):
+        """
+        Registers a new account, mirroring list.append for existing callers.
+
+        Args:
+            account (User): The account to register.
+        """
+        self.add(account)
+
+    def get(self, email):
+        """
+        Looks up an account by email address.
+
+        Args:
+            email (str): The email address of the account.
+
+        Returns:
+            User: The matching account, or None if there is none.
+        """
+        key = self.normalise_email(email)
+        shard, lock = self.shard_of(key)
+        with lock.read_locked():
+            entry = shard.get(key)
+        return entry[1] if entry is not None else None
+
+    @metrics.timed("account.authenticate")
+    def authenticate(self, email, password):
+        """
+        Looks up an account by email address and checks its password. A
+        password hash made by an older scheme is replaced on a successful login.
+        The new hash is computed without any lock held and stored under the
+        shard's write lock, and only if the account is still registered and
+        its hash has not been changed meanwhile.
+
+        Args:
+            email (str): The email address entered by the user.
+            password (str): The password entered by the user.
+
+        Returns:
+            User: The matching account if the credentials are correct, otherwise None.
+        """
+        account = self.get(email)
+        if account is None or not account.check_password(password):
+            return None
+        legacy_hash = account.password_hash
+        if password_hasher.needs_rehash(legacy_hash):
+            new_hash = account.hash_password(password)
+            key = self.normalise_email(account.email)
+            shard, lock = self.shard_of(key)
+            with lock.write_locked():
+                entry = shard.get(key)
+                if entry is not None and entry[1] is account and account.password_hash == legacy_hash:
+                    account.password_hash = new_hash
+                    self.storage.save_account(account.email, account.password_hash, account.is_admin)
+        return account
+
+    @metrics.timed("account.remove")
+    def remove(self, account):
+        """
+        Removes an account from the registry and ends its sessions.
+
+        Args:
+            account (User): The account to remove.
+
+        Raises:
+            ValueError: If the account is not registered.
+        """
+        key = self.normalise_email(account.email)
+        shard, lock = self.shard_of(key)
+        with lock.write_locked():
+            entry = shard.get(key)
+            if entry is None or entry[1] is not account:
+                raise ValueError(f"Account {account.email} is not registered.")
+            del shard[key]
+            with self.index_lock.write_locked():
+                self.email_index.remove(key, account.is_admin)
+            self.storage.delete_account(account.email)
+            recipe_manager_cache.discard(account.email)
+            session_cache.invalidate_user(account.email)
+            change_events.publish(AccountDeleted(account.email, account.is_admin))
+        account.discard_recipes()
+        change_events.deliver()
+
+    @metrics.timed("account.remove_email")
+    def remove_email(self, email):
+        """
+        Removes the account registered under the given email address and ends its sessions.
+
+        Args:
+            email (str): The email address of the account to remove.
+
+        Returns:
+            User: The removed account, or None if no account matched.
+        """
+        key = self.normalise_email(email)
+        shard, lock = self.shard_of(key)
+        with lock.write_locked():
+            entry = shard.pop(key, None)
+            if entry is None:
+                return None
+            with self.index_lock.write_locked():
+                self.email_index.remove(key, entry[1].is_admin)
+            self.storage.delete_account(entry[1].email)
+            recipe_manager_cache.discard(entry[1].email)
+            session_cache.invalidate_user(entry[1].email)
+            change_events.publish(AccountDeleted(entry[1].email, entry[1].is_admin))
+        entry[1].discard_recipes()
+        change_events.deliver()
+        return entry[1]
+
+    @metrics.timed("account.page")
+    def page(self, after=None, limit=20, prefix="", domain=None, exclude=None):
+        """
+        Returns one page of accounts in email order.
+
+        Args:
+            after (str, optional): A cursor: start after the account with this email,
+             usually the last one of the previous page. Defaults to the start.
+            limit (int, optional): The most accounts to return. Defaults to 20.
+            prefix (str, optional): Only return accounts whose email starts with this.
+            domain (str, optional): Only return accounts of this email domain.
+            exclude (str, optional): The email of an account to leave out, such as the
+             logged-in administrator's.
+
+        Returns:
+            list[User]: The page of accounts.
+        """
+        after = self.normalise_email(after) if after is not None else None
+        exclude = self.normalise_email(exclude) if exclude is not None else None
+        domain = self.normalise_email(domain) if domain is not None else None
+        with self.index_lock.read_locked():
+            keys = list(itertools.islice((key for key in self.email_index.iter_from(
+                after, self.normalise_email(prefix), domain) if key != exclude), limit))
+        accounts = (self.get(key) for key in keys)
+        return [account for account in accounts if account is not None]
+
+    def count(self, prefix="", domain=None):
+        """
+        Counts the accounts whose email matches a prefix or domain, from the
+        email index rather than by scanning the accounts.
+
+        Args:
+            prefix (str, optional): Only count accounts whose email starts with this.
+            domain (str, optional): Only count accounts of this email domain.
+
+        Returns:
+            int: The number of matching accounts.
+        """
+        domain = self.normalise_email(domain) if domain is not None else None
+        with self.index_lock.read_locked():
+            return self.email_index.count(self.normalise_email(prefix), domain)
+
+    @property
+    def admin_count(self):
+        """
+        Returns how many accounts are administrators.
+        """
+        return self.email_index.admin_count
+
+    def __contains__(self, item):
+        """
+        Checks whether an account or an email address is registered.
+
+        Args:
+            item (User | str): An account or an email address.
+
+        Returns:
+            bool: True if it is registered, False otherwise.
+        """
+        if isinstance(item, str):
+            return self.get(item) is not None
+        return self.get(item.email) is item
+
+    def __iter__(self):
+        """
+        Yields a snapshot of the accounts in the order they were added. Each
+        shard is copied under its read lock, so writers are held up for one
+        shard at a time only.
+        """
+        snapshots = []
+        for shard, lock in zip(self.shards, self.locks):
+            with lock.read_locked():
+                snapshots.append(list(shard.values()))
+        for _, account in heapq.merge(*snapshots, key=itemgetter(0)):
+            yield account
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
@@ -0,0 +1,606 @@
+import argparse
+import asyncio
+import base64
+import binascii
+import json
+import re
+import sys
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from blob_store import blob_store
+from change_events import change_events
+from globals import all_accounts
+from input_utils import InputUtils
+from metrics import metrics
+from password_hashing import POOL_KINDS, password_hasher
+from recipe_manager_cache import recipe_manager_cache
+from session_cache import session_cache
+from storage.journal_data_access import JournalDataAccess
+from storage.sqlite_data_access import SQLiteDataAccess
+from text_compression import text_compressor
+from user import User
+from user_counts import UserCounts
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+IDLE_TIMEOUT = 30
+FLUSH_INTERVAL = 1.0
+MAX_PAGE_SIZE = 1000
+RECIPE_FIELDS = ("recipe_id", "title", "ingredients", "instructions")
+TEXT_FIELDS = RECIPE_FIELDS[1:]
+
+
+class ApiError(Exception):
+    """
+    Raised by a request handler to answer with an error status and message.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def recipe_to_dict(recipe):
+    """
+    Converts a recipe to the dictionary sent in JSON responses.
+    """
+    payload = {field: getattr(recipe, field) for field in RECIPE_FIELDS}
+    payload["version"] = recipe.version
+    return payload
+
+
+def split_list(value):
+    """
+    Splits a comma-separated query string parameter, ignoring blank entries.
+    """
+    return [item for item in value.split(",") if item.strip()] if value else []
+
+
+def integer_parameter(query, name, default, minimum=0, maximum=None):
+    """
+    Reads a non-negative integer query string parameter.
+
+    Raises:
+        ApiError: If the parameter is not an integer or is out of range.
+    """
+    value = query.get(name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer.") from None
+    if number < minimum or (maximum is not None and number > maximum):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} is out of range.")
+    return number
+
+
+class RecipeApi:
+    """
+    The JSON API over accounts and recipes, independent of the transport.
+
+    Each request is routed by method and path to a handler, which returns a
+    status and a JSON-serialisable payload. Requests other than account
+    creation authenticate either with a session token from POST /login, sent
+    as a Bearer token and looked up in the session cache without hashing
+    anything, or with HTTP Basic credentials, checked against the
+    AccountRegistry. They work on the caller's own RecipeManager, so the
+    same validation, permissions and indexes apply as in the command line
+    interface. Administrative routes are guarded by User.can_access.
+
+    Attributes:
+        accounts (AccountRegistry): The registered accounts.
+        sessions (SessionCache): The logged-in sessions.
+        user_counts (UserCounts): The account and administrator counts reported by
+         GET /stats, kept up to date from the change-event stream until close.
+        routes (list[tuple[str, re.Pattern, callable]]): The method, path pattern
+         and handler of every route.
+    """
+
+    def __init__(self, accounts=None, sessions=None):
+        """
+        Initializes a new instance of RecipeApi.
+
+        Args:
+            accounts (AccountRegistry, optional): The registered accounts. Defaults to all_accounts.
+            sessions (SessionCache, optional): The logged-in sessions. Defaults to session_cache.
+        """
+        self.accounts = accounts if accounts is not None else all_accounts
+        self.sessions = sessions if sessions is not None else session_cache
+        self.user_counts = UserCounts(self.accounts).start()
+        self.routes = [
+            ("POST", re.compile(r"/accounts"), self.create_account),
+            ("POST", re.compile(r"/login"), self.login),
+            ("POST", re.compile(r"/logout"), self.logout),
+            ("GET", re.compile(r"/stats"), self.stats),
+            ("GET", re.compile(r"/recipes"), self.list_recipes),
+            ("POST", re.compile(r"/recipes"), self.create_recipe),
+            ("GET", re.compile(r"/recipes/search"), self.search_recipes),
+            ("GET", re.compile(r"/recipes/by-ingredients"), self.find_recipes_by_ingredients),
+            ("GET", re.compile(r"/recipes/(\d+)"), self.get_recipe),
+            ("PUT", re.compile(r"/recipes/(\d+)"), self.update_recipe),
+            ("PATCH", re.compile(r"/recipes/(\d+)"), self.update_recipe),
+            ("DELETE", re.compile(r"/recipes/(\d+)"), self.delete_recipe),
+            ("GET", re.compile(r"/users"), self.list_users),
+            ("DELETE", re.compile(r"/users/([^/]+)"), self.delete_user),
+        ]
+
+    def close(self):
+        """
+        Stops keeping the user counts up to date.
+        """
+        self.user_counts.close()
+
+    def handle(self, method, target, headers, body):
+        """
+        Handles one request.
+
+        Args:
+            method (str): The HTTP method.
+            target (str): The request target: the path and the query string.
+            headers (dict[str, str]): The request headers, with lower-case names.
+            body (bytes): The request body.
+
+        Returns:
+            tuple[int, object]: The response status and JSON payload.
+        """
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.fullmatch(url.path)
+            if match is None:
+                continue
+            if route_method != method:
+                allowed = True
+                continue
+            try:
+                return handler(Request(headers, query, body), *match.groups())
+            except ApiError as error:
+                return error.status, {"error": error.message}
+        if allowed:
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Method not allowed."}
+        return HTTPStatus.NOT_FOUND, {"error": "Not found."}
+
+    def authenticate(self, request):
+        """
+        Checks a request's session token or HTTP Basic credentials.
+
+        Returns:
+            User: The authenticated user.
+
+        Raises:
+            ApiError: If the credentials are missing, wrong or expired.
+        """
+        scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer":
+            user = self.sessions.get(credentials.strip())
+            if user is None:
+                raise ApiError(HTTPStatus.UNAUTHORIZED, "Invalid or expired session.")
+            return user
+        if scheme.lower() == "basic":
+            try:
+                email, _, password = base64.b64decode(credentials, validate=True).decode("utf-8").partition(":")
+            except (binascii.Error, UnicodeDecodeError):
+                pass
+            else:
+                user = self.accounts.authenticate(email, password)
+                if user is not None:
+                    return user
+        raise ApiError(HTTPStatus.UNAUTHORIZED, "Invalid email or password.")
+
+    def recipe_of(self, user, recipe_id):
+        recipe = user.recipe_manager.get(int(recipe_id))
+        if recipe is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"Recipe with ID: {recipe_id} not found.")
+        return recipe
+
+    def create_account(self, request):
+        fields = request.json()
+        email = fields.get("email")
+        password = fields.get("password")
+        if not isinstance(email, str) or not InputUtils.is_valid_email(email):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Please ensure you enter a valid email address.")
+        if not isinstance(password, str) or not InputUtils.is_valid_password(password):
+            raise ApiError(HTTPStatus.BAD_REQUEST,
+                           "Password must contain at least one uppercase letter, one lowercase letter, "
+                           "one digit, and be at least 8 characters long.")
+        if not self.accounts.add(User(email, password, storage=self.accounts.storage)):
+            raise ApiError(HTTPStatus.CONFLICT, "An account with this email already exists.")
+        return HTTPStatus.CREATED, {"email": email}
+
+    def login(self, request):
+        user = self.authenticate(request)
+        return HTTPStatus.OK, {"email": user.email, "is_admin": user.is_admin,
+                               "token": self.sessions.create(user), "expires_in": self.sessions.ttl}
+
+    def logout(self, request):
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not self.sessions.invalidate(token.strip()):
+            raise ApiError(HTTPStatus.UNAUTHORIZED, "Invalid or expired session.")
+        return HTTPStatus.OK, {"logged_out": True}
+
+    def stats(self, request):
+        user = self.authenticate(request)
+        if not user.can_access("view_all_users"):
+            raise ApiError(HTTPStatus.FORBIDDEN, "You do not have permission to view statistics.")
+        return HTTPStatus.OK, {"users": self.user_counts.stats(), "sessions": self.sessions.stats(),
+                               "recipe_collections": recipe_manager_cache.stats(),
+                               "password_verifications": password_hasher.stats(), "recipe_bodies": blob_store.stats(),
+                               "instruction_compression": text_compressor.stats(), "change_events": change_events.stats(),
+                               "operations": metrics.snapshot()}
+
+    def list_recipes(self, request):
+        user = self.authenticate(request)
+        offset = integer_parameter(request.query, "offset", 0)
+        after_id = integer_parameter(request.query, "after", None)
+        limit = integer_parameter(request.query, "limit", 20, 1, MAX_PAGE_SIZE)
+        summary = request.query.get("summary", "").lower() in ("1", "true", "yes")
+        fields = RECIPE_FIELDS[:2] if summary else RECIPE_FIELDS
+        recipes = [dict(zip(fields, values)) for values in
+                   user.recipe_manager.iter_recipes(offset, after_id, limit, fields)]
+        return HTTPStatus.OK, {"recipes": recipes, "total": len(user.recipe_manager)}
+
+    def create_recipe(self, request):
+        user = self.authenticate(request)
+        values = request.recipe_fields(required=True)
+        recipe = user.recipe_manager.create_recipe(*values)
+        return HTTPStatus.CREATED, recipe_to_dict(recipe)
+
+    def get_recipe(self, request, recipe_id):
+        user = self.authenticate(request)
+        return HTTPStatus.OK, recipe_to_dict(self.recipe_of(user, recipe_id))
+
+    def update_recipe(self, request, recipe_id):
+        user = self.authenticate(request)
+        values = request.recipe_fields(required=False)
+        expected_version = request.json().get("version")
+        if expected_version is not None and (not isinstance(expected_version, int) or
+                                             isinstance(expected_version, bool)):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "version must be an integer.")
+        recipe = self.recipe_of(user, recipe_id)
+        if not user.recipe_manager.update_recipe(int(recipe_id), *values, expected_version=expected_version):
+            self.recipe_of(user, recipe_id)
+            raise ApiError(HTTPStatus.CONFLICT, f"Recipe with ID: {recipe_id} was changed by someone else.")
+        return HTTPStatus.OK, recipe_to_dict(recipe)
+
+    def delete_recipe(self, request, recipe_id):
+        user = self.authenticate(request)
+        if not user.recipe_manager.delete_recipe(int(recipe_id)):
+            raise ApiError(HTTPStatus.NOT_FOUND, f"Recipe with ID: {recipe_id} not found.")
+        return HTTPStatus.OK, {"deleted": int(recipe_id)}
+
+    def search_recipes(self, request):
+        user = self.authenticate(request)
+        limit = integer_parameter(request.query, "limit", 10, 1, MAX_PAGE_SIZE)
+        results = user.recipe_manager.search(request.query.get("q", ""), limit)
+        return HTTPStatus.OK, {"recipes": [dict(recipe_to_dict(recipe), score=round(score, 4))
+                                           for recipe, score in results]}
+
+    def find_recipes_by_ingredients(self, request):
+        user = self.authenticate(request)
+        recipes = user.recipe_manager.find_by_ingredients(split_list(request.query.get("all_of")),
+                                                          split_list(request.query.get("any_of")),
+                                                          split_list(request.query.get("none_of")))
+        return HTTPStatus.OK, {"recipes": [recipe_to_dict(recipe) for recipe in recipes]}
+
+    def list_users(self, request):
+        user = self.authenticate(request)
+        if not user.can_access("view_all_users"):
+            raise ApiError(HTTPStatus.FORBIDDEN, "You do not have permission to view all users.")
+        prefix = request.query.get("prefix", "")
+        domain = request.query.get("domain")
+        limit = integer_parameter(request.query, "limit", 20, 1, MAX_PAGE_SIZE)
+        page = self.accounts.page(request.query.get("after"), limit, prefix, domain)
+        return HTTPStatus.OK, {"users": [{"email": account.email, "is_admin": account.is_admin} for account in page],
+                               "next": page[-1].email if len(page) == limit else None,
+                               "matching": self.accounts.count(prefix, domain),
+                               "total": len(self.accounts), "admins": self.accounts.admin_count}
+
+    def delete_user(self, request, email):
+        user = self.authenticate(request)
+        if not user.can_access("delete_user"):
+            raise ApiError(HTTPStatus.FORBIDDEN, "You do not have permission to delete users.")
+        if self.accounts.remove_email(unquote(email)) is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, "User not found.")
+        return HTTPStatus.OK, {"deleted": unquote(email)}
+
+
+class Request:
+    """
+    The parts of a request a RecipeApi handler needs.
+
+    Attributes:
+        headers (dict[str, str]): The request headers, with lower-case names.
+        query (dict[str, str]): The query string parameters.
+        body (bytes): The request body.
+    """
+
+    __slots__ = ("headers", "query", "body")
+
+    def __init__(self, headers, query, body):
+        self.headers = headers
+        self.query = query
+        self.body = body
+
+    def json(self):
+        """
+        Parses the body as a JSON object.
+
+        Raises:
+            ApiError: If the body is not a JSON object.
+        """
+        try:
+            fields = json.loads(self.body or b"{}")
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "The request body must be JSON.") from None
+        if not isinstance(fields, dict):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "The request body must be a JSON object.")
+        return fields
+
+    def recipe_fields(self, required):
+        """
+        Reads the title, ingredients and instructions of a recipe from the body.
+
+        Args:
+            required (bool): Whether every field must be given, as when creating a recipe.
+
+        Returns:
+            tuple[str | None, str | None, str | None]: The fields, None for those not given.
+
+        Raises:
+            ApiError: If a field is blank or not a string, or a required field is missing.
+        """
+        fields = self.json()
+        values = []
+        for name in TEXT_FIELDS:
+            value = fields.get(name)
+            if value is None and not required:
+                values.append(None)
+            elif not isinstance(value, str) or not value.strip():
+                raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} cannot be blank.")
+            else:
+                values.append(value)
+        return tuple(values)
+
+
+class ApiServer:
+    """
+    Serves a RecipeApi over HTTP/1.1 with asyncio.
+
+    Every connection is a coroutine on one event loop, so idle keep-alive
+    connections cost a little memory each rather than a thread, and one
+    process can hold thousands of them. Connections are kept alive between
+    requests unless the client asks otherwise or stays idle for longer than
+    idle_timeout.
+
+    Handlers can block, so they are handed to the loop's default executor
+    rather than run on the event loop whenever they might: with a
+    persistent storage backend any of them may load a collection on a
+    cache miss, commit a batch of writes or fsync the journal, and requests
+    that carry a password or create an account wait for the
+    password_hasher's pool. Only with the in-memory backend do the other
+    handlers run on the loop itself, as they then touch nothing but
+    in-memory structures whose locks are held briefly. The registry and the
+    recipe collections are thread-safe, so handlers may run alongside each
+    other. Writes buffered by the storage backend are flushed on the
+    executor every flush_interval seconds and when the server stops.
+
+    A handler that raises anything other than ApiError is answered with
+    500 Internal Server Error, and the connection stays open.
+
+    Attributes:
+        api (RecipeApi): The API requests are routed to.
+        host (str): The address to listen on.
+        port (int): The port to listen on; 0 picks a free one.
+        idle_timeout (float): Seconds an idle connection is kept open.
+        flush_interval (float): Seconds between flushes of the storage backend.
+        server (asyncio.Server): The listening server once started.
+    """
+
+    def __init__(self, api, host="127.0.0.1", port=8080, idle_timeout=IDLE_TIMEOUT,
+                 flush_interval=FLUSH_INTERVAL):
+        self.api = api
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.flush_interval = flush_interval
+        self.server = None
+        self.flusher = None
+
+    async def start(self):
+        """
+        Starts listening and returns the port actually bound.
+        """
+        self.server = await asyncio.start_server(self.serve_connection, self.host, self.port,
+                                                 limit=MAX_HEADER_BYTES, backlog=4096)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.flusher = asyncio.ensure_future(self.flush_periodically())
+        return self.port
+
+    async def stop(self):
+        """
+        Stops listening and flushes the storage backend.
+        """
+        self.flusher.cancel()
+        self.server.close()
+        await self.server.wait_closed()
+        await asyncio.get_running_loop().run_in_executor(None, self.api.accounts.flush)
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"Serving the recipe API on http://{self.host}:{self.port}", flush=True)
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.api.accounts.flush)
+            except Exception as error:
+                print(f"Error flushing storage: {error!r}", file=sys.stderr)
+
+    def may_block(self, target, headers):
+        """
+        Returns whether a request's handler may block on I/O or password hashing.
+        """
+        if self.api.accounts.storage.persistent:
+            return True
+        return headers.get("authorization", "")[:6].lower() == "basic " or target.startswith("/accounts")
+
+    async def respond(self, method, target, headers, body):
+        """
+        Runs a request's handler, on the executor if it may block.
+
+        Returns:
+            tuple[int, object]: The response status and JSON payload.
+        """
+        try:
+            if self.may_block(target, headers):
+                return await asyncio.get_running_loop().run_in_executor(
+                    None, self.api.handle, method, target, headers, body)
+            return self.api.handle(method, target, headers, body)
+        except Exception as error:
+            print(f"Error handling {method} {target}: {error!r}", file=sys.stderr)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error."}
+
+    async def read_request(self, reader):
+        """
+        Reads one request from a connection.
+
+        Returns:
+            tuple[str, str, str, dict[str, str], bytes]: The method, target, HTTP
+             version, headers and body, or None if the connection was closed.
+
+        Raises:
+            ApiError: If the request is malformed or too large.
+        """
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.idle_timeout)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            return None
+        except asyncio.LimitOverrunError:
+            raise ApiError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Request headers too large.")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Malformed request line.") from None
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise ApiError(HTTPStatus.NOT_IMPLEMENTED, "Chunked request bodies are not supported.")
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length.") from None
+        if length > MAX_BODY_BYTES or length < 0:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large.")
+        body = await reader.readexactly(length) if length else b""
+        return method, target, version, headers, body
+
+    @staticmethod
+    def encode_response(status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        status = HTTPStatus(status)
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        return head.encode("latin-1") + body
+
+    async def serve_connection(self, reader, writer):
+        """
+        Serves the requests of one connection until it is closed.
+        """
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except ApiError as error:
+                    writer.write(self.encode_response(error.status, {"error": error.message}, False))
+                    await writer.drain()
+                    break
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" and (version == "HTTP/1.1" or connection == "keep-alive")
+                status, payload = await self.respond(method, target, headers, body)
+                writer.write(self.encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the recipe JSON API over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="The address to listen on.")
+    parser.add_argument("--port", type=int, default=8080, help="The port to listen on.")
+    backend = parser.add_mutually_exclusive_group()
+    backend.add_argument("--db", help="Keep accounts and recipes in this SQLite database.")
+    backend.add_argument("--journal", help="Keep accounts and recipes in this journal directory.")
+    parser.add_argument("--cache-collections", type=int, default=recipe_manager_cache.max_collections,
+                        help="The most users' recipe collections to keep in memory.")
+    parser.add_argument("--compress-text", action="store_true",
+                        help="Keep long recipe instructions compressed in memory with zlib and a "
+                             "dictionary trained from the first recipes loaded.")
+    parser.add_argument("--text-cache", type=int, default=text_compressor.cache_size,
+                        help="The most decompressed instructions to keep for recently read recipes.")
+    parser.add_argument("--hash-pool", choices=POOL_KINDS, default=password_hasher.kind,
+                        help="Whether password hashing runs on a thread or a process pool.")
+    parser.add_argument("--hash-workers", type=int, default=password_hasher.workers,
+                        help="How many passwords can be hashed or verified at once.")
+    parser.add_argument("--hash-cost", type=int, default=password_hasher.n,
+                        help="The scrypt cost parameter N for new password hashes; a power of two.")
+    parser.add_argument("--session-ttl", type=float, default=session_cache.ttl,
+                        help="Seconds a session token stays valid after it was last used.")
+    parser.add_argument("--max-sessions", type=int, default=session_cache.max_sessions,
+                        help="The most sessions to keep; the least recently used are evicted first.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Runs the API server until it is interrupted.
+
+    Args:
+        argv (list[str], optional): The command line arguments. Defaults to sys.argv.
+    """
+    arguments = parse_arguments(argv)
+    recipe_manager_cache.max_collections = arguments.cache_collections
+    password_hasher.configure(arguments.hash_pool, arguments.hash_workers, arguments.hash_cost)
+    text_compressor.configure(arguments.compress_text, arguments.text_cache)
+    session_cache.ttl = arguments.session_ttl
+    session_cache.max_sessions = arguments.max_sessions
+    if arguments.db:
+        all_accounts.attach_storage(SQLiteDataAccess(arguments.db), User.from_record)
+    elif arguments.journal:
+        all_accounts.attach_storage(JournalDataAccess(arguments.journal), User.from_record)
+    server = ApiServer(RecipeApi(all_accounts), arguments.host, arguments.port)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.api.close()
+        all_accounts.storage.close()
+        password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import json
+import sqlite3
+import time
+
+from globals import all_accounts
+from input_utils import InputUtils
+from user import User
+
+
+class BatchError(Exception):
+    """
+    An operation in a batch script that could not be carried out.
+    """
+
+
+class BatchRunner:
+    """
+    Replays a script of account and recipe operations without prompts or menus.
+
+    A script is a JSON Lines file with one operation per line, such as
+    {"op": "create", "title": "Soup", "ingredients": "leek, potato",
+    "instructions": "Boil."}. The operations are login, logout,
+    create_account, create, update, delete and delete_user; recipe
+    operations act on the collection of the user who logged in last, and
+    delete_user requires that user to be an administrator. Blank lines and
+    lines starting with # are skipped.
+
+    Each operation's outcome is written as one JSON line as soon as it is
+    known, with "ok" set to true or false, so the results can be streamed
+    into another tool while the script runs. A failed operation does not
+    stop the script, and neither does one the storage backend refuses or
+    fails to write.
+
+    Attributes:
+        accounts (AccountRegistry): The accounts the script works on.
+        user (User): The user who logged in last, or None.
+        operations (int): How many operations have run.
+        errors (int): How many of them failed.
+    """
+
+    def __init__(self, accounts=None):
+        """
+        Initializes a new instance of BatchRunner.
+
+        Args:
+            accounts (AccountRegistry, optional): The accounts to work on. Defaults to all_accounts.
+        """
+        self.accounts = accounts if accounts is not None else all_accounts
+        self.user = None
+        self.operations = 0
+        self.errors = 0
+        self.handlers = {
+            "login": self.login,
+            "logout": self.logout,
+            "create_account": self.create_account,
+            "create": self.create,
+            "update": self.update,
+            "delete": self.delete,
+            "delete_user": self.delete_user,
+        }
+
+    def run(self, lines, output):
+        """
+        Runs every operation of a script.
+
+        Args:
+            lines (iterable[str]): The lines of the script.
+            output (file): Where to write one JSON result per operation.
+
+        Returns:
+            dict[str, float]: The operations, errors, elapsed seconds and operations per second.
+        """
+        started = time.perf_counter()
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            output.write(json.dumps(self.execute(number, line)) + "\n")
+        elapsed = time.perf_counter() - started
+        output.flush()
+        return {"operations": self.operations, "errors": self.errors, "seconds": round(elapsed, 6),
+                "operations_per_second": round(self.operations / elapsed, 1) if elapsed else 0.0}
+
+    def execute(self, number, line):
+        """
+        Runs one line of a script.
+
+        Returns:
+            dict: The result, with the line number, the operation and whether it succeeded.
+        """
+        try:
+            fields = json.loads(line)
+        except ValueError:
+            self.operations += 1
+            self.errors += 1
+            return {"line": number, "op": None, "ok": False, "error": "The line is not valid JSON."}
+        result = {"line": number}
+        result.update(self.apply(fields))
+        return result
+
+    def apply(self, fields):
+        """
+        Runs one operation that has already been parsed.
+
+        Args:
+            fields (dict): The operation, with its name under "op".
+
+        Returns:
+            dict: The result, with the operation and whether it succeeded.
+        """
+        self.operations += 1
+        operation = None
+        try:
+            if not isinstance(fields, dict):
+                raise BatchError("The line must be a JSON object.")
+            operation = fields.get("op")
+            handler = self.handlers.get(operation) if isinstance(operation, str) else None
+            if handler is None:
+                raise BatchError(f"Unknown operation {operation!r}; expected one of "
+                                 f"{', '.join(self.handlers)}.")
+            result = {"op": operation, "ok": True}
+            result.update(handler(fields))
+            return result
+        except (BatchError, ValueError, sqlite3.Error, OSError) as error:
+            self.errors += 1
+            return {"op": operation, "ok": False, "error": str(error)}
+
+    def current_user(self):
+        if self.user is None:
+            raise BatchError("Log in first.")
+        return self.user
+
+    @staticmethod
+    def text_field(fields, name, required):
+        value = fields.get(name)
+        if value is None and not required:
+            return None
+        if not isinstance(value, str) or not value.strip():
+            raise BatchError(f"{name} must be a non-blank string.")
+        return value
+
+    @staticmethod
+    def integer_field(fields, name, required=True):
+        value = fields.get(name)
+        if value is None and not required:
+            return None
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise BatchError(f"{name} must be an integer.")
+        return value
+
+    def login(self, fields):
+        user = self.accounts.authenticate(self.text_field(fields, "email", True),
+                                          self.text_field(fields, "password", True))
+        if user is None:
+            raise BatchError("Invalid email or password.")
+        self.user = user
+        return {"email": user.email, "is_admin": user.is_admin}
+
+    def logout(self, fields):
+        self.user = None
+        return {}
+
+    def create_account(self, fields):
+        email = self.text_field(fields, "email", True)
+        password = self.text_field(fields, "password", True)
+        if not InputUtils.is_valid_email(email):
+            raise BatchError("Please ensure you enter a valid email address.")
+        if not InputUtils.is_valid_password(password):
+            raise BatchError("Password must contain at least one uppercase letter, one lowercase letter, "
+                             "one digit, and be at least 8 characters long.")
+        if not self.accounts.add(User(email, password, storage=self.accounts.storage)):
+            raise BatchError("Email already exists.")
+        return {"email": email}
+
+    def create(self, fields):
+        recipe = self.current_user().recipe_manager.create_recipe(
+            self.text_field(fields, "title", True), self.text_field(fields, "ingredients", True),
+            self.text_field(fields, "instructions", True))
+        return {"id": recipe.recipe_id, "version": recipe.version}
+
+    def update(self, fields):
+        recipe_manager = self.current_user().recipe_manager
+        recipe_id = self.integer_field(fields, "id")
+        if not recipe_manager.update_recipe(recipe_id, self.text_field(fields, "title", False),
+                                            self.text_field(fields, "ingredients", False),
+                                            self.text_field(fields, "instructions", False),
+                                            expected_version=self.integer_field(fields, "version", False)):
+            if recipe_manager.get(recipe_id) is None:
+                raise BatchError(f"Recipe with ID: {recipe_id} not found.")
+            raise BatchError(f"Recipe with ID: {recipe_id} was changed by someone else.")
+        return {"id": recipe_id, "version": recipe_manager.get(recipe_id).version}
+
+    def delete(self, fields):
+        recipe_id = self.integer_field(fields, "id")
+        if not self.current_user().recipe_manager.delete_recipe(recipe_id):
+            raise BatchError(f"Recipe with ID: {recipe_id} not found.")
+        return {"id": recipe_id}
+
+    def delete_user(self, fields):
+        if not self.current_user().can_access("delete_user"):
+            raise BatchError("You do not have permission to delete a user.")
+        email = self.text_field(fields, "email", True)
+        removed = self.accounts.remove_email(email)
+        if removed is None:
+            raise BatchError(f"User {email} not found.")
+        if removed is self.user:
+            self.user = None
+        return {"email": email}
@@ -0,0 +1,76 @@
+"""
+Measures login and signup latency against the AccountRegistry as the number
+of registered accounts grows, alongside the linear scan it replaced.
+
+Run from the task_manager_app directory:
+    python -m benchmarks.account_registry_bench [sizes...]
+"""
+import random
+import sys
+import time
+
+from account_registry import AccountRegistry
+from password_hashing import password_hasher
+from user import User
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+LOOKUPS = 10_000
+LINEAR_SCAN_LIMIT = 100_000
+
+
+def build_accounts(size):
+    return [User(f"user{i}@example.com", f"Password{i}") for i in range(size)]
+
+
+def time_per_op(func, arguments):
+    start = time.perf_counter()
+    for argument in arguments:
+        func(argument)
+    return (time.perf_counter() - start) / len(arguments) * 1e9
+
+
+def linear_login(accounts, email, password):
+    for account in accounts:
+        if account.email == email and account.check_password(password):
+            return account
+    return None
+
+
+def run(size):
+    accounts = build_accounts(size)
+    registry = AccountRegistry(accounts)
+    sample = [random.randrange(size) for _ in range(LOOKUPS)]
+    credentials = [(accounts[i].email.upper(), f"Password{i}") for i in sample]
+
+    login_ns = time_per_op(lambda pair: registry.authenticate(*pair), credentials)
+
+    new_users = [User(f"new{i}@example.com", "Password1") for i in range(LOOKUPS)]
+
+    def signup(user):
+        if user.email not in registry:
+            registry.add(user)
+
+    signup_ns = time_per_op(signup, new_users)
+    for user in new_users:
+        registry.remove(user)
+
+    linear_ns = None
+    if size <= LINEAR_SCAN_LIMIT:
+        scan_sample = [(accounts[i].email, f"Password{i}") for i in sample[:100]]
+        linear_ns = time_per_op(lambda pair: linear_login(accounts, *pair), scan_sample)
+    return login_ns, signup_ns, linear_ns
+
+
+def main(argv):
+    # This measures the registry, not the key derivation (see login_throughput_bench).
+    password_hasher.configure(n=2 ** 4)
+    sizes = [int(arg) for arg in argv] or DEFAULT_SIZES
+    print(f"{'accounts':>10} {'login ns/op':>12} {'signup ns/op':>13} {'linear login ns/op':>19}")
+    for size in sizes:
+        login_ns, signup_ns, linear_ns = run(size)
+        linear = f"{linear_ns:19.0f}" if linear_ns is not None else f"{'-':>19}"
+        print(f"{size:>10} {login_ns:12.0f} {signup_ns:13.0f} {linear}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,111 @@
+"""
+Load-tests the JSON API server: starts a local instance in a subprocess and
+opens many concurrent keep-alive connections, each creating an account and
+logging in once and then mixing recipe creates, listings, searches and
+reads authenticated with its session token. The server uses a cheap
+password hash so that registering thousands of clients does not dominate
+the run; login_throughput_bench measures the real key derivation.
+
+Run from the task_manager_app directory:
+    python -m benchmarks.api_load_test [clients] [requests_per_client]
+"""
+import asyncio
+import base64
+import json
+import resource
+import subprocess
+import sys
+import time
+
+DEFAULT_CLIENTS = 2_000
+DEFAULT_REQUESTS = 20
+PASSWORD = "Password123"
+
+
+def raise_file_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def start_server():
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", "import benchmarks.api_load_test as t; t.raise_file_limit(); "
+                              "import api_server; api_server.main(['--port', '0', '--hash-cost', '16'])",
+        stdout=subprocess.PIPE)
+    line = (await process.stdout.readline()).decode()
+    return process, int(line.rsplit(":", 1)[1])
+
+
+async def send(reader, writer, method, path, authorization=None, payload=None):
+    body = json.dumps(payload).encode() if payload is not None else b""
+    headers = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n"
+    if authorization:
+        headers += f"Authorization: {authorization}\r\n"
+    writer.write(headers.encode() + b"\r\n" + body)
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = int(head.lower().split(b"content-length: ")[1].split(b"\r\n")[0])
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(port, number, clients, requests, latencies, registered, ready):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    email = f"client{number}@example.com"
+    credentials = base64.b64encode(f"{email}:{PASSWORD}".encode()).decode()
+    await send(reader, writer, "POST", "/accounts", payload={"email": email, "password": PASSWORD})
+    _, session = await send(reader, writer, "POST", "/login", f"Basic {credentials}")
+    authorization = f"Bearer {session['token']}"
+    registered.append(number)
+    if len(registered) == clients:
+        ready.set()
+    await ready.wait()
+    for i in range(requests):
+        if i % 4 == 0:
+            request = ("POST", "/recipes", {"title": f"Soup {i}", "ingredients": "leek, potato",
+                                            "instructions": "Simmer the leeks and potatoes."})
+        elif i % 4 == 1:
+            request = ("GET", "/recipes?limit=10", None)
+        elif i % 4 == 2:
+            request = ("GET", "/recipes/search?q=potato", None)
+        else:
+            request = ("GET", "/recipes/1", None)
+        start = time.perf_counter()
+        status, _ = await send(reader, writer, request[0], request[1], authorization, request[2])
+        latencies.append(time.perf_counter() - start)
+        if status >= 400:
+            raise RuntimeError(f"{request[0]} {request[1]} returned {status}")
+    writer.close()
+
+
+async def run(clients, requests):
+    process, port = await start_server()
+    try:
+        latencies = []
+        registered = []
+        ready = asyncio.Event()
+        tasks = [asyncio.ensure_future(client(port, number, clients, requests, latencies, registered, ready))
+                 for number in range(clients)]
+        await ready.wait()
+        start = time.perf_counter()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    finally:
+        process.terminate()
+        await process.wait()
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1e3
+    print(f"{clients} concurrent connections, {len(latencies)} requests in {elapsed:.2f} s: "
+          f"{len(latencies) / elapsed:,.0f} requests/s")
+    print(f"latency p50 {percentile(0.50):.1f} ms, p95 {percentile(0.95):.1f} ms, "
+          f"p99 {percentile(0.99):.1f} ms, max {latencies[-1] * 1e3:.1f} ms")
+
+
+def main(argv):
+    raise_file_limit()
+    clients = int(argv[0]) if argv else DEFAULT_CLIENTS
+    requests = int(argv[1]) if len(argv) > 1 else DEFAULT_REQUESTS
+    asyncio.run(run(clients, requests))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
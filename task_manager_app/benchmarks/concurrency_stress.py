@@ -0,0 +1,128 @@
+"""
+Stress-tests the account registry and recipe collections from many threads
+at once and reports throughput by thread count.
+
+Each thread mixes logins, lookups, listings, searches, recipe creates,
+compare-and-set updates and deletes across a shared set of users, while
+some accounts are added and removed. Every thread also increments a shared
+counter recipe with a compare-and-set loop. Afterwards the collections'
+indexes are checked against their recipes and the counter against the
+number of increments, so a lost update or a torn index fails the run.
+
+Run from the task_manager_app directory:
+    python -m benchmarks.concurrency_stress [operations_per_thread]
+"""
+import random
+import sys
+import threading
+import time
+
+from account_registry import AccountRegistry
+from user import User
+
+DEFAULT_OPERATIONS = 5_000
+THREAD_COUNTS = (1, 2, 4, 8, 16)
+USERS = 64
+PASSWORD = "Password123"
+INGREDIENTS = ["leek", "potato", "onion", "garlic", "tomato", "basil", "rice", "egg"]
+
+
+def build_registry():
+    registry = AccountRegistry()
+    for number in range(USERS):
+        user = User(f"user{number}@example.com", PASSWORD)
+        registry.add(user)
+        for i in range(20):
+            user.recipe_manager.create_recipe(f"Dish {i}", ", ".join(random.sample(INGREDIENTS, 3)),
+                                              "Chop and simmer.")
+    counter = registry.get("user0@example.com").recipe_manager.create_recipe("0", "salt", "Count.")
+    return registry, counter
+
+
+def increment(manager, recipe_id):
+    while True:
+        recipe = manager.get(recipe_id)
+        version, value = recipe.version, int(recipe.title)
+        if manager.update_recipe(recipe_id, str(value + 1), expected_version=version):
+            return
+
+
+def worker(registry, counter, operations, seed, errors):
+    rng = random.Random(seed)
+    counter_manager = registry.get("user0@example.com").recipe_manager
+    try:
+        for i in range(operations):
+            email = f"user{rng.randrange(USERS)}@example.com"
+            choice = rng.random()
+            if choice < 0.25:
+                registry.authenticate(email, PASSWORD)
+            elif choice < 0.40:
+                manager = registry.get(email).recipe_manager
+                list(manager.iter_recipes(limit=10))
+            elif choice < 0.50:
+                registry.get(email).recipe_manager.search("simmer dish", limit=5)
+            elif choice < 0.55:
+                registry.get(email).recipe_manager.find_by_ingredients(all_of=rng.sample(INGREDIENTS, 1))
+            elif choice < 0.70:
+                registry.get(email).recipe_manager.create_recipe(
+                    f"Dish {i}", ", ".join(rng.sample(INGREDIENTS, 3)), "Chop and simmer.")
+            elif choice < 0.85:
+                manager = registry.get(email).recipe_manager
+                recipe = manager.get(rng.randrange(1, manager.next_recipe_id))
+                if recipe is not None:
+                    manager.update_recipe(recipe.recipe_id, new_ingredients=", ".join(rng.sample(INGREDIENTS, 2)),
+                                          expected_version=recipe.version)
+            elif choice < 0.95:
+                manager = registry.get(email).recipe_manager
+                recipe_id = rng.randrange(2, manager.next_recipe_id)
+                if recipe_id != counter.recipe_id:
+                    manager.delete_recipe(recipe_id)
+            elif choice < 0.975:
+                registry.add(User(f"temp{seed}-{i}@example.com", PASSWORD))
+            else:
+                registry.remove_email(f"temp{seed}-{i - 1}@example.com")
+            if i % 50 == 0:
+                increment(counter_manager, counter.recipe_id)
+    except Exception as error:
+        errors.append(error)
+
+
+def check(registry, counter, expected_increments):
+    for number in range(USERS):
+        manager = registry.get(f"user{number}@example.com").recipe_manager
+        ids = sorted(manager.recipes_by_id)
+        assert list(manager.recipe_ids) == ids, "recipe_ids out of step"
+        assert sorted(manager.search_index.document_lengths) == ids, "search index out of step"
+        indexed = set()
+        for postings in manager.ingredient_index.postings.values():
+            indexed.update(postings)
+        assert indexed == set(ids), "ingredient index out of step"
+    assert int(counter.title) == expected_increments, f"lost updates: {counter.title} != {expected_increments}"
+
+
+def run(threads, operations):
+    random.seed(1)
+    registry, counter = build_registry()
+    errors = []
+    pool = [threading.Thread(target=worker, args=(registry, counter, operations, seed, errors))
+            for seed in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+    check(registry, counter, threads * len(range(0, operations, 50)))
+    return threads * operations / elapsed
+
+
+def main(argv):
+    operations = int(argv[0]) if argv else DEFAULT_OPERATIONS
+    for threads in THREAD_COUNTS:
+        print(f"{threads:3} threads: {run(threads, operations):10,.0f} operations/s, invariants hold")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
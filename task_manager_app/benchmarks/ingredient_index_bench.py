@@ -0,0 +1,68 @@
+"""
+Measures ingredient queries against an IngredientIndex holding a large
+synthetic recipe collection, alongside a scan that re-splits every recipe's
+ingredients.
+
+Run from the task_manager_app directory:
+    python -m benchmarks.ingredient_index_bench [recipes]
+"""
+import random
+import sys
+import time
+
+from ingredient_index import IngredientIndex, split_ingredients
+
+DEFAULT_RECIPES = 1_000_000
+INGREDIENTS = [f"ingredient {i}" for i in range(2_000)]
+COMMON = ["salt", "pepper", "onion", "garlic", "olive oil", "butter", "flour", "sugar", "egg", "milk"]
+QUERIES = [
+    {"all_of": ["salt", "onion", "garlic"]},
+    {"all_of": ["butter", "ingredient 7"]},
+    {"any_of": ["ingredient 1", "ingredient 2", "ingredient 3"]},
+    {"all_of": ["egg"], "any_of": ["ingredient 10", "ingredient 11"], "none_of": ["milk"]},
+]
+REPEATS = 20
+
+
+def build(recipes):
+    random.seed(1)
+    index = IngredientIndex()
+    ingredients_by_id = {}
+    for recipe_id in range(1, recipes + 1):
+        chosen = random.sample(COMMON, 3) + random.sample(INGREDIENTS, 3)
+        ingredients = ", ".join(chosen)
+        ingredients_by_id[recipe_id] = ingredients
+        index.add_tokens(recipe_id, split_ingredients(ingredients))
+    return index, ingredients_by_id
+
+
+def scan(ingredients_by_id, all_of=(), any_of=(), none_of=()):
+    matches = []
+    for recipe_id, ingredients in ingredients_by_id.items():
+        tokens = set(split_ingredients(ingredients))
+        if (all(token in tokens for token in all_of)
+                and (not any_of or any(token in tokens for token in any_of))
+                and not any(token in tokens for token in none_of)):
+            matches.append(recipe_id)
+    return matches
+
+
+def main(argv):
+    recipes = int(argv[0]) if argv else DEFAULT_RECIPES
+    start = time.perf_counter()
+    index, ingredients_by_id = build(recipes)
+    print(f"indexed {recipes} recipes in {time.perf_counter() - start:.1f} s")
+    for query in QUERIES:
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            matches = index.find(**query, recipe_ids=ingredients_by_id.keys())
+        indexed_ms = (time.perf_counter() - start) / REPEATS * 1e3
+        start = time.perf_counter()
+        expected = scan(ingredients_by_id, **query)
+        scan_ms = (time.perf_counter() - start) * 1e3
+        assert matches == expected
+        print(f"{str(query):>90}: {len(matches):7} matches, index {indexed_ms:8.3f} ms, scan {scan_ms:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,100 @@
+"""
+Measures the memory taken by recipes' ingredients on a synthetic corpus,
+comparing raw comma-separated strings, per-recipe parsed tuples of fresh
+strings and FavouriteRecipes' tuples of tokens interned in the shared
+ingredient table.
+
+The corpus draws 4 to 10 ingredients per recipe from a vocabulary with a
+Zipf-like popularity, so a few staples such as salt and onion appear in
+most recipes, and one recipe in ten is typed with capitals, whose original
+text FavouriteRecipes has to keep.
+
+Run from the task_manager_app directory:
+    python -m benchmarks.ingredient_interning_bench [count]
+"""
+import gc
+import itertools
+import random
+import sys
+import time
+import tracemalloc
+
+from favourite_recipes import FavouriteRecipes
+from ingredient_index import split_ingredients
+from ingredient_table import ingredient_table
+
+DEFAULT_COUNT = 1_000_000
+VOCABULARY = 2_000
+STAPLES = ["salt", "onion", "garlic", "olive oil", "pepper", "butter", "egg", "flour", "sugar", "tomato"]
+
+
+class RawRecipe:
+    """The recipe layout before ingredients were parsed."""
+
+    __slots__ = ("recipe_id", "title", "ingredients", "instructions", "user_email", "version")
+
+    def __init__(self, recipe_id, title, ingredients, instructions, user_email=None):
+        self.recipe_id = recipe_id
+        self.title = title
+        self.ingredients = ingredients
+        self.instructions = instructions
+        self.user_email = user_email
+        self.version = 1
+
+
+class ParsedRecipe(RawRecipe):
+    """Raw ingredients split by every consumer into its own tuple of fresh strings."""
+
+    __slots__ = ("tokens",)
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.tokens = tuple(split_ingredients(self.ingredients))
+        self.ingredients = None
+
+
+def ingredient_texts(count, seed=1):
+    rng = random.Random(seed)
+    vocabulary = STAPLES + [f"ingredient {i}" for i in range(VOCABULARY - len(STAPLES))]
+    cumulative = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    for i in range(count):
+        chosen = list(dict.fromkeys(rng.choices(vocabulary, cum_weights=cumulative, k=rng.randint(4, 10))))
+        # Build every string afresh, as it would arrive from input or storage.
+        text = ", ".join("".join(list(name)) for name in chosen)
+        yield text.title() if i % 10 == 0 else text
+
+
+def measure(factory, texts):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    recipes = [factory(i, "Title", text, "Cook.") for i, text in enumerate(texts)]
+    elapsed = time.perf_counter() - started
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return recipes, allocated, elapsed
+
+
+def main(argv):
+    count = int(argv[0]) if argv else DEFAULT_COUNT
+    print(f"{count} recipes, {VOCABULARY} distinct ingredients")
+    baseline = None
+    for name, factory in [("raw strings", RawRecipe), ("parsed, not interned", ParsedRecipe),
+                          ("interned tokens", FavouriteRecipes)]:
+        recipes, allocated, elapsed = measure(factory, ingredient_texts(count))
+        baseline = baseline or allocated
+        print(f"{name:<22} {allocated / count:8.1f} bytes/recipe  {allocated / baseline:6.1%} of raw  "
+              f"built in {elapsed:.2f}s")
+        if factory is FavouriteRecipes:
+            stats = ingredient_table.stats()
+            kept = sum(recipe.ingredient_text is not None for recipe in recipes)
+            print(f"ingredient table: {stats['tokens']} tokens, {stats['references']} references; "
+                  f"original text kept for {kept} recipes")
+            for recipe in recipes:
+                recipe.release()
+        del recipes
+    print(f"after the recipes are released the table holds {len(ingredient_table)} tokens")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
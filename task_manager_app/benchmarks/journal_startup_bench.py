@@ -0,0 +1,81 @@
+"""
+Measures how long JournalDataAccess takes to start up when it has to replay
+a long journal, compared with loading a snapshot and replaying only a short
+journal tail.
+
+The journal holds one account, a fixed set of recipes and then a stream of
+updates to those recipes, so the snapshot stays small however long the
+journal grows.
+
+Run from the task_manager_app directory:
+    python -m benchmarks.journal_startup_bench [entries] [recipes]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from favourite_recipes import FavouriteRecipes
+from storage.journal_data_access import (INSERT_RECIPE, SAVE_ACCOUNT, UPDATE_RECIPE,
+                                         JournalDataAccess, encode_record)
+
+DEFAULT_ENTRIES = 10_000_000
+DEFAULT_RECIPES = 100_000
+TAIL_ENTRIES = 10_000
+WRITE_BATCH = 100_000
+EMAIL = "cook@example.com"
+
+
+def write_journal(path, entries, recipes):
+    with open(path, "wb") as journal:
+        journal.write(encode_record(SAVE_ACCOUNT, EMAIL, "hash", 0))
+        batch = []
+        for i in range(1, entries):
+            if i <= recipes:
+                record = encode_record(INSERT_RECIPE, EMAIL, i, f"Recipe {i}", "onion, garlic",
+                                       "1. Chop onions\n2. Cook")
+            else:
+                recipe_id = i % recipes + 1
+                record = encode_record(UPDATE_RECIPE, EMAIL, recipe_id, f"Recipe {recipe_id} v{i}",
+                                       "onion, garlic", "1. Chop onions\n2. Cook")
+            batch.append(record)
+            if len(batch) == WRITE_BATCH:
+                journal.write(b"".join(batch))
+                batch = []
+        journal.write(b"".join(batch))
+
+
+def time_startup(directory):
+    start = time.perf_counter()
+    storage = JournalDataAccess(directory, snapshot_every=sys.maxsize)
+    elapsed = time.perf_counter() - start
+    return storage, elapsed
+
+
+def main(argv):
+    entries = int(argv[0]) if argv else DEFAULT_ENTRIES
+    recipes = int(argv[1]) if len(argv) > 1 else DEFAULT_RECIPES
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "journal-00000000.log")
+        write_journal(path, entries, recipes)
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"journal: {entries} entries, {size_mb:.1f} MB, {recipes} live recipes")
+
+        storage, full_replay = time_startup(directory)
+        print(f"full replay:              {full_replay:8.2f} s ({entries / full_replay:,.0f} entries/s)")
+
+        storage.snapshot()
+        for i in range(TAIL_ENTRIES):
+            recipe = FavouriteRecipes(i % recipes + 1, f"Tail {i}", "salt", "Stir", EMAIL)
+            storage.update_recipe(recipe)
+            recipe.release()
+        storage.close()
+
+        storage, snapshot_start = time_startup(directory)
+        storage.close()
+        print(f"snapshot + {TAIL_ENTRIES} tail entries: {snapshot_start:8.2f} s "
+              f"({full_replay / snapshot_start:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
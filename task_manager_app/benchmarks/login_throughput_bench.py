@@ -0,0 +1,53 @@
+"""
+Measures login throughput with salted scrypt hashing for different pool
+kinds and sizes, with and without the verification cache.
+
+Many client threads log in at once, as the API server's handler threads
+would. Cold logins all have to derive a key, so their throughput is bounded
+by the pool size and the number of CPUs; warm logins repeat credentials
+that were verified before and are answered from the cache.
+
+Run from the task_manager_app directory:
+    python -m benchmarks.login_throughput_bench [users]
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from account_registry import AccountRegistry
+from password_hashing import POOL_KINDS, password_hasher
+from user import User
+
+DEFAULT_USERS = 64
+POOL_SIZES = (1, 2, 4, 8)
+CLIENT_THREADS = 64
+PASSWORD = "Password123"
+
+
+def logins_per_second(registry, emails):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(CLIENT_THREADS) as clients:
+        results = list(clients.map(lambda email: registry.authenticate(email, PASSWORD), emails))
+    elapsed = time.perf_counter() - start
+    assert all(results), "a login failed"
+    return len(emails) / elapsed
+
+
+def main(argv):
+    users = int(argv[0]) if argv else DEFAULT_USERS
+    emails = [f"user{i}@example.com" for i in range(users)]
+    registry = AccountRegistry(User(email, PASSWORD) for email in emails)
+    print(f"{users} users, scrypt n={password_hasher.n}, {CLIENT_THREADS} client threads")
+    print(f"{'pool':>8} {'workers':>8} {'cold logins/s':>14} {'warm logins/s':>14}")
+    for kind in POOL_KINDS:
+        for workers in POOL_SIZES:
+            password_hasher.configure(kind, workers)
+            password_hasher.verified.clear()
+            cold = logins_per_second(registry, emails)
+            warm = logins_per_second(registry, emails * 20)
+            print(f"{kind:>8} {workers:8} {cold:14,.1f} {warm:14,.0f}")
+    password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,81 @@
+"""
+Measures how much memory sharing recipe bodies saves when many users save
+the same popular recipes.
+
+Each user saves recipes drawn from a catalogue of popular recipes with a
+Zipf-like popularity, and one recipe in five is the user's own. The memory
+of every user's collection is measured with tracemalloc, once with each
+recipe holding its own copy of the text and once with FavouriteRecipes,
+whose bodies are shared through the blob store.
+
+Run from the task_manager_app directory:
+    python -m benchmarks.recipe_dedupe_bench [recipes] [catalogue size]
+"""
+import gc
+import itertools
+import random
+import sys
+import tracemalloc
+
+from benchmarks.ingredient_interning_bench import RawRecipe
+from blob_store import blob_store
+from favourite_recipes import FavouriteRecipes
+
+DEFAULT_COUNT = 200_000
+DEFAULT_CATALOGUE = 5_000
+OWN_RECIPE_SHARE = 0.2
+STEPS = ["Preheat the oven to 180C", "Chop the onions", "Peel the potatoes", "Whisk the eggs",
+         "Simmer for 20 minutes", "Season to taste", "Bake until golden", "Rest for 10 minutes"]
+
+
+def catalogue_recipe(rng, i):
+    steps = rng.sample(STEPS, rng.randint(4, 8))
+    instructions = "\n".join(f"{n}. {step}" for n, step in enumerate(steps, 1)) + f"\nVariation {i}."
+    ingredients = ", ".join(rng.sample(["onion", "garlic", "salt", "pepper", "egg", "flour", "butter",
+                                        "potato", "leek", "milk", "cheese", "tomato"], 5))
+    return ingredients, instructions
+
+
+def saved_recipes(count, catalogue_size, seed=1):
+    rng = random.Random(seed)
+    catalogue = [catalogue_recipe(rng, i) for i in range(catalogue_size)]
+    cumulative = list(itertools.accumulate(1 / (rank + 1) for rank in range(catalogue_size)))
+    for i in range(count):
+        if rng.random() < OWN_RECIPE_SHARE:
+            ingredients, instructions = catalogue_recipe(rng, catalogue_size + i)
+        else:
+            ingredients, instructions = rng.choices(catalogue, cum_weights=cumulative)[0]
+        # Copy the text, as it would arrive from input or storage.
+        yield i, "".join(list(ingredients)), "".join(list(instructions))
+
+
+def measure(factory, count, catalogue_size):
+    gc.collect()
+    tracemalloc.start()
+    rows = list(saved_recipes(count, catalogue_size))
+    recipes = [factory(i, "Title", ingredients, instructions) for i, ingredients, instructions in rows]
+    # What is left once the input is gone is the recipes and the text they keep.
+    del rows
+    gc.collect()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return recipes, allocated
+
+
+def main(argv):
+    count = int(argv[0]) if argv else DEFAULT_COUNT
+    catalogue_size = int(argv[1]) if len(argv) > 1 else DEFAULT_CATALOGUE
+    print(f"{count} saved recipes from a catalogue of {catalogue_size}, {OWN_RECIPE_SHARE:.0%} users' own")
+    recipes, raw = measure(RawRecipe, count, catalogue_size)
+    del recipes
+    recipes, shared = measure(FavouriteRecipes, count, catalogue_size)
+    print(f"own copies     {raw / count:8.1f} bytes/recipe")
+    print(f"shared bodies  {shared / count:8.1f} bytes/recipe  ({shared / raw:.1%} of own copies)")
+    stats = blob_store.stats()
+    print(f"blob store: {stats['bodies']} bodies for {stats['references']} recipes, dedupe ratio "
+          f"{stats['dedupe_ratio']}, {stats['stored_bytes'] / 1e6:.1f} MB stored, "
+          f"{stats['bytes_saved'] / 1e6:.1f} MB saved")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
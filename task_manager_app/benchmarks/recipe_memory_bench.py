@@ -0,0 +1,79 @@
+"""
+Compares the memory used per recipe by the original __dict__-based recipe
+objects, the slotted FavouriteRecipes and the column-oriented RecipeTable,
+as measured by tracemalloc.
+
+Run from the task_manager_app directory:
+    python -m benchmarks.recipe_memory_bench [count]
+"""
+import sys
+import tracemalloc
+
+from favourite_recipes import FavouriteRecipes
+from recipe_table import RecipeTable
+
+DEFAULT_COUNT = 100_000
+USERS = 1_000
+
+
+class DictRecipe:
+    """The recipe layout before FavouriteRecipes gained __slots__."""
+
+    def __init__(self, recipe_id, title, ingredients, instructions, user_email=None):
+        self.recipe_id = recipe_id
+        self.title = title
+        self.ingredients = ingredients
+        self.instructions = instructions
+        self.user_email = user_email
+
+
+def recipe_rows(count):
+    emails = [f"user{i}@example.com" for i in range(USERS)]
+    for i in range(count):
+        yield (i + 1,
+               f"Recipe number {i}",
+               f"onion, garlic, tomato {i}, salt, pepper",
+               f"1. Preheat oven to 180C\n2. Chop onions\n3. Cook batch {i} for 25 minutes",
+               emails[i % USERS])
+
+
+def released(recipes):
+    """
+    Yields each recipe, giving back its body once the caller has copied it.
+    """
+    for recipe in recipes:
+        yield recipe
+        recipe.release()
+
+
+def measure(build, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    collection = build(recipe_rows(count))
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    if isinstance(collection, list):
+        for recipe in collection:
+            if isinstance(recipe, FavouriteRecipes):
+                recipe.release()
+    del collection
+    return (after - before) / count
+
+
+def main(argv):
+    count = int(argv[0]) if argv else DEFAULT_COUNT
+    layouts = [
+        ("dict objects", lambda rows: [DictRecipe(*row) for row in rows]),
+        ("slotted FavouriteRecipes", lambda rows: [FavouriteRecipes(*row) for row in rows]),
+        ("RecipeTable", lambda rows: RecipeTable.from_recipes(released(FavouriteRecipes(*row) for row in rows))),
+    ]
+    print(f"{count} recipes")
+    baseline = None
+    for name, build in layouts:
+        per_recipe = measure(build, count)
+        baseline = baseline or per_recipe
+        print(f"{name:>26}: {per_recipe:8.1f} bytes/recipe ({per_recipe / baseline:5.1%} of dict objects)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
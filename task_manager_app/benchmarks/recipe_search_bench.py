@@ -0,0 +1,63 @@
+"""
+Measures full-text search through the SearchIndex against a naive scan that
+tokenizes every recipe for every query and sorts all matches.
+
+Run from the task_manager_app directory:
+    python -m benchmarks.recipe_search_bench [recipes]
+"""
+import random
+import sys
+import time
+
+from recipe_search import SearchIndex, tokenize
+
+DEFAULT_RECIPES = 100_000
+WORDS = [f"word{i}" for i in range(5_000)]
+STEPS = ["Preheat the oven", "Chop the onions", "Peel the potatoes", "Simmer for 20 minutes",
+         "Season with salt and pepper", "Whisk the eggs", "Bake until golden"]
+QUERIES = ["word42 soup", "golden potatoes word7", '"chop the onions" word100', "wrod42 sopu"]
+REPEATS = 5
+
+
+def build(recipes):
+    random.seed(1)
+    index = SearchIndex()
+    documents = {}
+    for recipe_id in range(1, recipes + 1):
+        title = " ".join(random.sample(WORDS, 2) + [random.choice(["soup", "stew", "pie", "salad"])])
+        instructions = "\n".join(random.sample(STEPS, 4) + [" ".join(random.sample(WORDS, 5))])
+        documents[recipe_id] = (title, instructions)
+        index.add(recipe_id, title, instructions)
+    return index, documents
+
+
+def naive_search(documents, query, limit=10):
+    query_terms = set(tokenize(query))
+    scored = []
+    for recipe_id, (title, instructions) in documents.items():
+        tokens = tokenize(title) + tokenize(instructions)
+        score = sum(tokens.count(term) for term in query_terms)
+        if score:
+            scored.append((score, recipe_id))
+    scored.sort(reverse=True)
+    return scored[:limit]
+
+
+def main(argv):
+    recipes = int(argv[0]) if argv else DEFAULT_RECIPES
+    start = time.perf_counter()
+    index, documents = build(recipes)
+    print(f"indexed {recipes} recipes in {time.perf_counter() - start:.1f} s")
+    for query in QUERIES:
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            results = index.search(query)
+        indexed_ms = (time.perf_counter() - start) / REPEATS * 1e3
+        start = time.perf_counter()
+        naive_search(documents, query)
+        naive_ms = (time.perf_counter() - start) * 1e3
+        print(f"{query!r:>30}: {len(results):2} results, index {indexed_ms:8.2f} ms, scan {naive_ms:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,111 @@
+"""
+Measures read throughput, replication lag and the cost of read-your-writes
+reads with 1, 2 and 4 follower processes.
+
+Accounts with a few recipes each are created on the primary, then a writer
+thread updates recipes at a steady WRITE_RATE per second while reader
+threads list recipes from the followers as fast as they can, as in a
+read-heavy workload. The lag of every follower is sampled throughout. At the
+end, the time for a write followed by a read that must see it
+(min_sequence) is measured, against an eventually consistent read.
+
+Run from the task_manager_app directory:
+    python -m benchmarks.replication_lag_bench [accounts] [seconds]
+"""
+import os
+import statistics
+import sys
+import threading
+import time
+
+from change_events import change_events
+from globals import all_accounts
+from password_hashing import password_hasher
+from replication import ReplicaSet
+from user import User
+
+DEFAULT_ACCOUNTS = 1_000
+DEFAULT_SECONDS = 3.0
+REPLICA_COUNTS = (1, 2, 4)
+READERS = 4
+WRITE_RATE = 1_000
+RECIPES_PER_ACCOUNT = 5
+CONSISTENT_READS = 200
+
+
+def email(i):
+    return f"cook{i}@example.com"
+
+
+def run(replica_count, accounts, seconds):
+    with ReplicaSet(replica_count) as replicas:
+        stop = threading.Event()
+        counts = {"writes": 0, "reads": 0}
+        lags = []
+
+        def write():
+            i = 0
+            started = time.perf_counter()
+            while not stop.is_set():
+                all_accounts.get(email(i % accounts)).recipe_manager.update_recipe(1, new_title=f"Soup {i}")
+                i += 1
+                ahead = started + i / WRITE_RATE - time.perf_counter()
+                if ahead > 0:
+                    time.sleep(ahead)
+            counts["writes"] = i
+
+        def read(offset):
+            i = offset
+            while not stop.is_set():
+                assert replicas.request({"op": "list", "limit": 5}, email(i % accounts))["ok"]
+                i += READERS
+                counts["reads"] += 1
+
+        threads = [threading.Thread(target=write)] + [threading.Thread(target=read, args=(i,))
+                                                      for i in range(READERS)]
+        for thread in threads:
+            thread.start()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            lags.extend(replicas.lag())
+            time.sleep(0.01)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        consistent = []
+        eventual = []
+        recipe_manager = all_accounts.get(email(0)).recipe_manager
+        for i in range(CONSISTENT_READS):
+            started = time.perf_counter()
+            recipe_manager.update_recipe(2, new_title=f"Stew {i}")
+            result = replicas.request({"op": "get", "id": 2}, email(0), min_sequence=change_events.sequence)
+            consistent.append(time.perf_counter() - started)
+            assert result["title"] == f"Stew {i}"
+            started = time.perf_counter()
+            replicas.request({"op": "get", "id": 2}, email(0))
+            eventual.append(time.perf_counter() - started)
+    return (counts["writes"] / seconds, counts["reads"] / seconds, statistics.mean(lags), max(lags),
+            statistics.median(consistent), statistics.median(eventual))
+
+
+def main(argv):
+    accounts = int(argv[0]) if argv else DEFAULT_ACCOUNTS
+    seconds = float(argv[1]) if len(argv) > 1 else DEFAULT_SECONDS
+    password_hasher.configure(n=2 ** 4)
+    for i in range(accounts):
+        user = User(email(i), "Password123")
+        all_accounts.add(user)
+        for j in range(RECIPES_PER_ACCOUNT):
+            user.recipe_manager.create_recipe(f"Recipe {j}", "leek, potato", "1. Chop\n2. Simmer")
+    print(f"{accounts} accounts, {RECIPES_PER_ACCOUNT} recipes each, {READERS} readers, {os.cpu_count()} CPUs")
+    print(f"{'replicas':>8} {'writes/s':>9} {'reads/s':>8} {'mean lag':>9} {'max lag':>8} "
+          f"{'read own write ms':>18} {'eventual read ms':>17}")
+    for replica_count in REPLICA_COUNTS:
+        writes, reads, mean_lag, max_lag, consistent, eventual = run(replica_count, accounts, seconds)
+        print(f"{replica_count:>8} {writes:>9.0f} {reads:>8.0f} {mean_lag:>9.1f} {max_lag:>8} "
+              f"{consistent * 1000:>18.3f} {eventual * 1000:>17.3f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
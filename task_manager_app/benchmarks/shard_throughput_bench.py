@@ -0,0 +1,92 @@
+"""
+Measures the throughput of a sharded deployment at 1, 2, 4 and 8 shards.
+
+For each shard count a ShardRouter is started, accounts are created and
+given a recipe each, and two workloads are driven through it from several
+client threads, each submitting its operations in chunks so the router can
+batch them: logins,
+whose password checks are CPU-bound, and recipe updates and listings, which
+are dominated by the cost of routing. A scatter-gather listing of every
+account is timed as well. Shards only help while there are cores to run
+them on; the number of CPUs is printed with the results.
+
+Run from the task_manager_app directory:
+    python -m benchmarks.shard_throughput_bench [accounts] [operations]
+"""
+import os
+import sys
+import threading
+import time
+
+from sharding import ShardRouter
+
+DEFAULT_ACCOUNTS = 2_000
+DEFAULT_OPERATIONS = 20_000
+SHARD_COUNTS = (1, 2, 4, 8)
+CLIENTS = 8
+CHUNK = 64
+HASH_COST = 2 ** 10
+PASSWORD = "Password123"
+
+
+def email(i):
+    return f"cook{i}@example.com"
+
+
+def drive(router, operations):
+    chunks = [operations[i:i + CHUNK] for i in range(0, len(operations), CHUNK)]
+    errors = []
+
+    def client(mine):
+        for chunk in mine:
+            errors.extend(result for result in router.request_many(chunk) if not result["ok"])
+
+    threads = [threading.Thread(target=client, args=(chunks[i::CLIENTS],)) for i in range(CLIENTS)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if errors:
+        raise RuntimeError(f"{len(errors)} operations failed, for example {errors[0]}")
+    return len(operations) / elapsed
+
+
+def run(shard_count, accounts, operations):
+    with ShardRouter(shard_count, hash_cost=HASH_COST) as router:
+        drive(router, [({"op": "create_account", "email": email(i), "password": PASSWORD}, None)
+                       for i in range(accounts)])
+        logins = drive(router, [({"op": "login", "email": email(i % accounts), "password": PASSWORD}, None)
+                                for i in range(operations // 10)])
+        drive(router, [({"op": "create", "title": "Soup", "ingredients": "leek, potato",
+                         "instructions": "1. Chop\n2. Simmer"}, email(i)) for i in range(accounts)])
+        writes = []
+        for i in range(operations):
+            user = email(i % accounts)
+            if i % 3 == 0:
+                writes.append(({"op": "list", "limit": 10}, user))
+            else:
+                writes.append(({"op": "update", "id": 1, "title": f"Soup {i}"}, user))
+        recipes = drive(router, writes)
+        started = time.perf_counter()
+        for _ in range(20):
+            page = router.view_all_users("admin@example.com", limit=50)
+            assert page["ok"] and len(page["users"]) == 50
+        listing = (time.perf_counter() - started) / 20
+        stats = router.stats()
+    return logins, recipes, listing, stats["mean_batch"]
+
+
+def main(argv):
+    accounts = int(argv[0]) if argv else DEFAULT_ACCOUNTS
+    operations = int(argv[1]) if len(argv) > 1 else DEFAULT_OPERATIONS
+    print(f"{accounts} accounts, {operations} recipe operations, {CLIENTS} clients, {os.cpu_count()} CPUs")
+    print(f"{'shards':>6} {'logins/s':>10} {'recipe ops/s':>13} {'user page ms':>13} {'mean batch':>11}")
+    for shard_count in SHARD_COUNTS:
+        logins, recipes, listing, batch = run(shard_count, accounts, operations)
+        print(f"{shard_count:>6} {logins:>10.0f} {recipes:>13.0f} {listing * 1000:>13.2f} {batch:>11.1f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
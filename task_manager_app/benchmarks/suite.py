@@ -0,0 +1,318 @@
+"""
+Microbenchmarks for the recipe and account hot paths, with JSON baselines
+to catch performance regressions.
+
+Each benchmark times single operations against a collection or registry of
+a given size and reports latency percentiles; the memory each fixture takes
+per recipe or account is measured with tracemalloc while it is built, and
+tracemalloc is off while timing. Console output from the perform_* methods
+and create_account goes to a writer that discards it, so formatting and
+terminal I/O do not skew the timings.
+
+Run from the task_manager_app directory:
+    python -m benchmarks.suite --sizes 100 1000 10000 --save-baseline baseline.json
+    python -m benchmarks.suite --sizes 100 1000 10000 --baseline baseline.json --threshold 0.25
+
+With --baseline, the process exits with status 1 if any median latency or
+memory figure is worse than the baseline by more than the threshold. The
+suite runs in several fresh processes and keeps the best figures, and a
+suspected regression is only reported if the suite shows it again when run
+a second time, since timings on a shared machine are noisy.
+"""
+import argparse
+import contextlib
+import gc
+import itertools
+import json
+import multiprocessing
+import random
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+from account_registry import AccountRegistry
+from input_utils import InputUtils
+from password_hashing import password_hasher
+from recipe_manager import RecipeManager
+from user import User
+from user_interface_manager import UserInterfaceManager
+
+DEFAULT_SIZES = [100, 1_000, 10_000, 100_000, 1_000_000]
+SAMPLES = 1_000
+ROUNDS = 5
+WARMUP = 50
+HASH_SAMPLES = 20
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_PROCESSES = 3
+PAGE_SIZE = 20
+PASSWORD = "Password123"
+INGREDIENTS = ["onion", "garlic", "tomato", "basil", "leek", "potato", "rice", "egg", "flour", "butter"]
+
+
+class NullOutput:
+    """A text stream that discards everything written to it."""
+
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def recipe_rows(count, rng):
+    for i in range(count):
+        yield (f"Recipe number {i}", ", ".join(rng.sample(INGREDIENTS, 4)),
+               f"1. Chop the vegetables\n2. Cook batch {i} for 25 minutes")
+
+
+def measure_build(build):
+    """
+    Builds a fixture while tracing allocations.
+
+    Returns:
+        tuple[object, int]: The fixture and the bytes it allocated.
+    """
+    gc.collect()
+    tracemalloc.start()
+    fixture = build()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return fixture, allocated
+
+
+def time_operations(operation, arguments):
+    """
+    Times an operation once per argument, after a warm-up.
+
+    The arguments are split into ROUNDS rounds and each figure is the best
+    of the rounds, which filters out most of the noise from other processes.
+
+    Returns:
+        dict[str, float]: The mean and 50th, 95th and 99th percentile latencies in microseconds.
+    """
+    arguments = list(arguments)
+    for argument in arguments[:WARMUP]:
+        operation(argument)
+    clock = time.perf_counter_ns
+    rounds = []
+    gc.disable()
+    try:
+        for start in range(ROUNDS):
+            timings = []
+            for argument in arguments[start::ROUNDS]:
+                started = clock()
+                operation(argument)
+                timings.append(clock() - started)
+            timings.sort()
+            rounds.append(timings)
+    finally:
+        gc.enable()
+
+    def percentile(timings, fraction):
+        return timings[min(len(timings) - 1, int(fraction * len(timings)))] / 1e3
+
+    return {"p50_us": min(percentile(timings, 0.50) for timings in rounds),
+            "p95_us": min(percentile(timings, 0.95) for timings in rounds),
+            "p99_us": min(percentile(timings, 0.99) for timings in rounds),
+            "mean_us": min(sum(timings) / len(timings) for timings in rounds) / 1e3}
+
+
+def recipe_benchmarks(size, rng):
+    """
+    Benchmarks creating, updating, deleting and listing recipes in a collection of the given size.
+    """
+    def build():
+        manager = RecipeManager("bench@example.com")
+        manager.perform_bulk_create_recipes(list(recipe_rows(size, rng)))
+        return manager
+
+    manager, allocated = measure_build(build)
+    results = {f"memory.recipe_bytes@{size}": {"bytes": allocated / size}}
+    ids = [rng.randrange(1, size + 1) for _ in range(SAMPLES)]
+    results[f"recipe.create@{size}"] = time_operations(
+        lambda i: manager.perform_create_recipe(f"New recipe {i}", "onion, salt", "Cook it."), range(SAMPLES))
+    results[f"recipe.update@{size}"] = time_operations(
+        lambda recipe_id: manager.perform_update_recipe(recipe_id, "Renamed", "leek, rice", None), ids)
+
+    def delete(recipe_id):
+        if not manager.perform_delete_recipe(recipe_id):
+            manager.perform_delete_recipe(manager.recipe_ids[0])
+
+    results[f"recipe.delete@{size}"] = time_operations(delete, ids)
+    output = NullOutput()
+    offsets = [rng.randrange(0, max(1, len(manager) - PAGE_SIZE)) for _ in range(SAMPLES)]
+    results[f"recipe.list_page@{size}"] = time_operations(
+        lambda offset: manager.write_recipes(output, offset=offset, limit=PAGE_SIZE), offsets)
+    return results
+
+
+def account_benchmarks(size, rng):
+    """
+    Benchmarks login lookups and create_account's duplicate check against a registry of the given size.
+    """
+    password_hash = User.hash_password(PASSWORD)
+
+    def build():
+        return AccountRegistry(User(f"user{i}@example.com", None, password_hash=password_hash)
+                               for i in range(size))
+
+    registry, allocated = measure_build(build)
+    results = {f"memory.account_bytes@{size}": {"bytes": allocated / size}}
+    emails = [f"USER{rng.randrange(size)}@example.com" for _ in range(SAMPLES)]
+    results[f"account.lookup@{size}"] = time_operations(registry.get, emails)
+    for email in emails:
+        registry.authenticate(email, PASSWORD)
+    results[f"account.login_cached@{size}"] = time_operations(
+        lambda email: registry.authenticate(email, PASSWORD), emails)
+
+    interface_manager = UserInterfaceManager()
+    interface_manager.all_accounts = registry
+    pending = itertools.cycle(emails)
+    with mock.patch.object(InputUtils, "get_email_address", lambda console=None: next(pending)), \
+            mock.patch.object(InputUtils, "get_password", lambda console=None: PASSWORD):
+        results[f"account.create_duplicate@{size}"] = time_operations(
+            lambda _: interface_manager.create_account(), emails)
+    return results
+
+
+def hash_benchmark():
+    """
+    Benchmarks User.hash_password, which does not depend on any size.
+    """
+    return {"user.hash_password": time_operations(User.hash_password, [PASSWORD] * HASH_SAMPLES)}
+
+
+def run(sizes, seed=1):
+    """
+    Runs every benchmark at every size.
+
+    Returns:
+        dict[str, dict[str, float]]: The figures of each benchmark, keyed by name and size.
+    """
+    rng = random.Random(seed)
+    results = {}
+    with contextlib.redirect_stdout(NullOutput()):
+        results.update(hash_benchmark())
+        for size in sizes:
+            results.update(recipe_benchmarks(size, rng))
+            results.update(account_benchmarks(size, rng))
+            gc.collect()
+    return results
+
+
+def run_configured(sizes, hash_cost):
+    password_hasher.configure(n=hash_cost)
+    try:
+        return run(sizes)
+    finally:
+        password_hasher.shutdown()
+
+
+def run_in_processes(sizes, hash_cost, processes):
+    """
+    Runs the suite in several fresh processes, one after the other, and keeps
+    the best value of every figure. Timings differ between processes by more
+    than they do within one, with the memory layout each process happens to
+    get, so one process is not enough to tell a regression from bad luck.
+    """
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for _ in range(processes):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results.append(executor.submit(run_configured, sizes, hash_cost).result())
+    return best_of(*results)
+
+
+def best_of(*runs):
+    """
+    Combines runs, keeping the best (lowest) value of every figure.
+    """
+    return {name: {metric: min(other.get(name, {}).get(metric, value) for other in runs)
+                   for metric, value in figures.items()}
+            for name, figures in runs[0].items()}
+
+
+def find_regressions(results, baseline, threshold):
+    """
+    Compares results with a baseline.
+
+    Only the median latency and the memory figures are compared; the tail
+    percentiles are reported but too noisy to fail a run on.
+
+    Args:
+        results (dict): The figures of this run.
+        baseline (dict): The figures of the baseline run.
+        threshold (float): The tolerated relative slowdown, such as 0.25 for 25%.
+
+    Returns:
+        list[str]: A description of each regression.
+    """
+    regressions = []
+    for name, figures in results.items():
+        for metric in ("p50_us", "bytes"):
+            if metric not in figures or metric not in baseline.get(name, {}):
+                continue
+            before, after = baseline[name][metric], figures[metric]
+            if before > 0 and after > before * (1 + threshold):
+                regressions.append(f"{name} {metric}: {before:.2f} -> {after:.2f} (+{after / before - 1:.0%})")
+    return regressions
+
+
+def report(results, stream):
+    stream.write(f"{'benchmark':<36} {'p50 us':>10} {'p95 us':>10} {'p99 us':>10} {'bytes/item':>11}\n")
+    for name, figures in results.items():
+        if "bytes" in figures:
+            stream.write(f"{name:<36} {'':>10} {'':>10} {'':>10} {figures['bytes']:11.0f}\n")
+        else:
+            stream.write(f"{name:<36} {figures['p50_us']:10.2f} {figures['p95_us']:10.2f} "
+                         f"{figures['p99_us']:10.2f}\n")
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Run the recipe and account microbenchmarks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="The collection and registry sizes to benchmark.")
+    parser.add_argument("--baseline", help="A JSON baseline to compare against.")
+    parser.add_argument("--save-baseline", help="Write this run's figures to a JSON file.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="The relative slowdown tolerated before failing, e.g. 0.25 for 25%%.")
+    parser.add_argument("--hash-cost", type=int, default=password_hasher.n,
+                        help="The scrypt cost parameter N used for user.hash_password.")
+    parser.add_argument("--processes", type=int, default=DEFAULT_PROCESSES,
+                        help="How many fresh processes to run the suite in, keeping the best figures.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Runs the suite and compares it with a baseline if one is given.
+
+    Returns:
+        int: 1 if a regression was found, otherwise 0.
+    """
+    arguments = parse_arguments(argv)
+    results = run_in_processes(arguments.sizes, arguments.hash_cost, arguments.processes)
+    report(results, sys.stdout)
+    if arguments.save_baseline:
+        with open(arguments.save_baseline, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+    if arguments.baseline:
+        with open(arguments.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = find_regressions(results, baseline, arguments.threshold)
+        if regressions:
+            # A slowdown must also show up in a second run to count, so a
+            # burst of load from another process does not fail the check.
+            results = best_of(results, run_in_processes(arguments.sizes, arguments.hash_cost,
+                                                        arguments.processes))
+            regressions = find_regressions(results, baseline, arguments.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
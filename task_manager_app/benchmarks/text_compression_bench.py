@@ -0,0 +1,98 @@
+"""
+Measures how much compressing instructions with a trained preset dictionary
+saves, and what it adds to reading them.
+
+Instructions are generated from a bank of common steps with varying
+quantities and times, 5 to 12 steps each, numbered as users type them. The
+dictionary is trained on a sample of the corpus and the rest is compressed
+with plain zlib and with the dictionary. Reading recipe.instructions is then
+timed with compression off, with compression on and the text in the cache,
+and with compression on and the cache disabled, so every read decompresses.
+
+Run from the task_manager_app directory:
+    python -m benchmarks.text_compression_bench [recipes]
+"""
+import random
+import sys
+import time
+import zlib
+
+from blob_store import blob_store
+from favourite_recipes import FavouriteRecipes
+from text_compression import text_compressor
+
+DEFAULT_COUNT = 20_000
+TRAINING_SHARE = 0.1
+READS = 200_000
+HOT_RECIPES = 100
+STEPS = ["Preheat the oven to {t}C.", "Chop the onions and crush {n} cloves of garlic.",
+         "Peel and dice {n} potatoes.", "Whisk {n} eggs with a pinch of salt.",
+         "Heat {n} tablespoons of olive oil in a large pan over a medium heat.",
+         "Fry the onions until soft and golden, about {m} minutes.", "Add the garlic and cook for 1 minute.",
+         "Simmer for {m} minutes, stirring occasionally.", "Season to taste with salt and pepper.",
+         "Bake for {m} minutes until golden brown.", "Leave to rest for {m} minutes before serving.",
+         "Bring a large pan of salted water to the boil.", "Stir in {n}00g of grated cheese.",
+         "Serve hot with crusty bread.", "Garnish with chopped parsley.", "Blend until smooth."]
+
+
+def instructions(rng, i):
+    steps = rng.sample(STEPS, rng.randint(5, 12))
+    lines = [step.format(t=rng.choice((160, 180, 200, 220)), n=rng.randint(1, 6), m=rng.randint(2, 45))
+             for step in steps]
+    if i % 4 == 0:
+        lines.append(f"My grandmother's tip {i}: use a cast iron pan.")
+    return "\n".join(f"{n}. {line}" for n, line in enumerate(lines, 1))
+
+
+def compressed_size(texts, dictionary=None):
+    total = 0
+    for text in texts:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=dictionary) if dictionary is not None \
+            else zlib.compressobj(9, zlib.DEFLATED, -15)
+        total += len(compressor.compress(text.encode("utf-8")) + compressor.flush())
+    return total
+
+
+def time_reads(recipes, reads):
+    started = time.perf_counter_ns()
+    for i in range(reads):
+        recipes[i % len(recipes)].instructions
+    return (time.perf_counter_ns() - started) / reads
+
+
+def main(argv):
+    count = int(argv[0]) if argv else DEFAULT_COUNT
+    rng = random.Random(1)
+    texts = [instructions(rng, i) for i in range(count)]
+    training = texts[:int(count * TRAINING_SHARE)]
+    corpus = texts[len(training):]
+    raw = sum(len(text.encode("utf-8")) for text in corpus)
+    plain = compressed_size(corpus)
+    text_compressor.train(training)
+    dictionary = text_compressor.dictionaries[-1]
+    with_dictionary = compressed_size(corpus, dictionary)
+    print(f"{len(corpus)} instructions, mean {raw / len(corpus):.0f} bytes; "
+          f"dictionary of {len(dictionary)} bytes trained on {len(training)}")
+    print(f"zlib                 {plain / len(corpus):7.1f} bytes/text  ratio {raw / plain:.2f}")
+    print(f"zlib + dictionary    {with_dictionary / len(corpus):7.1f} bytes/text  ratio {raw / with_dictionary:.2f}")
+
+    plain_recipes = [FavouriteRecipes(i, "Title", "salt", text) for i, text in enumerate(corpus)]
+    stored_plain = blob_store.stats()["stored_bytes"]
+    text_compressor.configure(enabled=True)
+    packed_recipes = [FavouriteRecipes(i, "Title", "pepper", text) for i, text in enumerate(corpus)]
+    stored_packed = blob_store.stats()["stored_bytes"] - stored_plain
+    print(f"bodies in memory     {stored_plain / len(corpus):7.1f} -> {stored_packed / len(corpus):.1f} bytes/body")
+
+    baseline = time_reads(plain_recipes, READS)
+    text_compressor.configure(cache_size=HOT_RECIPES * 2)
+    hot = time_reads(packed_recipes[:HOT_RECIPES], READS)
+    text_compressor.configure(cache_size=0)
+    cold = time_reads(packed_recipes, READS)
+    print(f"read, uncompressed   {baseline:7.0f} ns")
+    print(f"read, cached         {hot:7.0f} ns  (+{hot - baseline:.0f} ns)")
+    print(f"read, decompressed   {cold:7.0f} ns  (+{cold - baseline:.0f} ns)")
+    print(text_compressor.stats())
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,60 @@
+"""
+Measures paging, prefix filtering and counting through the EmailIndex
+against sorting a full copy of every email, as the admin listing used to.
+
+Run from the task_manager_app directory:
+    python -m benchmarks.user_listing_bench [sizes...]
+"""
+import random
+import sys
+import time
+
+from email_index import EmailIndex
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DOMAINS = [f"domain{i}.com" for i in range(100)]
+PAGE_SIZE = 20
+REPEATS = 100
+
+
+def time_ms(func):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        func()
+    return (time.perf_counter() - start) / REPEATS * 1e3
+
+
+def run(size):
+    random.seed(1)
+    emails = [f"user{i}@{random.choice(DOMAINS)}" for i in range(size)]
+    index = EmailIndex()
+    start = time.perf_counter()
+    for email in emails:
+        index.add(email)
+    build_s = time.perf_counter() - start
+    cursor = emails[size // 2]
+
+    def page():
+        return list(zip(range(PAGE_SIZE), index.iter_from(cursor)))
+
+    def domain_page():
+        return list(zip(range(PAGE_SIZE), index.iter_from(cursor, domain="domain7.com")))
+
+    page_ms = time_ms(page)
+    domain_ms = time_ms(domain_page)
+    count_ms = time_ms(lambda: index.count(prefix="user1"))
+    full_ms = time_ms(lambda: sorted(emails)[:PAGE_SIZE]) if size <= 100_000 else None
+    return build_s, page_ms, domain_ms, count_ms, full_ms
+
+
+def main(argv):
+    sizes = [int(arg) for arg in argv] or DEFAULT_SIZES
+    print(f"{'users':>10} {'build s':>8} {'page ms':>8} {'domain ms':>10} {'count ms':>9} {'sort-all ms':>12}")
+    for size in sizes:
+        build_s, page_ms, domain_ms, count_ms, full_ms = run(size)
+        full = f"{full_ms:12.2f}" if full_ms is not None else f"{'-':>12}"
+        print(f"{size:>10} {build_s:8.2f} {page_ms:8.3f} {domain_ms:10.3f} {count_ms:9.3f} {full}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,173 @@
+import hashlib
+import sys
+import threading
+
+from ingredient_table import ingredient_table
+from text_compression import text_compressor
+
+
+class RecipeBody:
+    """
+    The ingredients and instructions of a recipe, shared by every recipe
+    with the same text. A body never changes once created.
+
+    Attributes:
+        digest (bytes): The hash of the ingredient and instruction text the body is stored under.
+        ingredient_tokens (tuple[str, ...]): The distinct normalised ingredients, interned
+         in the shared ingredient table.
+        ingredient_text (str): The ingredients as entered, or None if joining the tokens
+         with ', ' gives them back.
+        instructions (str): The cooking instructions.
+        packed_instructions (str | bytes): The instructions as stored, compressed by the
+         shared text compressor when compression is enabled and worthwhile.
+        references (int): How many recipes use the body.
+    """
+
+    __slots__ = ("digest", "ingredient_tokens", "ingredient_text", "packed_instructions", "references")
+
+    def __init__(self, digest, ingredients, instructions):
+        self.digest = digest
+        self.ingredient_tokens = ingredient_table.parse(ingredients)
+        self.ingredient_text = None if ingredients == ", ".join(self.ingredient_tokens) else ingredients
+        self.packed_instructions = text_compressor.pack(instructions)
+        self.references = 0
+
+    def size(self):
+        """
+        Returns the bytes the body's text and tokens take in memory.
+        """
+        return (sys.getsizeof(self.packed_instructions) + sys.getsizeof(self.ingredient_tokens) +
+                (sys.getsizeof(self.ingredient_text) if self.ingredient_text is not None else 0))
+
+    @property
+    def ingredients(self):
+        if self.ingredient_text is not None:
+            return self.ingredient_text
+        return ", ".join(self.ingredient_tokens)
+
+    @property
+    def instructions(self):
+        return text_compressor.unpack(self.digest, self.packed_instructions)
+
+
+class BlobStore:
+    """
+    A process-wide, content-addressed store of recipe bodies.
+
+    Popular recipes are saved by many users, and each copy used to carry its
+    own, possibly long, instructions. Bodies are instead stored once under a
+    hash of their ingredient and instruction text, and each recipe holds a
+    counted reference to its body. A body is never changed in place: editing
+    a recipe looks up or creates the body for the new text and lets go of
+    the old one, so the other recipes sharing it are unaffected. A body is
+    dropped when the last recipe referring to it is deleted or released.
+
+    When the shared text compressor is enabled, long instructions are stored
+    compressed. Bodies stored while its dictionary was still being trained
+    are compressed as soon as the dictionary is ready.
+
+    Attributes:
+        bodies (dict[bytes, RecipeBody]): The stored bodies, keyed by digest.
+        references (int): How many recipes refer to a body.
+        stored_bytes (int): The bytes taken by the stored bodies.
+        logical_bytes (int): The bytes the bodies would take if every recipe had its own copy.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new, empty instance of BlobStore.
+        """
+        self.bodies = {}
+        self.references = 0
+        self.stored_bytes = 0
+        self.logical_bytes = 0
+        self.generation = text_compressor.generation
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def digest(ingredients, instructions):
+        """
+        Returns the content address of a recipe's ingredients and instructions.
+        """
+        return hashlib.blake2b(f"{ingredients}\0{instructions}".encode("utf-8"), digest_size=16).digest()
+
+    def acquire(self, ingredients, instructions):
+        """
+        Returns the body holding the given text, storing it if it is new, and takes a reference to it.
+
+        Args:
+            ingredients (str): The ingredients as entered.
+            instructions (str): The cooking instructions.
+
+        Returns:
+            RecipeBody: The shared body, to be given back with release.
+        """
+        digest = self.digest(ingredients, instructions)
+        with self.lock:
+            body = self.bodies.get(digest)
+            if body is None:
+                body = self.bodies[digest] = RecipeBody(digest, ingredients, instructions)
+                self.stored_bytes += body.size()
+                if self.generation != text_compressor.generation:
+                    self.repack()
+            body.references += 1
+            self.references += 1
+            self.logical_bytes += body.size()
+            return body
+
+    def release(self, body):
+        """
+        Gives back a reference taken by acquire, dropping the body if no recipe uses it any more.
+
+        Args:
+            body (RecipeBody): The body, or None.
+        """
+        if body is None:
+            return
+        with self.lock:
+            size = body.size()
+            body.references -= 1
+            self.references -= 1
+            self.logical_bytes -= size
+            if body.references == 0:
+                del self.bodies[body.digest]
+                self.stored_bytes -= size
+                ingredient_table.release(body.ingredient_tokens)
+
+    def repack(self):
+        """
+        Compresses the stored instructions that are not compressed yet, for
+        example because they were stored before the compressor had a dictionary.
+        The caller must hold the lock.
+        """
+        self.generation = text_compressor.generation
+        for body in self.bodies.values():
+            if not isinstance(body.packed_instructions, str):
+                continue
+            packed = text_compressor.pack(body.packed_instructions)
+            if packed is body.packed_instructions:
+                continue
+            old_size = body.size()
+            body.packed_instructions = packed
+            change = body.size() - old_size
+            self.stored_bytes += change
+            self.logical_bytes += change * body.references
+
+    def __len__(self):
+        return len(self.bodies)
+
+    def stats(self):
+        """
+        Returns how much the store saves by sharing bodies.
+
+        Returns:
+            dict[str, float]: The stored bodies, the references to them, the dedupe ratio
+             (references per body) and the bytes stored and saved.
+        """
+        with self.lock:
+            return {"bodies": len(self.bodies), "references": self.references,
+                    "dedupe_ratio": round(self.references / len(self.bodies), 3) if self.bodies else 1.0,
+                    "stored_bytes": self.stored_bytes, "bytes_saved": self.logical_bytes - self.stored_bytes}
+
+
+blob_store = BlobStore()
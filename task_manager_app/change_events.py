@@ -0,0 +1,487 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+
+DEFAULT_CAPACITY = 65_536
+DEFAULT_QUEUE_SIZE = 1024
+
+
+class EventsLost(Exception):
+    """
+    Raised when events a subscriber asked for have already left the replay buffer.
+    """
+
+
+class ChangeEvent:
+    """
+    Something that changed in the accounts or recipes.
+
+    Attributes:
+        sequence (int): The event's position in the stream, one higher than the event before it.
+        timestamp (float): When the change was made, in seconds since the epoch.
+    """
+
+    __slots__ = ("sequence", "timestamp")
+
+    def __init__(self):
+        self.sequence = None
+        self.timestamp = time.time()
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for cls in type(self).__mro__
+                           for name in getattr(cls, "__slots__", ()))
+        return f"{type(self).__name__}({fields})"
+
+
+class AccountCreated(ChangeEvent):
+    """
+    An account was registered. The password hash is not carried, so events
+    kept for replay never hold credentials.
+
+    Attributes:
+        email (str): The account's email address.
+        is_admin (bool): Whether the account is an administrator.
+    """
+
+    __slots__ = ("email", "is_admin")
+
+    def __init__(self, email, is_admin):
+        super().__init__()
+        self.email = email
+        self.is_admin = is_admin
+
+
+class AccountDeleted(ChangeEvent):
+    """
+    An account and its recipes were deleted.
+
+    Attributes:
+        email (str): The account's email address.
+        is_admin (bool): Whether the account was an administrator.
+    """
+
+    __slots__ = ("email", "is_admin")
+
+    def __init__(self, email, is_admin):
+        super().__init__()
+        self.email = email
+        self.is_admin = is_admin
+
+
+class RecipeEvent(ChangeEvent):
+    """
+    A recipe was created, updated or deleted.
+
+    Attributes:
+        user_email (str): The email of the user whose collection the recipe is in.
+        recipe_id (int): The recipe's ID.
+    """
+
+    __slots__ = ("user_email", "recipe_id")
+
+    def __init__(self, user_email, recipe_id):
+        super().__init__()
+        self.user_email = user_email
+        self.recipe_id = recipe_id
+
+
+class RecipeText:
+    """
+    The ingredients and instructions of a recipe event that was copied to
+    another process, where the sender's shared bodies are not available.
+
+    Attributes:
+        ingredients (str): The ingredients, as entered.
+        instructions (str): The instructions.
+    """
+
+    __slots__ = ("ingredients", "instructions")
+
+    def __init__(self, ingredients, instructions):
+        self.ingredients = ingredients
+        self.instructions = instructions
+
+
+class RecipeBodyEvent(RecipeEvent):
+    """
+    A recipe event that refers to the recipe's shared body rather than
+    copying its text, so the replay buffer holds no text of its own. When
+    the event is pickled, for example to ship it to a replica, the body is
+    replaced by its text.
+
+    Attributes:
+        title (str): The title, or None if it was not changed.
+        body (RecipeBody | RecipeText): The ingredients and instructions, or None if
+         they were not changed.
+    """
+
+    __slots__ = ("title", "body")
+
+    def __init__(self, user_email, recipe_id, title, body):
+        super().__init__(user_email, recipe_id)
+        self.title = title
+        self.body = body
+
+    @property
+    def ingredients(self):
+        return self.body.ingredients if self.body is not None else None
+
+    @property
+    def instructions(self):
+        return self.body.instructions if self.body is not None else None
+
+    def __getstate__(self):
+        state = {name: getattr(self, name) for cls in type(self).__mro__ for name in getattr(cls, "__slots__", ())}
+        if self.body is not None:
+            state["body"] = RecipeText(self.body.ingredients, self.body.instructions)
+        return None, state
+
+
+class RecipeCreated(RecipeBodyEvent):
+    """
+    A recipe was created.
+    """
+
+    __slots__ = ()
+
+
+class RecipeUpdated(RecipeBodyEvent):
+    """
+    A recipe was updated. The title is set only if it changed, and the body
+    only if the ingredients or the instructions changed.
+
+    Attributes:
+        version (int): The recipe's version after the update.
+    """
+
+    __slots__ = ("version",)
+
+    def __init__(self, user_email, recipe_id, version, title, body):
+        super().__init__(user_email, recipe_id, title, body)
+        self.version = version
+
+
+class RecipeDeleted(RecipeEvent):
+    """
+    A recipe was deleted.
+    """
+
+    __slots__ = ()
+
+
+class Subscription:
+    """
+    A synchronous subscriber registered with an EventBus.
+
+    Each subscription reads the bus's buffer from its own cursor, so events
+    reach it in sequence order however many threads are delivering, and a
+    slow subscriber only holds up the thread delivering to it. If it falls
+    so far behind that events it has not read leave the buffer, it skips to
+    the oldest event still there and counts the ones it missed.
+
+    Attributes:
+        callback (callable): Called with each event.
+        types (tuple[type, ...]): The event types the subscriber wants, or None for every event.
+        last_sequence (int): The sequence number of the last event looked at.
+        lost (int): How many events left the buffer before the subscriber read them.
+    """
+
+    __slots__ = ("bus", "callback", "types", "last_sequence", "lost", "lock")
+
+    def __init__(self, bus, callback, types, after):
+        self.bus = bus
+        self.callback = callback
+        self.types = types
+        self.last_sequence = after
+        self.lost = 0
+        self.lock = threading.Lock()
+
+    def catch_up(self):
+        """
+        Calls the subscriber with every event after its cursor. If another thread
+        is already doing so, that thread also delivers the events published since,
+        and this returns at once.
+        """
+        while self.last_sequence < self.bus.sequence:
+            if not self.lock.acquire(blocking=False):
+                return
+            try:
+                events, self.lost = self.bus.read_from(self)
+                for event in events:
+                    self.last_sequence = event.sequence
+                    if self.types is not None and not isinstance(event, self.types):
+                        continue
+                    try:
+                        self.callback(event)
+                    except Exception:
+                        self.bus.errors += 1
+            finally:
+                self.lock.release()
+
+    def close(self):
+        """
+        Stops delivering events to the subscriber.
+        """
+        self.bus.unsubscribe(self)
+
+
+class AsyncSubscription:
+    """
+    An asynchronous subscriber registered with an EventBus, read with async for.
+
+    Events are handed to the subscriber's event loop through a bounded
+    queue, so a slow consumer never holds up the code making changes. If
+    the queue overflows the subscription is marked as lagging, and the
+    consumer catches up from the bus's replay buffer the next time it reads.
+
+    Attributes:
+        types (tuple[type, ...]): The event types the subscriber wants, or None for every event.
+        last_sequence (int): The sequence number of the last event read.
+    """
+
+    def __init__(self, bus, loop, types, after, queue_size):
+        self.bus = bus
+        self.loop = loop
+        self.types = types
+        self.last_sequence = after
+        self.queue = asyncio.Queue(queue_size)
+        self.lagging = False
+        self.closed = False
+
+    def deliver(self, event):
+        """
+        Queues an event; called on the subscriber's event loop.
+        """
+        if self.lagging:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.lagging = True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            if self.closed:
+                raise StopAsyncIteration
+            if self.lagging and self.queue.empty():
+                self.lagging = False
+                for event in self.bus.replay(self.last_sequence, self.types):
+                    self.deliver(event)
+                continue
+            event = await self.queue.get()
+            if event is None:
+                continue
+            if event.sequence <= self.last_sequence:
+                continue
+            self.last_sequence = event.sequence
+            return event
+
+    def close(self):
+        """
+        Stops delivering events, ending the async for loop reading them.
+        """
+        self.bus.unsubscribe(self)
+        self.closed = True
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+
+class EventBus:
+    """
+    An ordered stream of change events with synchronous and asynchronous subscribers.
+
+    Every published event is given the next sequence number and kept in a
+    ring buffer of the last capacity events, so a subscriber that falls
+    behind, or a structure built from a snapshot taken at some sequence
+    number, can replay what it missed. Replaying from further back than the
+    buffer reaches raises EventsLost, and the subscriber has to rebuild from
+    scratch.
+
+    A writer publishes while it still holds the locks that order its
+    change, so sequence numbers follow the order the changes were made.
+    Publishing only numbers and buffers the event; once the writer has
+    released its locks it calls deliver, which brings each synchronous
+    subscriber up to date from its own cursor. Subscribers therefore run
+    outside the writer's locks and may read or change the accounts and
+    recipes themselves, and since a subscriber that is already being called
+    by another thread is skipped rather than waited for, a slow subscriber
+    never holds up writers. Events refer to recipes' shared bodies instead
+    of copying their text, and account events carry no password hash.
+
+    Attributes:
+        capacity (int): How many of the latest events are kept for replay.
+        sequence (int): The sequence number of the last event published.
+        buffer (deque[ChangeEvent]): The latest events, oldest first.
+        subscribers (list): The synchronous and asynchronous subscriptions.
+        synchronous (tuple[Subscription, ...]): The synchronous subscriptions, replaced
+         rather than changed so deliver can read it without the lock.
+        errors (int): How many times a synchronous subscriber raised an exception.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        """
+        Initializes a new, empty instance of EventBus.
+
+        Args:
+            capacity (int, optional): How many of the latest events to keep for replay.
+             Defaults to DEFAULT_CAPACITY.
+        """
+        self.capacity = capacity
+        self.sequence = 0
+        self.buffer = deque(maxlen=capacity)
+        self.subscribers = []
+        self.synchronous = ()
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def publish(self, event):
+        """
+        Numbers an event, keeps it for replay and hands it to the asynchronous
+        subscribers. The synchronous ones receive it on the next deliver.
+
+        Args:
+            event (ChangeEvent): The event.
+
+        Returns:
+            int: The event's sequence number.
+        """
+        with self.lock:
+            self.sequence += 1
+            event.sequence = self.sequence
+            self.buffer.append(event)
+            for subscriber in self.subscribers:
+                if isinstance(subscriber, AsyncSubscription) and (subscriber.types is None or
+                                                                   isinstance(event, subscriber.types)):
+                    subscriber.loop.call_soon_threadsafe(subscriber.deliver, event)
+            return event.sequence
+
+    def deliver(self):
+        """
+        Brings every synchronous subscriber up to date. Writers call it after
+        releasing the locks they published under.
+        """
+        for subscriber in self.synchronous:
+            subscriber.catch_up()
+
+    def read_from(self, subscription):
+        """
+        Returns the events after a subscription's cursor that are still in the
+        buffer, and its count of lost events including any that have left it.
+        """
+        with self.lock:
+            oldest = self.sequence - len(self.buffer) + 1
+            lost = subscription.lost + max(oldest - 1 - subscription.last_sequence, 0)
+            count = self.sequence - max(subscription.last_sequence, oldest - 1)
+            return list(itertools.islice(reversed(self.buffer), count))[::-1], lost
+
+    def replay(self, after, types=None):
+        """
+        Returns the events published after a sequence number that are still in the buffer.
+
+        Args:
+            after (int): The sequence number of the last event already seen; 0 for every event.
+            types (tuple[type, ...], optional): Only return events of these types. Defaults to every type.
+
+        Returns:
+            list[ChangeEvent]: The events, oldest first.
+
+        Raises:
+            EventsLost: If some of those events have already left the buffer.
+        """
+        with self.lock:
+            return self.buffered(after, types)
+
+    def check_replayable(self, after):
+        """
+        Raises EventsLost if events after a sequence number have left the buffer. The caller must hold the lock.
+        """
+        oldest = self.sequence - len(self.buffer) + 1
+        if after + 1 < oldest:
+            raise EventsLost(f"Events {after + 1} to {oldest - 1} are no longer in the buffer.")
+
+    def buffered(self, after, types):
+        """
+        Returns the events after a sequence number, as replay does. The caller must hold the lock.
+        """
+        self.check_replayable(after)
+        # Counted from the newest end, so reading recent events does not walk the whole buffer.
+        events = list(itertools.islice(reversed(self.buffer), self.sequence - after))[::-1]
+        return [event for event in events if types is None or isinstance(event, types)]
+
+    def subscribe(self, callback, types=None, after=None):
+        """
+        Registers a synchronous subscriber.
+
+        Args:
+            callback (callable): Called with each event.
+            types (tuple[type, ...], optional): Only deliver events of these types. Defaults to every type.
+            after (int, optional): First replay the events after this sequence number, so
+             nothing published since is missed. Defaults to only new events.
+
+        Returns:
+            Subscription: The subscription, whose close method unsubscribes.
+
+        Raises:
+            EventsLost: If after is further back than the buffer reaches.
+        """
+        with self.lock:
+            if after is None:
+                after = self.sequence
+            self.check_replayable(after)
+            subscription = Subscription(self, callback, types, after)
+            self.subscribers.append(subscription)
+            self.synchronous += (subscription,)
+        subscription.catch_up()
+        return subscription
+
+    def subscribe_async(self, types=None, after=None, queue_size=DEFAULT_QUEUE_SIZE):
+        """
+        Registers an asynchronous subscriber on the running event loop.
+
+        Args:
+            types (tuple[type, ...], optional): Only deliver events of these types. Defaults to every type.
+            after (int, optional): Start after this sequence number, replaying what was
+             published since. Defaults to only new events.
+            queue_size (int, optional): How many events may wait to be read before the
+             subscriber catches up from the buffer instead. Defaults to DEFAULT_QUEUE_SIZE.
+
+        Returns:
+            AsyncSubscription: The subscription, to read with async for.
+        """
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            subscription = AsyncSubscription(self, loop, types, self.sequence if after is None else after,
+                                             queue_size)
+            if after is not None:
+                subscription.lagging = True
+            self.subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Removes a subscription; removing one that is not registered does nothing.
+        """
+        with self.lock:
+            if subscription in self.subscribers:
+                self.subscribers.remove(subscription)
+                self.synchronous = tuple(subscriber for subscriber in self.synchronous if subscriber is not subscription)
+
+    def stats(self):
+        """
+        Returns the state of the stream.
+
+        Returns:
+            dict[str, int]: The last sequence number, the oldest one that can be replayed,
+             the number of subscribers, of subscriber errors and of events lost by slow subscribers.
+        """
+        with self.lock:
+            return {"sequence": self.sequence, "oldest_replayable": self.sequence - len(self.buffer) + 1,
+                    "subscribers": len(self.subscribers), "errors": self.errors,
+                    "lost": sum(subscriber.lost for subscriber in self.synchronous)}
+
+
+change_events = EventBus()
@@ -0,0 +1,90 @@
+import threading
+import zlib
+from contextlib import contextmanager
+
+
+def shard_index(key, shard_count):
+    """
+    Picks the shard a key belongs to. CRC-32 is used rather than hash() so the
+    choice is the same in every process.
+
+    Args:
+        key (str): The key, such as a normalised email address.
+        shard_count (int): The number of shards.
+
+    Returns:
+        int: The index of the key's shard.
+    """
+    return zlib.crc32(key.encode("utf-8")) % shard_count
+
+
+class ReadWriteLock:
+    """
+    A lock that lets any number of readers in at once but gives a writer
+    exclusive access.
+
+    Writers are preferred: once a writer is waiting, new readers wait too,
+    so a steady stream of readers cannot starve it. The lock is not
+    reentrant; a thread must not take it again while holding it.
+
+    Attributes:
+        readers (int): How many threads hold the lock for reading.
+        writing (bool): Whether a thread holds the lock for writing.
+        waiting_writers (int): How many threads are waiting to write.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new, unlocked instance of ReadWriteLock.
+        """
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.writing = False
+        self.waiting_writers = 0
+
+    def acquire_read(self):
+        with self.condition:
+            while self.writing or self.waiting_writers:
+                self.condition.wait()
+            self.readers += 1
+
+    def release_read(self):
+        with self.condition:
+            self.readers -= 1
+            if not self.readers:
+                self.condition.notify_all()
+
+    def acquire_write(self):
+        with self.condition:
+            self.waiting_writers += 1
+            while self.writing or self.readers:
+                self.condition.wait()
+            self.waiting_writers -= 1
+            self.writing = True
+
+    def release_write(self):
+        with self.condition:
+            self.writing = False
+            self.condition.notify_all()
+
+    @contextmanager
+    def read_locked(self):
+        """
+        Holds the lock for reading for the duration of a with block.
+        """
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self):
+        """
+        Holds the lock for writing for the duration of a with block.
+        """
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
@@ -0,0 +1,73 @@
+class Console:
+    """
+    Where the interactive menus read their input from and write their
+    messages to.
+
+    By default a console prompts on the terminal with input() and prints to
+    standard output, looking both up at call time so redirecting standard
+    output or patching input still works. Another source of input or
+    destination for output can be passed in instead, so the menus can be
+    driven by a script, a test or another front end.
+
+    Attributes:
+        read_line (callable): Takes a prompt and returns the next line of input,
+         or None to use input().
+        output (file): Where messages are written, or None for standard output.
+    """
+
+    def __init__(self, read_line=None, output=None):
+        """
+        Initializes a new instance of Console.
+
+        Args:
+            read_line (callable, optional): Takes a prompt and returns the next line of input,
+             raising EOFError when there is none. Defaults to input().
+            output (file, optional): Where to write messages. Defaults to standard output.
+        """
+        self.read_line = read_line
+        self.output = output
+
+    @classmethod
+    def from_lines(cls, lines, output=None):
+        """
+        Creates a console that answers every prompt with the next of a sequence of lines.
+
+        Args:
+            lines (iterable[str]): The answers, in order.
+            output (file, optional): Where to write messages. Defaults to standard output.
+
+        Returns:
+            Console: The console.
+        """
+        answers = iter(lines)
+
+        def read_line(prompt):
+            try:
+                return next(answers)
+            except StopIteration:
+                raise EOFError("No more input.") from None
+
+        return cls(read_line, output)
+
+    def read(self, prompt=""):
+        """
+        Reads a line of input after showing a prompt.
+
+        Args:
+            prompt (str, optional): The prompt. Defaults to none.
+
+        Returns:
+            str: The line, without its line ending.
+        """
+        if self.read_line is None:
+            return input(prompt)
+        return self.read_line(prompt)
+
+    def write(self, *values, sep=" ", end="\n"):
+        """
+        Writes a message, taking the same arguments as print.
+        """
+        print(*values, sep=sep, end=end, file=self.output)
+
+
+standard_console = Console()
@@ -0,0 +1,220 @@
+from bisect import bisect_left, bisect_right, insort
+
+# Chunks are split when they reach twice this size.
+CHUNK_SIZE = 512
+
+# Sorts after every character that can follow a prefix, so that
+# prefix + PREFIX_END bounds the keys starting with the prefix.
+PREFIX_END = "\U0010ffff"
+
+
+class SortedKeys:
+    """
+    A sorted collection of strings stored as a list of sorted chunks.
+
+    Inserting into or deleting from one flat sorted list moves every element
+    after the position; with the keys split into chunks of a few hundred,
+    only one chunk is touched. The largest key of each chunk is kept in a
+    separate list, so finding the chunk a key belongs to is a binary search.
+
+    Attributes:
+        chunks (list[list[str]]): The keys, in order, split into chunks.
+        maxes (list[str]): The largest key of each chunk.
+        size (int): The number of keys.
+    """
+
+    def __init__(self, keys=()):
+        """
+        Initializes a new instance of SortedKeys.
+
+        Args:
+            keys (iterable[str], optional): Distinct keys to start with. Defaults to none.
+        """
+        keys = sorted(keys)
+        self.chunks = [keys[i:i + CHUNK_SIZE] for i in range(0, len(keys), CHUNK_SIZE)]
+        self.maxes = [chunk[-1] for chunk in self.chunks]
+        self.size = len(keys)
+
+    def add(self, key):
+        """
+        Adds a key that is not already present.
+        """
+        if not self.chunks:
+            self.chunks.append([key])
+            self.maxes.append(key)
+            self.size = 1
+            return
+        position = min(bisect_left(self.maxes, key), len(self.chunks) - 1)
+        chunk = self.chunks[position]
+        insort(chunk, key)
+        self.maxes[position] = chunk[-1]
+        self.size += 1
+        if len(chunk) >= 2 * CHUNK_SIZE:
+            self.chunks[position:position + 1] = [chunk[:CHUNK_SIZE], chunk[CHUNK_SIZE:]]
+            self.maxes[position:position + 1] = [chunk[CHUNK_SIZE - 1], chunk[-1]]
+
+    def remove(self, key):
+        """
+        Removes a key.
+
+        Raises:
+            KeyError: If the key is not present.
+        """
+        position = bisect_left(self.maxes, key)
+        if position == len(self.chunks):
+            raise KeyError(key)
+        chunk = self.chunks[position]
+        index = bisect_left(chunk, key)
+        if chunk[index] != key:
+            raise KeyError(key)
+        del chunk[index]
+        self.size -= 1
+        if chunk:
+            self.maxes[position] = chunk[-1]
+        else:
+            del self.chunks[position]
+            del self.maxes[position]
+
+    def rank(self, key):
+        """
+        Counts the keys that sort before a key.
+        """
+        position = bisect_left(self.maxes, key)
+        if position == len(self.chunks):
+            return self.size
+        return sum(len(chunk) for chunk in self.chunks[:position]) + bisect_left(self.chunks[position], key)
+
+    def count_prefix(self, prefix):
+        """
+        Counts the keys starting with a prefix.
+        """
+        if not prefix:
+            return self.size
+        return self.rank(prefix + PREFIX_END) - self.rank(prefix)
+
+    def iter_from(self, after=None, prefix=""):
+        """
+        Yields keys in order, starting after a cursor.
+
+        Args:
+            after (str, optional): Start with the first key greater than this. Defaults to the start.
+            prefix (str, optional): Only yield keys starting with this. Defaults to every key.
+
+        Yields:
+            str: The keys.
+        """
+        if after is not None and after >= prefix:
+            position = bisect_right(self.maxes, after)
+            index = bisect_right(self.chunks[position], after) if position < len(self.chunks) else 0
+        else:
+            position = bisect_left(self.maxes, prefix)
+            index = bisect_left(self.chunks[position], prefix) if position < len(self.chunks) else 0
+        for chunk in self.chunks[position:]:
+            for key in chunk[index:]:
+                if not key.startswith(prefix):
+                    return
+                yield key
+            index = 0
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, key):
+        position = bisect_left(self.maxes, key)
+        return position < len(self.chunks) and self.chunks[position][bisect_left(self.chunks[position], key)] == key
+
+
+class EmailIndex:
+    """
+    Keeps the normalised email addresses of every account in sorted order,
+    both overall and per domain, together with counts that are updated as
+    accounts come and go.
+
+    Listings are read a page at a time from a cursor, the last email of the
+    previous page, so showing one page never touches the rest, however many
+    accounts exist. The number of accounts, of administrators and of each
+    domain's accounts are maintained aggregates and cost O(1) to read.
+
+    Attributes:
+        emails (SortedKeys): Every email.
+        domains (dict[str, SortedKeys]): The emails of each domain.
+        admin_count (int): How many of the accounts are administrators.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new, empty instance of EmailIndex.
+        """
+        self.emails = SortedKeys()
+        self.domains = {}
+        self.admin_count = 0
+
+    @staticmethod
+    def domain_of(email):
+        return email.rpartition("@")[2]
+
+    def add(self, email, is_admin=False):
+        """
+        Indexes a normalised email address.
+
+        Args:
+            email (str): The normalised email address.
+            is_admin (bool, optional): Whether the account is an administrator. Defaults to False.
+        """
+        self.emails.add(email)
+        domain = self.domain_of(email)
+        keys = self.domains.get(domain)
+        if keys is None:
+            keys = self.domains[domain] = SortedKeys()
+        keys.add(email)
+        if is_admin:
+            self.admin_count += 1
+
+    def remove(self, email, is_admin=False):
+        """
+        Removes a normalised email address from the index.
+
+        Args:
+            email (str): The normalised email address.
+            is_admin (bool, optional): Whether the account was an administrator. Defaults to False.
+        """
+        self.emails.remove(email)
+        domain = self.domain_of(email)
+        keys = self.domains[domain]
+        keys.remove(email)
+        if not keys:
+            del self.domains[domain]
+        if is_admin:
+            self.admin_count -= 1
+
+    def iter_from(self, after=None, prefix="", domain=None):
+        """
+        Yields email addresses in order, starting after a cursor.
+
+        Args:
+            after (str, optional): Start after this email. Defaults to the start.
+            prefix (str, optional): Only yield emails starting with this. Defaults to every email.
+            domain (str, optional): Only yield emails of this domain. Defaults to every domain.
+
+        Yields:
+            str: The normalised email addresses.
+        """
+        keys = self.emails if domain is None else self.domains.get(domain, SortedKeys())
+        return keys.iter_from(after, prefix)
+
+    def count(self, prefix="", domain=None):
+        """
+        Counts the email addresses matching a filter.
+
+        Args:
+            prefix (str, optional): Only count emails starting with this. Defaults to every email.
+            domain (str, optional): Only count emails of this domain. Defaults to every domain.
+
+        Returns:
+            int: The number of matching emails.
+        """
+        keys = self.emails if domain is None else self.domains.get(domain, SortedKeys())
+        return keys.count_prefix(prefix)
+
+    def __len__(self):
+        return len(self.emails)
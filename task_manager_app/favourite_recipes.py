@@ -1,3 +1,6 @@
+from blob_store import blob_store
+
+
 class FavouriteRecipes:
     """
     Represents a favorite recipe with associated details.
@@ -5,11 +8,31 @@ class FavouriteRecipes:
     Attributes:
         recipe_id (int): The unique identifier of the recipe.
         title (str): The title of the recipe.
-        ingredients (str): The ingredients required for the recipe.
+        ingredients (str): The ingredients required for the recipe, exactly as entered.
+        ingredient_tokens (tuple[str, ...]): The distinct normalised ingredients, interned
+         in the shared ingredient table.
         instructions (str): The cooking instructions for the recipe.
+        body (RecipeBody): The ingredients and instructions, shared with every other
+         recipe with the same text through the blob store.
         user_email (str): The email of the user who added the recipe.
+        version (int): Goes up by one with every update, so concurrent editors
+         can tell whether the recipe changed since they read it. It is not stored.
+
+    The attributes are declared in __slots__ so instances carry no per-object
+    __dict__, which keeps large collections of recipes small in memory.
+
+    Ingredients are parsed into tokens once, when the body is created. The
+    text as entered is only kept when it cannot be rebuilt by joining the
+    tokens with ', ', which is the case for ingredients typed in lower case
+    with single spaces; otherwise the text is rebuilt whenever it is read.
+    Bodies are shared and never changed, so setting the ingredients or the
+    instructions switches the recipe to the body for its new text. The
+    reference to the body is given back with release once the recipe is
+    deleted or its collection is dropped, not when the object is freed.
     """
 
+    __slots__ = ("recipe_id", "title", "body", "user_email", "version")
+
     def __init__(self, recipe_id, title, ingredients, instructions, user_email=None):
         """
         Initializes a new instance of FavouriteRecipes.
@@ -23,6 +46,58 @@ class FavouriteRecipes:
         """
         self.recipe_id = recipe_id
         self.title = title
-        self.ingredients = ingredients
-        self.instructions = instructions
+        self.body = None
+        self.set_body(ingredients, instructions)
         self.user_email = user_email
+        self.version = 1
+
+    def set_body(self, ingredients, instructions):
+        """
+        Points the recipe at the shared body for new ingredients and instructions.
+
+        Args:
+            ingredients (str): The ingredients, or None to keep the current ones.
+            instructions (str): The instructions, or None to keep the current ones.
+        """
+        old = self.body
+        self.body = blob_store.acquire(ingredients if ingredients is not None else old.ingredients,
+                                       instructions if instructions is not None else old.instructions)
+        blob_store.release(old)
+
+    @property
+    def ingredients(self):
+        return self.body.ingredients
+
+    @ingredients.setter
+    def ingredients(self, ingredients):
+        self.set_body(ingredients, None)
+
+    @property
+    def ingredient_tokens(self):
+        return self.body.ingredient_tokens
+
+    @property
+    def ingredient_text(self):
+        return self.body.ingredient_text
+
+    @property
+    def instructions(self):
+        return self.body.instructions
+
+    @instructions.setter
+    def instructions(self, instructions):
+        self.set_body(None, instructions)
+
+    def release(self):
+        """
+        Gives back the recipe's reference to its shared body. The recipe can still be
+        read afterwards, but must not be released again or given a new body.
+        """
+        blob_store.release(self.body)
+
+    def __reduce__(self):
+        return (self.__class__, (self.recipe_id, self.title, self.ingredients, self.instructions, self.user_email),
+                self.version)
+
+    def __setstate__(self, version):
+        self.version = version
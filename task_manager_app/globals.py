@@ -1 +1,3 @@
-all_accounts = []
+from account_registry import AccountRegistry
+
+all_accounts = AccountRegistry()
@@ -0,0 +1,196 @@
+from array import array
+from bisect import bisect_left, insort
+
+# How much longer a posting list must be than the running intersection
+# before binary searches into it beat a set intersection.
+GALLOP_RATIO = 32
+
+
+def normalise_ingredient(ingredient):
+    """
+    Normalises one ingredient so that differently typed versions match.
+
+    Args:
+        ingredient (str): The ingredient as typed by the user.
+
+    Returns:
+        str: The ingredient in lower case with surrounding and repeated whitespace removed.
+    """
+    return " ".join(ingredient.lower().split())
+
+
+def split_ingredients(ingredients):
+    """
+    Splits comma-separated ingredients into normalised tokens. This is the
+    one tokenizer for ingredients; the ingredient table interns what it returns.
+
+    Args:
+        ingredients (str): The ingredients as typed by the user.
+
+    Returns:
+        list[str]: The distinct, non-blank normalised ingredients in the order they were given.
+    """
+    return list(dict.fromkeys(token for token in map(normalise_ingredient, ingredients.split(",")) if token))
+
+
+def contains(postings, recipe_id):
+    """
+    Checks whether a sorted posting list contains a recipe ID using a binary search.
+    """
+    position = bisect_left(postings, recipe_id)
+    return position < len(postings) and postings[position] == recipe_id
+
+
+def intersect(postings_lists):
+    """
+    Intersects sorted posting lists, starting from the shortest.
+
+    When the next list is much longer than the running result, each ID of the
+    result is looked up in it with a binary search that resumes where the
+    previous one stopped, so the cost grows with the short side only. When
+    the two are of similar length, the intersection is done with a set, which
+    runs in C and beats a Python-level merge.
+
+    Args:
+        postings_lists (list[array]): The sorted posting lists.
+
+    Returns:
+        list[int]: The IDs found in every list, in ascending order.
+    """
+    if not postings_lists:
+        return []
+    postings_lists = sorted(postings_lists, key=len)
+    result = list(postings_lists[0])
+    for postings in postings_lists[1:]:
+        if not result:
+            break
+        if len(postings) > GALLOP_RATIO * len(result):
+            matched = []
+            low = 0
+            for recipe_id in result:
+                low = bisect_left(postings, recipe_id, low)
+                if low == len(postings):
+                    break
+                if postings[low] == recipe_id:
+                    matched.append(recipe_id)
+            result = matched
+        else:
+            result = sorted(set(result).intersection(postings))
+    return result
+
+
+class IngredientIndex:
+    """
+    An inverted index from normalised ingredient to the IDs of the recipes that use it.
+
+    Each ingredient maps to a posting list: an array of recipe IDs kept in
+    ascending order. Because recipe IDs are handed out in ascending order,
+    adding a new recipe appends to the end of each of its posting lists.
+    Recipes are indexed by their interned ingredient tokens (see
+    ingredient_table), never by their ingredient text.
+
+    Attributes:
+        postings (dict[str, array]): The sorted recipe IDs for each ingredient.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new, empty instance of IngredientIndex.
+        """
+        self.postings = {}
+
+    def add_tokens(self, recipe_id, tokens):
+        """
+        Indexes a recipe's ingredient tokens.
+
+        Args:
+            recipe_id (int): The ID of the recipe.
+            tokens (iterable[str]): The recipe's normalised ingredients.
+        """
+        for token in tokens:
+            postings = self.postings.get(token)
+            if postings is None:
+                self.postings[token] = array('q', (recipe_id,))
+            elif postings[-1] < recipe_id:
+                postings.append(recipe_id)
+            elif not contains(postings, recipe_id):
+                insort(postings, recipe_id)
+
+    def remove_tokens(self, recipe_id, tokens):
+        """
+        Removes a recipe's ingredient tokens from the index.
+
+        Args:
+            recipe_id (int): The ID of the recipe.
+            tokens (iterable[str]): The normalised ingredients the recipe was indexed with.
+        """
+        for token in tokens:
+            postings = self.postings.get(token)
+            if postings is None:
+                continue
+            position = bisect_left(postings, recipe_id)
+            if position < len(postings) and postings[position] == recipe_id:
+                del postings[position]
+                if not postings:
+                    del self.postings[token]
+
+    def update_tokens(self, recipe_id, old_tokens, new_tokens):
+        """
+        Re-indexes a recipe whose ingredients changed, touching only the
+        ingredients that were added or removed.
+
+        Args:
+            recipe_id (int): The ID of the recipe.
+            old_tokens (iterable[str]): The normalised ingredients the recipe was indexed with.
+            new_tokens (iterable[str]): The recipe's new normalised ingredients.
+        """
+        old_tokens, new_tokens = set(old_tokens), set(new_tokens)
+        self.remove_tokens(recipe_id, old_tokens - new_tokens)
+        self.add_tokens(recipe_id, new_tokens - old_tokens)
+
+    def find(self, all_of=(), any_of=(), none_of=(), recipe_ids=()):
+        """
+        Finds the recipes whose ingredients match a query.
+
+        The work follows the posting lists of the all_of and any_of
+        ingredients. A query with only none_of ingredients has no such list
+        to start from, so it walks every ID in recipe_ids, in time
+        proportional to the size of the collection.
+
+        Args:
+            all_of (iterable[str], optional): Ingredients every match must use.
+            any_of (iterable[str], optional): Ingredients of which every match must use at least one.
+            none_of (iterable[str], optional): Ingredients no match may use.
+            recipe_ids (iterable[int], optional): Every recipe ID in ascending order,
+             used as the starting set when neither all_of nor any_of is given.
+
+        Returns:
+            list[int]: The matching recipe IDs in ascending order.
+        """
+        empty = array('q')
+        all_of = {normalise_ingredient(ingredient) for ingredient in all_of} - {""}
+        any_of = {normalise_ingredient(ingredient) for ingredient in any_of} - {""}
+        none_of = {normalise_ingredient(ingredient) for ingredient in none_of} - {""}
+        any_postings = [self.postings.get(token, empty) for token in any_of]
+
+        # The union of the any_of lists is intersected with the all_of lists,
+        # so whichever is shortest drives the work.
+
+        if any_of:
+            union = array('q', sorted(set().union(*any_postings)))
+            candidates = intersect([union] + [self.postings.get(token, empty) for token in all_of])
+        elif all_of:
+            candidates = intersect([self.postings.get(token, empty) for token in all_of])
+        else:
+            candidates = list(recipe_ids)
+
+        for token in none_of:
+            postings = self.postings.get(token)
+            if postings is None or not candidates:
+                continue
+            if len(postings) > GALLOP_RATIO * len(candidates):
+                candidates = [recipe_id for recipe_id in candidates if not contains(postings, recipe_id)]
+            else:
+                excluded = set(postings)
+                candidates = [recipe_id for recipe_id in candidates if recipe_id not in excluded]
+        return candidates
@@ -0,0 +1,82 @@
+import threading
+
+from ingredient_index import split_ingredients
+
+
+class IngredientTable:
+    """
+    A process-wide intern table of normalised ingredients, shared by every
+    user's recipes.
+
+    Recipes keep their ingredients as a tuple of normalised tokens drawn
+    from this table, so an ingredient such as 'salt' is held once however
+    many recipes of however many users use it, and the ingredient index and
+    other consumers work on the tokens rather than splitting the text again.
+    Each token carries a reference count of the recipes holding it and is
+    dropped from the table when the last of them lets it go.
+
+    Attributes:
+        tokens (dict[str, str]): Each interned token, keyed by itself.
+        counts (dict[str, int]): How many recipes hold each token.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new, empty instance of IngredientTable.
+        """
+        self.tokens = {}
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def parse(self, ingredients):
+        """
+        Parses comma-separated ingredients into interned tokens, taking a reference to each.
+
+        Args:
+            ingredients (str): The ingredients as typed by the user.
+
+        Returns:
+            tuple[str, ...]: The interned tokens, to be given back with release.
+        """
+        tokens = split_ingredients(ingredients)
+        with self.lock:
+            for i, token in enumerate(tokens):
+                interned = self.tokens.setdefault(token, token)
+                self.counts[interned] = self.counts.get(interned, 0) + 1
+                tokens[i] = interned
+        return tuple(tokens)
+
+    def release(self, tokens):
+        """
+        Gives back the references taken by parse, dropping tokens no recipe holds any more.
+
+        Args:
+            tokens (tuple[str, ...]): The tokens returned by parse.
+        """
+        with self.lock:
+            for token in tokens:
+                count = self.counts.get(token, 0) - 1
+                if count > 0:
+                    self.counts[token] = count
+                elif count == 0:
+                    del self.counts[token]
+                    del self.tokens[token]
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __contains__(self, token):
+        return token in self.tokens
+
+    def stats(self):
+        """
+        Returns the table's size.
+
+        Returns:
+            dict[str, int]: The distinct tokens and the references held to them.
+        """
+        with self.lock:
+            return {"tokens": len(self.tokens), "references": sum(self.counts.values())}
+
+
+ingredient_table = IngredientTable()
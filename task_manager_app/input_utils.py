@@ -1,5 +1,9 @@
 import re
 
+from console import standard_console
+
+EMAIL_PATTERN = re.compile(r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$")
+
 
 class InputUtils:
     """
@@ -10,25 +14,27 @@ class InputUtils:
     """
 
     @staticmethod
-    def get_yes_no_input(prompt_to_user):
+    def get_yes_no_input(prompt_to_user, console=None):
         """
         Prompt the user for a yes/no response and validate the input.
 
         Args:
             prompt_to_user (str): The prompt message to display to the user.
+            console (Console, optional): Where to prompt. Defaults to the terminal.
 
         Returns:
             str: The user's response ('yes' or 'no').
         """
+        console = console or standard_console
         while True:
-            response = input(prompt_to_user).lower().strip()
+            response = console.read(prompt_to_user).lower().strip()
             if response in ['yes', 'no']:
                 return response
             else:
-                print("Please enter 'yes' or 'no'.")
+                console.write("Please enter 'yes' or 'no'.")
 
     @staticmethod
-    def get_non_blank_input_and_or_multiline(instructions_to_user, error_message, multiline=False):
+    def get_non_blank_input_and_or_multiline(instructions_to_user, error_message, multiline=False, console=None):
         """
         Prompt the user for input and ensure it is not blank.
 
@@ -36,69 +42,107 @@ class InputUtils:
             instructions_to_user (str): Instructions to display to the user.
             error_message (str): Message to display if the input is blank.
             multiline (bool): Whether to allow multiline input.
+            console (Console, optional): Where to prompt. Defaults to the terminal.
 
         Returns:
             str: The user's input.
         """
+        console = console or standard_console
         while True:
             if multiline:
-                print(instructions_to_user)
+                console.write(instructions_to_user)
                 lines = []
                 while True:
-                    line = input()
+                    line = console.read()
                     if line:
                         lines.append(line)
                     else:
                         break
                 user_input = '\n'.join(lines)
             else:
-                user_input = input(instructions_to_user)
+                user_input = console.read(instructions_to_user)
 
             if user_input.strip() != "":
                 return user_input
             else:
-                print(error_message)
+                console.write(error_message)
+
+    @staticmethod
+    def is_valid_password(password):
+        """
+        Checks a password against the password rules: at least one uppercase
+        letter, one lowercase letter and one digit, and at least 8 characters.
+
+        Args:
+            password (str): The password to check.
+
+        Returns:
+            bool: True if the password meets the rules, False otherwise.
+        """
+        return (any(c.isupper() for c in password) and
+                any(c.islower() for c in password) and
+                any(c.isdigit() for c in password) and
+                len(password) >= 8)
+
+    @staticmethod
+    def is_valid_email(user_email):
+        """
+        Checks that an email address is well formed.
+
+        Args:
+            user_email (str): The email address to check.
+
+        Returns:
+            bool: True if the email address is valid, False otherwise.
+        """
+        return EMAIL_PATTERN.match(user_email) is not None
 
     @staticmethod
-    def get_password():
+    def get_password(console=None):
         """
         Prompt the user for a password and validate it according to certain criteria.
 
+        Args:
+            console (Console, optional): Where to prompt. Defaults to the terminal.
+
         Returns:
             str: The user's password if it meets the criteria, otherwise None.
         """
+        console = console or standard_console
         while True:
             try:
-                password = input("Please enter your password: ")
-                confirm_password = input("Confirm your password: ")
+                password = console.read("Please enter your password: ")
+                confirm_password = console.read("Confirm your password: ")
                 if password != confirm_password:
-                    print("Passwords do not match. Try again.")
+                    console.write("Passwords do not match. Try again.")
                 else:
-                    if (any(c.isupper() for c in password) and
-                            any(c.islower() for c in password) and
-                            any(c.isdigit() for c in password) and
-                            len(password) >= 8):
-                        print("Password created successfully")
+                    if InputUtils.is_valid_password(password):
+                        console.write("Password created successfully")
                         return password
                     else:
-                        print(
+                        console.write(
                             "Password must contain at least one uppercase letter,"
                             " one lowercase letter, one digit, and be at least 8 characters long.")
+            except EOFError:
+                raise
             except Exception as e:
-                print(f"An error occurred: {e}")
+                console.write(f"An error occurred: {e}")
 
     @staticmethod
-    def get_email_address():
+    def get_email_address(console=None):
         """
         Prompt the user for an email address and validate it.
 
+        Args:
+            console (Console, optional): Where to prompt. Defaults to the terminal.
+
         Returns:
             str: The user's email address if it is valid, otherwise None.
         """
+        console = console or standard_console
         while True:
-            user_email = input("Please enter your email address: ")
-            pattern = r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$"
-            if re.match(pattern, user_email):
+            user_email = console.read("Please enter your email address: ")
+            if InputUtils.is_valid_email(user_email):
                 return user_email
             else:
-                print("Please ensure you enter a valid email address.")
+                console.write("Please ensure you enter a valid email address.")
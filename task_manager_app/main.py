@@ -1,46 +1,146 @@
+import argparse
+import sys
+
+from batch_runner import BatchRunner
+from console import standard_console
 from user_interface_manager import UserInterfaceManager
 from user_interface import UserInterface
 from globals import all_accounts
+from user import User
+from metrics import metrics, profiled
+from password_hashing import POOL_KINDS, password_hasher
+from recipe_manager_cache import recipe_manager_cache
+from storage.journal_data_access import JournalDataAccess
+from storage.sqlite_data_access import SQLiteDataAccess
+from text_compression import text_compressor
+
+
+def parse_arguments(argv=None):
+    """
+    Parses the command line arguments.
+
+    Args:
+        argv (list[str], optional): The arguments to parse. Defaults to sys.argv.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Recipe Management System")
+    backend = parser.add_mutually_exclusive_group()
+    backend.add_argument("--db", help="Keep accounts and recipes in this SQLite database "
+                                      "instead of only in memory.")
+    backend.add_argument("--journal", help="Keep accounts and recipes as a journal and snapshots "
+                                           "in this directory instead of only in memory.")
+    parser.add_argument("--cache-collections", type=int, default=recipe_manager_cache.max_collections,
+                        help="The most users' recipe collections to keep in memory when using "
+                             "--db or --journal.")
+    parser.add_argument("--cache-recipes", type=int,
+                        help="The most recipes to keep in memory across those collections.")
+    parser.add_argument("--hash-pool", choices=POOL_KINDS, default=password_hasher.kind,
+                        help="Whether password hashing runs on a thread or a process pool.")
+    parser.add_argument("--hash-workers", type=int, default=password_hasher.workers,
+                        help="How many passwords can be hashed or verified at once.")
+    parser.add_argument("--compress-text", action="store_true",
+                        help="Keep long recipe instructions compressed in memory with zlib and a "
+                             "dictionary trained from the first recipes loaded.")
+    parser.add_argument("--text-cache", type=int, default=text_compressor.cache_size,
+                        help="The most decompressed instructions to keep for recently read recipes.")
+    parser.add_argument("--metrics",
+                        help="On exit, write the call counts, error counts and latencies of every action "
+                             "and operation to this file, as JSON if it ends in .json and as text otherwise.")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="Run the operations in this JSON Lines script instead of the menus, writing "
+                             "one JSON result per operation to standard output; - reads standard input.")
+    parser.add_argument("--profile", help="Profile the session with cProfile and save the profile to this file.")
+    return parser.parse_args(argv)
 
 
-def main():
+def main(argv=None):
     """
     The main entry point for the application, handling user interactions and managing
     the application flow.
+
+    Args:
+        argv (list[str], optional): The command line arguments. Defaults to sys.argv.
+    """
+    arguments = parse_arguments(argv)
+    recipe_manager_cache.max_collections = arguments.cache_collections
+    recipe_manager_cache.max_recipes = arguments.cache_recipes
+    password_hasher.configure(arguments.hash_pool, arguments.hash_workers)
+    text_compressor.configure(arguments.compress_text, arguments.text_cache)
+    if arguments.db:
+        all_accounts.attach_storage(SQLiteDataAccess(arguments.db), User.from_record)
+    elif arguments.journal:
+        all_accounts.attach_storage(JournalDataAccess(arguments.journal), User.from_record)
+    try:
+        with profiled(arguments.profile):
+            if arguments.batch:
+                run_batch(arguments.batch)
+            else:
+                run_main_menu()
+    finally:
+        all_accounts.storage.close()
+        password_hasher.shutdown()
+        if arguments.metrics:
+            metrics.write(arguments.metrics)
+
+
+def run_batch(path):
+    """
+    Runs a batch script and reports its throughput on standard error.
+
+    Args:
+        path (str): The script's path, or - for standard input.
+    """
+    runner = BatchRunner()
+    if path == "-":
+        summary = runner.run(sys.stdin, sys.stdout)
+    else:
+        with open(path, encoding="utf-8") as script:
+            summary = runner.run(script, sys.stdout)
+    all_accounts.flush()
+    print(f"{summary['operations']} operations, {summary['errors']} failed, in {summary['seconds']:.3f}s "
+          f"({summary['operations_per_second']:.0f} operations/s)", file=sys.stderr)
+
+
+def run_main_menu(console=standard_console):
+    """
+    Runs the welcome menu until the user chooses to exit.
+
+    Args:
+        console (Console, optional): Where to prompt and write messages. Defaults to the terminal.
     """
-    user_interface_manager = UserInterfaceManager()
+    user_interface_manager = UserInterfaceManager(console)
     while True:
-        print("Welcome to the Task Manager!")
-        print("1. Log in")
-        print("2. Create an account")
-        print("3. Exit")
+        console.write("Welcome to the Task Manager!")
+        console.write("1. Log in")
+        console.write("2. Create an account")
+        console.write("3. Exit")
         choice = user_interface_manager.get_user_choice()
         if choice == 1:
-            print("Please log in:")
-            email = input("Please enter your email address: ")
-            password = input("Please enter your password: ")
-            user = None
-            for account in all_accounts:
-                if account.email == email and account.password == password:
-                    user = account
-                    break
+            console.write("Please log in:")
+            email = console.read("Please enter your email address: ")
+            password = console.read("Please enter your password: ")
+            user = all_accounts.authenticate(email, password)
             if user:
-                user_interface = UserInterface(user)  # Initialize user_interface here
+                user_interface = UserInterface(user, console)  # Initialize user_interface here
                 user_interface.run()
+                all_accounts.flush()
             else:
-                print("Login failed. Please try again.")
+                console.write("Login failed. Please try again.")
         elif choice == 2:
-            print("Creating a new account...")
+            console.write("Creating a new account...")
             if user_interface_manager.create_account():
-                print("Please log in to access the menu:")
+                all_accounts.flush()
+                console.write("Please log in to access the menu:")
                 continue
             else:
-                print("Account creation failed. Please try again.")
+                console.write("Account creation failed. Please try again.")
         elif choice == 3:
-            print("Exiting...")
+            console.write("Exiting...")
             break
         else:
-            print("Invalid choice. Please try again.")
+            console.write("Invalid choice. Please try again.")
 
 
 if __name__ == "__main__":
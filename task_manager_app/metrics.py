@@ -0,0 +1,262 @@
+import cProfile
+import contextlib
+import functools
+import json
+import threading
+import time
+from array import array
+
+# Every power of two of nanoseconds is split into 2 ** SUB_BUCKET_BITS
+# buckets, so a recorded latency is accurate to within 25%.
+SUB_BUCKET_BITS = 2
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+LINEAR_LIMIT = SUB_BUCKETS << 1
+BUCKET_COUNT = LINEAR_LIMIT + 62 * SUB_BUCKETS
+PERCENTILES = (0.50, 0.95, 0.99)
+
+
+def bucket_of(elapsed):
+    """
+    Returns the histogram bucket of a latency in nanoseconds.
+    """
+    if elapsed < LINEAR_LIMIT:
+        return elapsed
+    shift = elapsed.bit_length() - 1 - SUB_BUCKET_BITS
+    return LINEAR_LIMIT + (shift - 1) * SUB_BUCKETS + (elapsed >> shift) - SUB_BUCKETS
+
+
+def bucket_upper_bound(bucket):
+    """
+    Returns the smallest latency in nanoseconds above a histogram bucket.
+    """
+    if bucket < LINEAR_LIMIT:
+        return bucket + 1
+    shift, offset = divmod(bucket - LINEAR_LIMIT, SUB_BUCKETS)
+    return (SUB_BUCKETS + offset + 1) << (shift + 1)
+
+
+class OperationMetrics:
+    """
+    The counters and latency histogram of one operation.
+
+    The histogram is a preallocated array of counters with logarithmically
+    sized buckets, so recording a call only increments integers and never
+    allocates, and percentiles are read off the bucket counts when the
+    metrics are exported.
+
+    Attributes:
+        name (str): The operation's name, such as 'recipe.create'.
+        calls (int): How many times the operation ran.
+        errors (int): How many of those calls raised an exception.
+        total_ns (int): The time spent in the operation, in nanoseconds.
+        max_ns (int): The longest call, in nanoseconds.
+        buckets (array): How many calls fell into each latency bucket.
+    """
+
+    __slots__ = ("name", "calls", "errors", "total_ns", "max_ns", "buckets", "lock")
+
+    def __init__(self, name):
+        """
+        Initializes a new instance of OperationMetrics with every counter at zero.
+
+        Args:
+            name (str): The operation's name.
+        """
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = array("Q", bytes(8 * BUCKET_COUNT))
+        self.lock = threading.Lock()
+
+    def record(self, elapsed, failed=False):
+        """
+        Records one call.
+
+        Args:
+            elapsed (int): How long the call took, in nanoseconds.
+            failed (bool, optional): Whether the call raised an exception. Defaults to False.
+        """
+        bucket = bucket_of(elapsed)
+        with self.lock:
+            self.calls += 1
+            self.errors += failed
+            self.total_ns += elapsed
+            if elapsed > self.max_ns:
+                self.max_ns = elapsed
+            self.buckets[bucket] += 1
+
+    def percentile(self, fraction):
+        """
+        Estimates a latency percentile from the histogram.
+
+        Args:
+            fraction (float): The percentile as a fraction, such as 0.99.
+
+        Returns:
+            int: The upper bound of the bucket holding the percentile, in nanoseconds.
+        """
+        if not self.calls:
+            return 0
+        wanted = max(1, round(fraction * self.calls))
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= wanted:
+                return min(bucket_upper_bound(bucket), self.max_ns)
+        return self.max_ns
+
+    def reset(self):
+        with self.lock:
+            self.calls = self.errors = self.total_ns = self.max_ns = 0
+            self.buckets = array("Q", bytes(8 * BUCKET_COUNT))
+
+    def snapshot(self):
+        """
+        Returns the operation's figures.
+
+        Returns:
+            dict[str, float]: The calls, errors, mean, maximum and percentile latencies in microseconds.
+        """
+        with self.lock:
+            figures = {"calls": self.calls, "errors": self.errors,
+                       "mean_us": self.total_ns / self.calls / 1e3 if self.calls else 0.0,
+                       "max_us": self.max_ns / 1e3}
+            for fraction in PERCENTILES:
+                figures[f"p{round(fraction * 100)}_us"] = self.percentile(fraction) / 1e3
+        return figures
+
+
+class Metrics:
+    """
+    Collects call counts, error counts and latency histograms for the
+    application's actions and operations.
+
+    Functions are instrumented with the timed decorator, which looks up the
+    operation's counters once, when the function is defined; every call
+    then costs two clock reads and a few integer increments. Recording can
+    be switched off, leaving only a flag check. The figures are exported on
+    demand as a dictionary, JSON or a text table.
+
+    Attributes:
+        operations (dict[str, OperationMetrics]): The counters of each operation, keyed by name.
+        enabled (bool): Whether calls are being recorded.
+    """
+
+    def __init__(self, enabled=True):
+        """
+        Initializes a new instance of Metrics with no operations.
+
+        Args:
+            enabled (bool, optional): Whether to record calls. Defaults to True.
+        """
+        self.operations = {}
+        self.enabled = enabled
+        self.lock = threading.Lock()
+
+    def operation(self, name):
+        """
+        Returns the counters of an operation, creating them on first use.
+        """
+        with self.lock:
+            operation = self.operations.get(name)
+            if operation is None:
+                operation = self.operations[name] = OperationMetrics(name)
+            return operation
+
+    def timed(self, name):
+        """
+        Returns a decorator that records every call of a function as the named operation.
+
+        Args:
+            name (str): The operation's name, such as 'recipe.create'.
+
+        Returns:
+            callable: The decorator.
+        """
+        operation = self.operation(name)
+        clock = time.perf_counter_ns
+
+        def decorate(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                started = clock()
+                try:
+                    result = function(*args, **kwargs)
+                except BaseException:
+                    operation.record(clock() - started, True)
+                    raise
+                operation.record(clock() - started)
+                return result
+            return wrapper
+        return decorate
+
+    def reset(self):
+        """
+        Sets every counter back to zero.
+        """
+        for operation in list(self.operations.values()):
+            operation.reset()
+
+    def snapshot(self, include_idle=False):
+        """
+        Returns the figures of every operation.
+
+        Args:
+            include_idle (bool, optional): Whether to include operations that were never called.
+             Defaults to False.
+
+        Returns:
+            dict[str, dict[str, float]]: The figures of each operation, keyed by name.
+        """
+        return {name: operation.snapshot() for name, operation in sorted(self.operations.items())
+                if include_idle or operation.calls}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_text(self):
+        """
+        Formats the figures of every operation that was called as a table.
+        """
+        lines = [f"{'operation':<32} {'calls':>8} {'errors':>7} {'mean us':>10} "
+                 f"{'p50 us':>10} {'p95 us':>10} {'p99 us':>10} {'max us':>10}"]
+        for name, figures in self.snapshot().items():
+            lines.append(f"{name:<32} {figures['calls']:>8} {figures['errors']:>7} {figures['mean_us']:10.1f} "
+                         f"{figures['p50_us']:10.1f} {figures['p95_us']:10.1f} {figures['p99_us']:10.1f} "
+                         f"{figures['max_us']:10.1f}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        Writes the figures to a file, as JSON if the path ends in .json and as text otherwise.
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(self.to_json() if path.endswith(".json") else self.to_text())
+
+
+@contextlib.contextmanager
+def profiled(path):
+    """
+    Runs the body of a with statement under cProfile and saves the profile,
+    which can be read with pstats or snakeviz.
+
+    Args:
+        path (str): The file to save the profile to, or None to run without profiling.
+    """
+    if path is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+metrics = Metrics()
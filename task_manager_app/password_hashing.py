@@ -0,0 +1,221 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+KEY_BYTES = 32
+POOL_KINDS = ("thread", "process")
+DEFAULT_WORKERS = os.cpu_count() or 1
+VERIFICATION_CACHE_SIZE = 4096
+
+
+def derive_key(password, salt, n, r, p):
+    """
+    Derives a key from a password with scrypt. Kept at module level so a
+    process pool can run it.
+
+    Returns:
+        bytes: The derived key.
+    """
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                          maxmem=2 * 128 * r * (n + p + 2), dklen=KEY_BYTES)
+
+
+def encode_hash(n, r, p, salt, key):
+    """
+    Formats a derived key as 'scrypt$n$r$p$salt$key' with the salt and key in base64.
+    """
+    return "$".join(("scrypt", str(n), str(r), str(p),
+                     base64.b64encode(salt).decode("ascii"), base64.b64encode(key).decode("ascii")))
+
+
+def decode_hash(encoded):
+    """
+    Parses a hash produced by encode_hash.
+
+    Returns:
+        tuple[int, int, int, bytes, bytes]: The scrypt parameters, salt and key,
+         or None if the hash is not in that format.
+    """
+    parts = encoded.split("$")
+    if len(parts) != 6 or parts[0] != "scrypt":
+        return None
+    try:
+        return (int(parts[1]), int(parts[2]), int(parts[3]),
+                base64.b64decode(parts[4]), base64.b64decode(parts[5]))
+    except ValueError:
+        return None
+
+
+def is_legacy_hash(encoded):
+    """
+    Checks for a hash from before salting: the hex SHA-256 digest of the password.
+    """
+    return len(encoded) == 64 and all(c in "0123456789abcdef" for c in encoded)
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords with salted scrypt on a pool of workers.
+
+    scrypt is deliberately slow, so hashing and verification run on a thread
+    or process pool of a configurable size: a burst of logins is limited to
+    that many key derivations at a time instead of stalling every other
+    request. hashlib releases the GIL while scrypt runs, so a thread pool
+    gives real parallelism; a process pool isolates the work further at the
+    cost of sending each password to another process.
+
+    Successful verifications are remembered in a bounded least-recently-used
+    cache, so a user who logs in repeatedly pays for the key derivation only
+    once. The cache is keyed by an HMAC of the password and the stored hash
+    under a random key that never leaves the process, so it holds no
+    plain text passwords, and changing the password changes the hash and
+    therefore the key.
+
+    Hashes made by the old unsalted SHA-256 scheme are still accepted, and
+    needs_rehash tells the caller to replace them.
+
+    Attributes:
+        n (int): The scrypt CPU and memory cost.
+        r (int): The scrypt block size.
+        p (int): The scrypt parallelisation.
+        kind (str): 'thread' or 'process'.
+        workers (int): The size of the pool.
+        cache_size (int): The most verifications to remember.
+        hits (int): How many verifications were answered from the cache.
+        misses (int): How many verifications had to derive a key.
+    """
+
+    def __init__(self, kind="thread", workers=DEFAULT_WORKERS, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P,
+                 cache_size=VERIFICATION_CACHE_SIZE):
+        """
+        Initializes a new instance of PasswordHasher. The pool is started on first use.
+
+        Args:
+            kind (str, optional): 'thread' or 'process'. Defaults to 'thread'.
+            workers (int, optional): The size of the pool. Defaults to the number of CPUs.
+            n (int, optional): The scrypt CPU and memory cost. Defaults to SCRYPT_N.
+            r (int, optional): The scrypt block size. Defaults to SCRYPT_R.
+            p (int, optional): The scrypt parallelisation. Defaults to SCRYPT_P.
+            cache_size (int, optional): The most verifications to remember. Defaults to VERIFICATION_CACHE_SIZE.
+        """
+        if kind not in POOL_KINDS:
+            raise ValueError(f"kind must be one of {', '.join(POOL_KINDS)}.")
+        self.kind = kind
+        self.workers = workers
+        self.n = n
+        self.r = r
+        self.p = p
+        self.cache_size = cache_size
+        self.cache_key = os.urandom(32)
+        self.verified = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def configure(self, kind=None, workers=None, n=None):
+        """
+        Changes the pool or the cost of new hashes. A running pool is shut down
+        and a new one started on next use.
+
+        Args:
+            kind (str, optional): 'thread' or 'process'.
+            workers (int, optional): The size of the pool.
+            n (int, optional): The scrypt CPU and memory cost for new hashes.
+        """
+        if kind is not None and kind not in POOL_KINDS:
+            raise ValueError(f"kind must be one of {', '.join(POOL_KINDS)}.")
+        self.shutdown()
+        self.kind = kind or self.kind
+        self.workers = workers or self.workers
+        self.n = n or self.n
+
+    def pool(self):
+        with self.lock:
+            if self.executor is None:
+                executor_class = ProcessPoolExecutor if self.kind == "process" else ThreadPoolExecutor
+                self.executor = executor_class(max_workers=self.workers)
+            return self.executor
+
+    def shutdown(self):
+        """
+        Stops the pool's workers.
+        """
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def hash(self, password):
+        """
+        Hashes a password with a new random salt.
+
+        Args:
+            password (str): The password to hash.
+
+        Returns:
+            str: The encoded hash, including its parameters and salt.
+        """
+        salt = os.urandom(SALT_BYTES)
+        key = self.pool().submit(derive_key, password, salt, self.n, self.r, self.p).result()
+        return encode_hash(self.n, self.r, self.p, salt, key)
+
+    def verify(self, password, encoded):
+        """
+        Checks a password against a stored hash.
+
+        Args:
+            password (str): The password to check.
+            encoded (str): The stored hash.
+
+        Returns:
+            bool: True if the password matches, False otherwise.
+        """
+        if is_legacy_hash(encoded):
+            return hmac.compare_digest(hashlib.sha256(password.encode("utf-8")).hexdigest(), encoded)
+        parameters = decode_hash(encoded)
+        if parameters is None:
+            return False
+        cache_key = hmac.new(self.cache_key, f"{encoded}\0{password}".encode("utf-8"), hashlib.sha256).digest()
+        with self.lock:
+            if cache_key in self.verified:
+                self.verified.move_to_end(cache_key)
+                self.hits += 1
+                return True
+            self.misses += 1
+        n, r, p, salt, expected = parameters
+        key = self.pool().submit(derive_key, password, salt, n, r, p).result()
+        if not hmac.compare_digest(key, expected):
+            return False
+        with self.lock:
+            self.verified[cache_key] = True
+            if len(self.verified) > self.cache_size:
+                self.verified.popitem(last=False)
+        return True
+
+    def needs_rehash(self, encoded):
+        """
+        Checks whether a stored hash was made with an old scheme or other parameters.
+        """
+        parameters = decode_hash(encoded)
+        return parameters is None or parameters[:3] != (self.n, self.r, self.p)
+
+    def stats(self):
+        """
+        Returns the verification cache's counters.
+
+        Returns:
+            dict[str, int]: The hits, misses and cached verifications.
+        """
+        return {"hits": self.hits, "misses": self.misses, "cached": len(self.verified)}
+
+
+password_hasher = PasswordHasher()
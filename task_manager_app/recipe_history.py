@@ -0,0 +1,201 @@
+import difflib
+import time
+from collections import deque
+
+DEFAULT_MAX_REVISIONS = 20
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60
+
+
+def line_delta(newer, older):
+    """
+    Computes a line-level delta that turns one text into another.
+
+    Args:
+        newer (str): The text the delta is applied to.
+        older (str): The text the delta produces.
+
+    Returns:
+        tuple[tuple[int, int, tuple[str, ...]], ...]: For each run of lines that differ, the
+         range of lines of newer to replace and the lines of older to put in their place.
+    """
+    newer_lines = newer.splitlines(keepends=True)
+    older_lines = older.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, newer_lines, older_lines, autojunk=False)
+    return tuple((i1, i2, tuple(older_lines[j1:j2]))
+                 for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal")
+
+
+def apply_delta(newer, delta):
+    """
+    Applies a delta made by line_delta.
+
+    Args:
+        newer (str): The text the delta was computed against.
+        delta (tuple): The delta.
+
+    Returns:
+        str: The text the delta was computed to produce.
+    """
+    lines = newer.splitlines(keepends=True)
+    result = []
+    position = 0
+    for start, end, replacement in delta:
+        result.extend(lines[position:start])
+        result.extend(replacement)
+        position = end
+    result.extend(lines[position:])
+    return "".join(result)
+
+
+class Revision:
+    """
+    One earlier version of a recipe, stored as the difference from the version after it.
+
+    Attributes:
+        version (int): The recipe's version number at the time.
+        saved_at (float): When the version was replaced, in seconds since the epoch.
+        title (str): The title, or None if the next version has the same one.
+        ingredients (str): The ingredients, or None if the next version has the same ones.
+        instructions_delta (tuple): The line-level delta from the next version's
+         instructions, or None if they are the same.
+    """
+
+    __slots__ = ("version", "saved_at", "title", "ingredients", "instructions_delta")
+
+    def __init__(self, version, saved_at, title, ingredients, instructions_delta):
+        self.version = version
+        self.saved_at = saved_at
+        self.title = title
+        self.ingredients = ingredients
+        self.instructions_delta = instructions_delta
+
+
+class RecipeHistory:
+    """
+    Keeps a bounded history of earlier versions of the recipes in a collection.
+
+    Only the current version of a recipe is held in full, by the recipe
+    itself, so reading it costs nothing extra. Each earlier version is
+    stored as a reverse delta against the version that replaced it: the
+    title and ingredients only when they changed, and the instructions as a
+    line-level delta computed with difflib. Rebuilding version k applies the
+    deltas from the current version back to k, which is at most
+    max_revisions small patches. Each recipe keeps at most max_revisions
+    earlier versions, none older than max_age seconds; the oldest are
+    dropped first. History is held in memory only.
+
+    Attributes:
+        revisions (dict[int, deque[Revision]]): The earlier versions of each recipe,
+         keyed by recipe ID, newest first.
+        max_revisions (int): The most earlier versions to keep per recipe.
+        max_age (float): How many seconds an earlier version is kept for.
+    """
+
+    def __init__(self, max_revisions=DEFAULT_MAX_REVISIONS, max_age=DEFAULT_MAX_AGE, clock=time.time):
+        """
+        Initializes a new, empty instance of RecipeHistory.
+
+        Args:
+            max_revisions (int, optional): The most earlier versions to keep per recipe.
+             Defaults to DEFAULT_MAX_REVISIONS.
+            max_age (float, optional): How many seconds an earlier version is kept for.
+             Defaults to DEFAULT_MAX_AGE.
+            clock (callable, optional): Returns the current time in seconds. Defaults to time.time.
+        """
+        self.revisions = {}
+        self.max_revisions = max_revisions
+        self.max_age = max_age
+        self.clock = clock
+
+    def record(self, recipe, version, title, ingredients, instructions):
+        """
+        Records the version a recipe had before an update. Call it after the
+        recipe was updated, so the delta is computed against the new version.
+
+        Args:
+            recipe (FavouriteRecipes): The recipe, already holding its new version.
+            version (int): The version number before the update.
+            title (str): The title before the update.
+            ingredients (str): The ingredients before the update.
+            instructions (str): The instructions before the update.
+        """
+        revision = Revision(version, self.clock(),
+                            title if title != recipe.title else None,
+                            ingredients if ingredients != recipe.ingredients else None,
+                            line_delta(recipe.instructions, instructions)
+                            if instructions != recipe.instructions else None)
+        revisions = self.revisions.get(recipe.recipe_id)
+        if revisions is None:
+            revisions = self.revisions[recipe.recipe_id] = deque()
+        revisions.appendleft(revision)
+        self.prune(recipe.recipe_id)
+
+    def prune(self, recipe_id):
+        """
+        Drops the versions of a recipe beyond max_revisions or older than max_age.
+        """
+        revisions = self.revisions.get(recipe_id)
+        if revisions is None:
+            return
+        oldest_allowed = self.clock() - self.max_age
+        while revisions and (len(revisions) > self.max_revisions or revisions[-1].saved_at < oldest_allowed):
+            revisions.pop()
+        if not revisions:
+            del self.revisions[recipe_id]
+
+    def forget(self, recipe_id):
+        """
+        Drops the whole history of a recipe, for example when it is deleted.
+        """
+        self.revisions.pop(recipe_id, None)
+
+    def versions(self, recipe_id):
+        """
+        Lists the earlier versions of a recipe that are still kept.
+
+        Returns:
+            list[tuple[int, float]]: The version number and the time it was replaced
+             of each earlier version, newest first.
+        """
+        self.prune(recipe_id)
+        return [(revision.version, revision.saved_at) for revision in self.revisions.get(recipe_id, ())]
+
+    def reconstruct(self, recipe, version):
+        """
+        Rebuilds a version of a recipe.
+
+        Args:
+            recipe (FavouriteRecipes): The recipe, holding its current version.
+            version (int): The version number to rebuild.
+
+        Returns:
+            tuple[str, str, str]: The title, ingredients and instructions of that
+             version, or None if it is not kept.
+        """
+        title, ingredients, instructions = recipe.title, recipe.ingredients, recipe.instructions
+        if version == recipe.version:
+            return title, ingredients, instructions
+        self.prune(recipe.recipe_id)
+        for revision in self.revisions.get(recipe.recipe_id, ()):
+            if revision.title is not None:
+                title = revision.title
+            if revision.ingredients is not None:
+                ingredients = revision.ingredients
+            if revision.instructions_delta is not None:
+                instructions = apply_delta(instructions, revision.instructions_delta)
+            if revision.version == version:
+                return title, ingredients, instructions
+            if revision.version < version:
+                break
+        return None
+
+    def __len__(self):
+        return sum(len(revisions) for revisions in self.revisions.values())
+
+
+def render_version(title, ingredients, instructions):
+    """
+    Formats a version of a recipe as lines of text for diffing.
+    """
+    return [f"Title: {title}\n", f"Ingredients: {ingredients}\n", "Instructions:\n"] + \
+        [line + "\n" for line in instructions.splitlines()]
@@ -1,4 +1,32 @@
+import difflib
+import sys
+import threading
+import weakref
+from array import array
+from bisect import bisect_left, bisect_right
+
+from change_events import RecipeCreated, RecipeDeleted, RecipeUpdated, change_events
+from console import standard_console
 from favourite_recipes import FavouriteRecipes
+from ingredient_index import IngredientIndex
+from metrics import metrics
+from recipe_history import RecipeHistory, render_version
+from recipe_search import SearchIndex
+from storage.data_access import in_memory_data_access
+
+RECIPES_PER_WRITE = 256
+
+
+def release_recipes(recipes_by_id):
+    """
+    Gives back every recipe's reference to its shared body and empties the collection.
+
+    Args:
+        recipes_by_id (dict[int, FavouriteRecipes]): The collection of recipes keyed by recipe ID.
+    """
+    for recipe in recipes_by_id.values():
+        recipe.release()
+    recipes_by_id.clear()
 
 
 class RecipeManager:
@@ -6,21 +34,174 @@ class RecipeManager:
        Manages a collection of recipes, providing functionalities to create,
         display, update, and delete recipes.
 
+       Recipes are kept in an insertion-ordered dictionary keyed by their ID, so
+       looking up, updating and deleting a recipe costs O(1) while listing still
+       follows the order the recipes were created in. IDs come from a counter
+       that only ever moves forward, so an ID is never handed out twice even
+       after a recipe is deleted.
+
+       Every change is written through to a storage backend. The default backend
+       keeps nothing beyond this object, so recipes live only in memory.
+
+       Each collection has its own lock, so several threads can work on
+       different users' recipes at once while changes to one collection, and
+       reads of its indexes, happen one at a time. Every recipe carries a
+       version number that goes up with each update, which lets update_recipe
+       act as a compare-and-set: an update made against an old version is
+       refused instead of silently overwriting someone else's change.
+
+       Each recipe holds a counted reference to its shared body in the blob
+       store. Deleting a recipe gives its reference back at once, and close
+       gives back those of the whole collection when it is dropped, for
+       example when its user is deleted. close is the intended way to release
+       a collection. The one that cannot be closed on purpose is a collection
+       the recipe cache evicted while something else still held it, so as a
+       fallback a finalizer gives back the references of any collection that
+       is garbage-collected without being closed.
+
        Attributes:
-           recipes (list[FavouriteRecipes]): A list of FavouriteRecipes instances
-           representing the collection of recipes.
+           recipes_by_id (dict[int, FavouriteRecipes]): The collection of recipes
+           keyed by recipe ID, in creation order.
+           next_recipe_id (int): The ID that will be given to the next recipe created.
+           user_email (str): The email of the user who owns the collection.
+           storage (DataAccess): The backend the collection is persisted to.
+           dirty (bool): Whether the collection has changed since it was last flushed.
+           ingredient_index (IngredientIndex): An inverted index from ingredient to
+           recipe IDs, kept up to date by every change to the collection.
+           search_index (SearchIndex): A full-text index over titles and instructions,
+           also kept up to date by every change.
+           recipe_ids (array): Every recipe ID in ascending order, used to start a
+           listing at any offset or cursor without walking the recipes before it.
+           lock (threading.RLock): Serialises changes to the collection and reads of its indexes.
+           history (RecipeHistory): The earlier versions of each recipe, kept as deltas
+           so updates can be reviewed and undone.
        """
 
-    def __init__(self):
+    def __init__(self, user_email=None, storage=None):
         """
-        Initializes a new instance of RecipeManager with an empty list of recipes.
+        Initializes a new instance of RecipeManager, loading any recipes the
+        storage backend already holds for the user.
 
         The RecipeManager is responsible for managing a collection of recipes, allowing users to create, display,
         update, and delete recipes from the collection.
+
+        Args:
+            user_email (str, optional): The email of the user who owns the collection. Defaults to None.
+            storage (DataAccess, optional): The storage backend. Defaults to the in-memory backend.
+        """
+        self.user_email = user_email
+        self.lock = threading.RLock()
+        self.storage = storage or in_memory_data_access
+        self.recipes_by_id = {recipe.recipe_id: recipe for recipe in self.storage.load_recipes(user_email)}
+        self.next_recipe_id = self.storage.load_next_recipe_id(user_email)
+        self.dirty = False
+        self.history = RecipeHistory()
+        self.rebuild_indexes()
+        # Only a fallback for collections dropped without close(); see the class docstring.
+        self.finalizer = weakref.finalize(self, release_recipes, self.recipes_by_id)
+        self.finalizer.atexit = False
+
+    def close(self):
+        """
+        Drops every recipe from memory without writing anything to storage, giving
+        back their references to the shared bodies. The stored recipes are untouched.
         """
-        self.recipes = []
+        with self.lock:
+            self.finalizer()
+            self.history = RecipeHistory()
+            self.rebuild_indexes()
 
-    def perform_create_recipe(self, title, ingredients, instructions):
+    def rebuild_indexes(self):
+        """
+        Rebuilds the indexes from scratch after the whole collection is replaced.
+        """
+        self.ingredient_index = IngredientIndex()
+        self.search_index = SearchIndex()
+        self.recipe_ids = array('q', sorted(self.recipes_by_id))
+        for recipe in self.recipes_by_id.values():
+            self.ingredient_index.add_tokens(recipe.recipe_id, recipe.ingredient_tokens)
+            self.search_index.add(recipe.recipe_id, recipe.title, recipe.instructions)
+
+    def attach_storage(self, storage):
+        """
+        Switches the collection to a different storage backend. Recipes already
+        stored there are loaded, and recipes only held in memory are written to it.
+
+        Args:
+            storage (DataAccess): The new storage backend.
+        """
+        with self.lock:
+            self.storage = storage
+            stored = {recipe.recipe_id: recipe for recipe in storage.load_recipes(self.user_email)}
+            for recipe_id, recipe in self.recipes_by_id.items():
+                if recipe_id in stored:
+                    recipe.release()
+                    continue
+                stored[recipe_id] = recipe
+                storage.insert_recipe(recipe)
+                self.dirty = True
+            # The finalizer holds on to this dictionary, so it is refilled rather than replaced.
+            self.recipes_by_id.clear()
+            self.recipes_by_id.update(sorted(stored.items()))
+            self.next_recipe_id = max(self.next_recipe_id, storage.load_next_recipe_id(self.user_email))
+            self.rebuild_indexes()
+
+    def flush(self):
+        """
+        Makes any buffered writes to the storage backend durable.
+        """
+        with self.lock:
+            self.dirty = False
+            self.storage.flush()
+
+    @property
+    def recipes(self):
+        """
+        Returns the recipes in the collection in the order they were created.
+
+        Returns:
+            list[FavouriteRecipes]: A snapshot list of the recipes.
+        """
+        with self.lock:
+            return list(self.recipes_by_id.values())
+
+    def __len__(self):
+        return len(self.recipes_by_id)
+
+    def __iter__(self):
+        return iter(self.recipes)
+
+    def __contains__(self, recipe_id):
+        return recipe_id in self.recipes_by_id
+
+    def get(self, recipe_id):
+        """
+        Looks up a recipe by its ID.
+
+        Args:
+            recipe_id (int): The ID of the recipe.
+
+        Returns:
+            FavouriteRecipes: The recipe, or None if there is no recipe with that ID.
+        """
+        return self.recipes_by_id.get(recipe_id)
+
+    def allocate_recipe_id(self, count=1):
+        """
+        Hands out the next recipe ID, or a range of consecutive IDs. IDs are never reused.
+
+        Args:
+            count (int, optional): How many consecutive IDs to allocate. Defaults to 1.
+
+        Returns:
+            int: The newly allocated recipe ID, or the first ID of the range.
+        """
+        with self.lock:
+            new_id = self.next_recipe_id
+            self.next_recipe_id += count
+            return new_id
+
+    def perform_create_recipe(self, title, ingredients, instructions, console=None):
         """
         Creates a new recipe and adds it to the collection.
 
@@ -28,30 +209,181 @@ class RecipeManager:
             title (str): The title of the new recipe.
             ingredients (str): The ingredients required for the recipe.
             instructions (str): The cooking instructions for the recipe.
+            console (Console, optional): Where to write the outcome. Defaults to the terminal.
 
         Returns:
-            None
+            FavouriteRecipes: The newly created recipe.
+        """
+        new_recipe = self.create_recipe(title, ingredients, instructions)
+        (console or standard_console).write(f"Recipe '{title}', with ID {new_recipe.recipe_id} created successfully!\n")
+        return new_recipe
+
+    @metrics.timed("recipe.create")
+    def create_recipe(self, title, ingredients, instructions):
+        """
+        Creates a new recipe and adds it to the collection without printing anything,
+        for callers other than the command line interface.
+
+        Args:
+            title (str): The title of the new recipe.
+            ingredients (str): The ingredients required for the recipe.
+            instructions (str): The cooking instructions for the recipe.
+
+        Returns:
+            FavouriteRecipes: The newly created recipe.
+
+        Raises:
+            RecipeExists: If the storage backend already holds a recipe under the new
+             ID, for example one written by another process; the recipe is not added.
         """
-        new_id = len(self.recipes) + 1
-        new_recipe = FavouriteRecipes(new_id, title, ingredients, instructions)
-        self.recipes.append(new_recipe)
-        print(f"Recipe '{title}', with ID {new_id} created successfully!\n")
+        with self.lock:
+            new_id = self.allocate_recipe_id()
+            new_recipe = FavouriteRecipes(new_id, title, ingredients, instructions, self.user_email)
+            try:
+                self.storage.insert_recipe(new_recipe)
+            except Exception:
+                new_recipe.release()
+                raise
+            self.add_recipe(new_recipe)
+            self.dirty = True
+            change_events.publish(RecipeCreated(self.user_email, new_id, new_recipe.title, new_recipe.body))
+        change_events.deliver()
+        return new_recipe
 
-    def perform_read_recipes(self):
+    @metrics.timed("recipe.bulk_create")
+    def perform_bulk_create_recipes(self, rows):
+        """
+        Creates many recipes at once, for imports. The IDs for the whole batch
+        are allocated in one step, the batch is handed to the storage backend
+        in one call, and nothing is printed.
+
+        Args:
+            rows (list[tuple[str, str, str]]): The title, ingredients and instructions of each recipe.
+
+        Returns:
+            list[FavouriteRecipes]: The newly created recipes.
+        """
+        with self.lock:
+            first_id = self.allocate_recipe_id(len(rows))
+            new_recipes = [FavouriteRecipes(first_id + i, title, ingredients, instructions, self.user_email)
+                           for i, (title, ingredients, instructions) in enumerate(rows)]
+            try:
+                self.storage.insert_recipes(new_recipes)
+            except Exception:
+                for new_recipe in new_recipes:
+                    new_recipe.release()
+                raise
+            for new_recipe in new_recipes:
+                self.add_recipe(new_recipe)
+            if new_recipes:
+                self.dirty = True
+            for new_recipe in new_recipes:
+                change_events.publish(RecipeCreated(self.user_email, new_recipe.recipe_id, new_recipe.title,
+                                                    new_recipe.body))
+        change_events.deliver()
+        return new_recipes
+
+    def add_recipe(self, recipe):
+        """
+        Adds a newly created recipe to the collection and its indexes.
+
+        Args:
+            recipe (FavouriteRecipes): The recipe, whose ID is higher than any before it.
+        """
+        with self.lock:
+            self.recipes_by_id[recipe.recipe_id] = recipe
+            self.recipe_ids.append(recipe.recipe_id)
+            self.ingredient_index.add_tokens(recipe.recipe_id, recipe.ingredient_tokens)
+            self.search_index.add(recipe.recipe_id, recipe.title, recipe.instructions)
+
+    def iter_recipes(self, offset=0, after_id=None, limit=None, fields=None):
+        """
+        Lazily yields recipes in ID order, one page at a time if a limit is given.
+        The IDs are read RECIPES_PER_WRITE at a time under the collection's
+        lock, which is released in between, so a long listing does not hold
+        up writers; each batch resumes after the last ID yielded.
+
+        Args:
+            offset (int, optional): How many recipes to skip. Defaults to 0.
+            after_id (int, optional): A cursor: start with the first recipe whose ID
+             is greater than this. Used instead of offset when given.
+            limit (int, optional): The most recipes to yield. Defaults to no limit.
+            fields (tuple[str], optional): The attributes to yield for each recipe.
+             Defaults to yielding the recipes themselves.
+
+        Yields:
+            FavouriteRecipes | tuple: Each recipe, or a tuple of the requested attributes.
+        """
+        remaining = limit
+        while remaining is None or remaining > 0:
+            count = RECIPES_PER_WRITE if remaining is None else min(remaining, RECIPES_PER_WRITE)
+            with self.lock:
+                start = bisect_right(self.recipe_ids, after_id) if after_id is not None else offset
+                batch_ids = self.recipe_ids[start:start + count]
+                batch = [self.recipes_by_id[recipe_id] for recipe_id in batch_ids]
+                if fields is not None:
+                    batch = [tuple(getattr(recipe, field) for field in fields) for recipe in batch]
+            yield from batch
+            if len(batch) < count:
+                return
+            after_id = batch_ids[-1]
+            if remaining is not None:
+                remaining -= len(batch)
+
+    @metrics.timed("recipe.list")
+    def write_recipes(self, stream=None, offset=0, after_id=None, limit=None, summary=False):
+        """
+        Writes recipes to a stream, in chunks of RECIPES_PER_WRITE formatted
+        recipes per write call rather than one print per line.
+
+        Args:
+            stream (file, optional): Where to write. Defaults to sys.stdout.
+            offset (int, optional): How many recipes to skip. Defaults to 0.
+            after_id (int, optional): Start after the recipe with this ID instead of at offset.
+            limit (int, optional): The most recipes to write. Defaults to no limit.
+            summary (bool, optional): Write only each recipe's ID and title, without
+             reading its ingredients or instructions. Defaults to False.
+
+        Returns:
+            int: The ID of the last recipe written, for use as the next cursor, or None.
+        """
+        stream = stream or sys.stdout
+        if summary:
+            fields = ("recipe_id", "title")
+            template = "ID: {0}, Title: {1}\n"
+        else:
+            fields = ("recipe_id", "title", "ingredients", "instructions")
+            template = "ID: {0}, Title: {1}, Ingredients: {2}\nInstructions:\n{3}\n"
+        last_id = None
+        chunk = []
+        for values in self.iter_recipes(offset, after_id, limit, fields):
+            chunk.append(template.format(*values))
+            last_id = values[0]
+            if len(chunk) == RECIPES_PER_WRITE:
+                stream.write("".join(chunk))
+                chunk = []
+        stream.write("".join(chunk))
+        return last_id
+
+    def perform_read_recipes(self, stream=None, summary=False):
         """
         Displays all recipes in the collection.
 
+        Args:
+            stream (file, optional): Where to write. Defaults to sys.stdout.
+            summary (bool, optional): Show only each recipe's ID and title. Defaults to False.
+
         Returns:
             None
         """
-        print("\033[1m" + "Favourite recipes: " + "\033[0m")
-        for recipe in self.recipes:
-            print(f"ID: {recipe.recipe_id}, Title: {recipe.title}, "
-                  f"Ingredients: {recipe.ingredients}\n"
-                  f"Instructions:\n{recipe.instructions}")
-        print()
+        stream = stream or sys.stdout
+        stream.write("\033[1m" + "Favourite recipes: " + "\033[0m\n")
+        self.write_recipes(stream, summary=summary)
+        stream.write("\n")
+        stream.flush()
 
-    def perform_update_recipe(self, recipe_id, new_title, new_ingredients, new_instructions):
+    def perform_update_recipe(self, recipe_id, new_title, new_ingredients, new_instructions,
+                              expected_version=None, console=None):
         """
         Updates an existing recipe in the collection.
 
@@ -60,39 +392,258 @@ class RecipeManager:
             new_title (str, optional): The new title for the recipe. Defaults to None.
             new_ingredients (str, optional): The new ingredients for the recipe. Defaults to None.
             new_instructions (str, optional): The new instructions for the recipe. Defaults to None.
+            expected_version (int, optional): Only update the recipe if it is still at
+             this version. Defaults to updating whatever version is current.
+            console (Console, optional): Where to write the outcome. Defaults to the terminal.
 
         Returns:
-            None
+            bool: True if the recipe was updated, False if it was not found or had changed.
         """
+        console = console or standard_console
+        if self.update_recipe(recipe_id, new_title, new_ingredients, new_instructions, expected_version):
+            console.write("Recipe updated successfully!\n")
+            return True
+        if recipe_id in self.recipes_by_id:
+            console.write(f"Recipe with ID: {recipe_id} was changed by someone else. Please try again.\n")
+        else:
+            console.write(f"Recipe with ID: {recipe_id} not found.\n")
+        return False
 
-        for recipe in self.recipes:
-            if recipe.recipe_id == recipe_id:
-                if new_title is not None:
-                    recipe.title = new_title
-                if new_ingredients is not None:
-                    recipe.ingredients = new_ingredients
-                if new_instructions is not None:
-                    recipe.instructions = new_instructions
-                print(f"Recipe updated successfully!\n")
-                return
-        print(f"Recipe with ID: {recipe_id} not found.\n")
+    @metrics.timed("recipe.update")
+    def update_recipe(self, recipe_id, new_title=None, new_ingredients=None, new_instructions=None,
+                      expected_version=None):
+        """
+        Updates an existing recipe without printing anything, for callers other
+        than the command line interface. Fields left as None are not changed.
+
+        Given an expected_version, the update is a compare-and-set: it is applied
+        only if the recipe has not been updated since that version was read.
+        Fields given the value they already hold are treated as left alone, and
+        an update that changes nothing keeps the version and records no history.
+
+        Args:
+            recipe_id (int): The ID of the recipe to update.
+            new_title (str, optional): The new title for the recipe. Defaults to None.
+            new_ingredients (str, optional): The new ingredients for the recipe. Defaults to None.
+            new_instructions (str, optional): The new instructions for the recipe. Defaults to None.
+            expected_version (int, optional): The version the caller last read. Defaults to None.
+
+        Returns:
+            bool: True if the recipe was updated or already held the new values, False
+             if it was not found or its version was not the expected one.
+        """
+        with self.lock:
+            recipe = self.recipes_by_id.get(recipe_id)
+            if recipe is None or (expected_version is not None and recipe.version != expected_version):
+                return False
+            old_title, old_ingredients, old_instructions = recipe.title, recipe.ingredients, recipe.instructions
+            if new_title == old_title:
+                new_title = None
+            if new_ingredients == old_ingredients:
+                new_ingredients = None
+            if new_instructions == old_instructions:
+                new_instructions = None
+            if new_title is None and new_ingredients is None and new_instructions is None:
+                return True
+            if new_title is not None or new_instructions is not None:
+                self.search_index.remove(recipe_id, recipe.title, recipe.instructions)
+                self.search_index.add(recipe_id,
+                                      new_title if new_title is not None else recipe.title,
+                                      new_instructions if new_instructions is not None else recipe.instructions)
+            if new_title is not None:
+                recipe.title = new_title
+            if new_ingredients is not None or new_instructions is not None:
+                # The body may be shared with other users' recipes, so the
+                # recipe is switched to a body for the new text instead.
+                old_tokens = recipe.ingredient_tokens
+                recipe.set_body(new_ingredients, new_instructions)
+                self.ingredient_index.update_tokens(recipe_id, old_tokens, recipe.ingredient_tokens)
+            recipe.version += 1
+            self.history.record(recipe, recipe.version - 1, old_title, old_ingredients, old_instructions)
+            self.storage.update_recipe(recipe)
+            body_changed = new_ingredients is not None or new_instructions is not None
+            change_events.publish(RecipeUpdated(self.user_email, recipe_id, recipe.version, new_title,
+                                                recipe.body if body_changed else None))
+            self.dirty = True
+        change_events.deliver()
+        return True
 
-    def perform_delete_recipe(self, recipe_id):
+    def perform_delete_recipe(self, recipe_id, console=None):
         """
         Deletes a recipe from the collection.
 
         Args:
             recipe_id (int): The ID of the recipe to delete.
+            console (Console, optional): Where to write the outcome. Defaults to the terminal.
 
         Returns:
-            None
+            bool: True if the recipe was deleted, False if it was not found.
         """
-        for i, recipe in enumerate(self.recipes):
-            if recipe.recipe_id == recipe_id:
-                del self.recipes[i]
-                print(f"Recipe with ID {recipe_id} deleted successfully!\n")
-                return
-        print(f"Recipe with ID: {recipe_id} not found.\n")
+        if not self.delete_recipe(recipe_id):
+            (console or standard_console).write(f"Recipe with ID: {recipe_id} not found.\n")
+            return False
+        return True
+
+    @metrics.timed("recipe.delete")
+    def delete_recipe(self, recipe_id):
+        """
+        Deletes a recipe without printing anything, for callers other than the
+        command line interface.
+
+        Args:
+            recipe_id (int): The ID of the recipe to delete.
+
+        Returns:
+            bool: True if the recipe was deleted, False if it was not found.
+        """
+        with self.lock:
+            recipe = self.recipes_by_id.pop(recipe_id, None)
+            if recipe is None:
+                return False
+            del self.recipe_ids[bisect_left(self.recipe_ids, recipe_id)]
+            self.ingredient_index.remove_tokens(recipe_id, recipe.ingredient_tokens)
+            self.search_index.remove(recipe_id, recipe.title, recipe.instructions)
+            self.history.forget(recipe_id)
+            self.storage.delete_recipe(self.user_email, recipe_id)
+            change_events.publish(RecipeDeleted(self.user_email, recipe_id))
+            recipe.release()
+            self.dirty = True
+        change_events.deliver()
+        return True
+
+    def recipe_versions(self, recipe_id):
+        """
+        Lists the versions of a recipe that can be viewed or reverted to.
+
+        Args:
+            recipe_id (int): The ID of the recipe.
+
+        Returns:
+            list[tuple[int, float]]: The version number of each version and the time it
+             was replaced, newest first, with None as the time of the current version;
+             or None if the recipe was not found.
+        """
+        with self.lock:
+            recipe = self.recipes_by_id.get(recipe_id)
+            if recipe is None:
+                return None
+            return [(recipe.version, None)] + self.history.versions(recipe_id)
+
+    def get_version(self, recipe_id, version):
+        """
+        Rebuilds a version of a recipe from its history.
+
+        Args:
+            recipe_id (int): The ID of the recipe.
+            version (int): The version number.
+
+        Returns:
+            tuple[str, str, str]: The title, ingredients and instructions of that version,
+             or None if the recipe or the version was not found.
+        """
+        with self.lock:
+            recipe = self.recipes_by_id.get(recipe_id)
+            if recipe is None:
+                return None
+            return self.history.reconstruct(recipe, version)
+
+    def diff_versions(self, recipe_id, old_version, new_version=None):
+        """
+        Compares two versions of a recipe.
+
+        Args:
+            recipe_id (int): The ID of the recipe.
+            old_version (int): The version number to compare from.
+            new_version (int, optional): The version number to compare to. Defaults to the current version.
+
+        Returns:
+            list[str]: The lines of a unified diff, or None if the recipe or a version was not found.
+        """
+        with self.lock:
+            recipe = self.recipes_by_id.get(recipe_id)
+            if recipe is None:
+                return None
+            new_version = recipe.version if new_version is None else new_version
+            old, new = self.history.reconstruct(recipe, old_version), self.history.reconstruct(recipe, new_version)
+        if old is None or new is None:
+            return None
+        return list(difflib.unified_diff(render_version(*old), render_version(*new),
+                                         f"version {old_version}", f"version {new_version}"))
+
+    def perform_revert_recipe(self, recipe_id, version, console=None):
+        """
+        Restores an earlier version of a recipe.
+
+        Args:
+            recipe_id (int): The ID of the recipe.
+            version (int): The version number to restore.
+            console (Console, optional): Where to write the outcome. Defaults to the terminal.
+
+        Returns:
+            bool: True if the recipe was reverted, False otherwise.
+        """
+        console = console or standard_console
+        if self.revert_recipe(recipe_id, version):
+            console.write(f"Recipe with ID: {recipe_id} reverted to version {version}.\n")
+            return True
+        console.write(f"Version {version} of the recipe with ID: {recipe_id} was not found.\n")
+        return False
+
+    @metrics.timed("recipe.revert")
+    def revert_recipe(self, recipe_id, version, expected_version=None):
+        """
+        Restores an earlier version of a recipe without printing anything. The
+        restored text becomes a new version, so a revert can itself be undone.
+
+        Args:
+            recipe_id (int): The ID of the recipe.
+            version (int): The version number to restore.
+            expected_version (int, optional): Only revert the recipe if it is still at
+             this version. Defaults to reverting whatever version is current.
+
+        Returns:
+            bool: True if the recipe was reverted, False if the recipe or the version
+             was not found or the recipe had changed.
+        """
+        restored = self.get_version(recipe_id, version)
+        if restored is None:
+            return False
+        return self.update_recipe(recipe_id, *restored, expected_version=expected_version)
+
+    @metrics.timed("recipe.find_by_ingredients")
+    def find_by_ingredients(self, all_of=(), any_of=(), none_of=()):
+        """
+        Finds recipes by their ingredients. Ingredients are matched
+        case-insensitively against the comma-separated ingredients of each recipe.
+
+        Args:
+            all_of (iterable[str], optional): Ingredients every match must use.
+            any_of (iterable[str], optional): Ingredients of which every match must use at least one.
+            none_of (iterable[str], optional): Ingredients no match may use. Without
+             all_of or any_of, every recipe in the collection is checked.
+
+        Returns:
+            list[FavouriteRecipes]: The matching recipes in ID order.
+        """
+        with self.lock:
+            recipe_ids = self.ingredient_index.find(all_of, any_of, none_of, self.recipe_ids)
+            return [self.recipes_by_id[recipe_id] for recipe_id in recipe_ids]
+
+    @metrics.timed("recipe.search")
+    def search(self, query, limit=10):
+        """
+        Searches the titles and instructions of the collection.
+
+        Args:
+            query (str): The words to search for; text in double quotes must match as a phrase.
+            limit (int, optional): The most results to return. Defaults to 10.
+
+        Returns:
+            list[tuple[FavouriteRecipes, float]]: The best matching recipes and their scores, best first.
+        """
+        with self.lock:
+            return [(self.recipes_by_id[recipe_id], score)
+                    for score, recipe_id in self.search_index.search(query, limit)]
 
 
 recipe_manager = RecipeManager()
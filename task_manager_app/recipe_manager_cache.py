@@ -0,0 +1,175 @@
+import threading
+import weakref
+from collections import OrderedDict
+
+from recipe_manager import RecipeManager
+
+
+class RecipeManagerCache:
+    """
+    Keeps the recipe collections of recently active users in memory and
+    loads the others from storage on demand.
+
+    Collections are loaded the first time they are asked for and kept in
+    least-recently-used order. Whenever the cache grows past its budget,
+    either the number of collections or the total number of recipes they
+    hold, the least recently used collections are evicted; any buffered
+    writes are flushed to storage first. Collections whose storage backend
+    is not persistent are never held here, since evicting them would lose
+    their recipes.
+
+    Evicting a collection only drops the cache's own reference to it. While
+    anything else still holds it, such as a menu session or a request in
+    flight, the cache keeps a weak reference and hands back that same
+    instance instead of loading a second one, since two live collections
+    for one user would hand out the same recipe IDs. Such a collection is
+    never closed by the cache, since its holder is still using it; its
+    references to the shared recipe bodies are given back by its finalizer
+    once the last holder lets go of it. Discarding a collection closes it.
+
+    A single lock guards the cache's own bookkeeping, so it can be shared by
+    many threads; each collection handed out has its own lock for its recipes.
+
+    Attributes:
+        max_collections (int): The most collections to keep in memory.
+        max_recipes (int): The most recipes to keep in memory across all collections,
+         or None for no limit.
+        managers (OrderedDict[str, RecipeManager]): The cached collections keyed by
+         lower-cased email, least recently used first.
+        evicted (weakref.WeakValueDictionary[str, RecipeManager]): Evicted collections
+         that are still referenced elsewhere, keyed by lower-cased email.
+        hits (int): How many lookups found their collection in memory.
+        misses (int): How many lookups had to load their collection from storage.
+        evictions (int): How many collections have been evicted.
+        write_backs (int): How many evicted collections had writes to flush first.
+    """
+
+    def __init__(self, max_collections=1024, max_recipes=None):
+        """
+        Initializes a new, empty instance of RecipeManagerCache.
+
+        Args:
+            max_collections (int, optional): The most collections to keep in memory. Defaults to 1024.
+            max_recipes (int, optional): The most recipes to keep in memory. Defaults to no limit.
+        """
+        self.max_collections = max_collections
+        self.max_recipes = max_recipes
+        self.managers = OrderedDict()
+        self.evicted = weakref.WeakValueDictionary()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.write_backs = 0
+        self.lock = threading.RLock()
+
+    def get(self, user_email, storage):
+        """
+        Returns a user's recipe collection, loading it from storage if it is not in memory.
+        A collection that was evicted but is still in use elsewhere is taken back instead.
+        One held for the same user on a different storage backend is flushed and closed.
+
+        Args:
+            user_email (str): The email of the user who owns the collection.
+            storage (DataAccess): The persistent backend the collection is stored in.
+
+        Returns:
+            RecipeManager: The user's recipe collection.
+        """
+        key = user_email.lower()
+        with self.lock:
+            manager = self.managers.get(key)
+            if manager is not None and manager.storage is storage:
+                self.hits += 1
+                self.managers.move_to_end(key)
+                return manager
+            manager = self.managers.pop(key, None)
+            if manager is not None:
+                self.close_displaced(manager)
+            manager = self.evicted.pop(key, None)
+            if manager is not None and manager.storage is storage:
+                self.hits += 1
+            else:
+                if manager is not None:
+                    self.close_displaced(manager)
+                self.misses += 1
+                manager = RecipeManager(user_email, storage)
+            self.managers[key] = manager
+            self.evict_over_budget()
+            return manager
+
+    def close_displaced(self, manager):
+        """
+        Flushes and closes a collection being replaced by one on a different
+        storage backend, as eviction would, so its writes are kept and its
+        references to the shared recipe bodies are given back at once.
+        """
+        if manager.dirty:
+            manager.flush()
+        manager.close()
+
+    def discard(self, user_email):
+        """
+        Drops and closes a user's collection without writing it back, for example
+        after the user is deleted.
+
+        Args:
+            user_email (str): The email of the user who owns the collection.
+        """
+        with self.lock:
+            managers = [self.managers.pop(user_email.lower(), None), self.evicted.pop(user_email.lower(), None)]
+        for manager in managers:
+            if manager is not None:
+                manager.close()
+
+    def clear(self):
+        """
+        Flushes and drops every cached collection.
+        """
+        with self.lock:
+            self.flush()
+            self.evicted.update(self.managers)
+            self.managers.clear()
+
+    def over_budget(self):
+        if len(self.managers) > self.max_collections:
+            return True
+        if self.max_recipes is not None:
+            return sum(len(manager) for manager in self.managers.values()) > self.max_recipes
+        return False
+
+    def evict_over_budget(self):
+        """
+        Evicts least recently used collections until the cache is within budget.
+        The most recently used collection is always kept.
+        """
+        with self.lock:
+            while len(self.managers) > 1 and self.over_budget():
+                key, manager = self.managers.popitem(last=False)
+                self.evicted[key] = manager
+                if manager.dirty:
+                    manager.flush()
+                    self.write_backs += 1
+                self.evictions += 1
+
+    def flush(self):
+        """
+        Flushes the buffered writes of every cached collection.
+        """
+        with self.lock:
+            managers = list(self.managers.values())
+        for manager in managers:
+            if manager.dirty:
+                manager.flush()
+
+    def stats(self):
+        """
+        Returns the cache's counters.
+
+        Returns:
+            dict[str, int]: The hits, misses, evictions, write-backs and resident collections.
+        """
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "write_backs": self.write_backs, "resident": len(self.managers)}
+
+
+recipe_manager_cache = RecipeManagerCache()
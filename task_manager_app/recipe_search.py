@@ -0,0 +1,227 @@
+import heapq
+import math
+import re
+
+TOKEN_PATTERN = re.compile(r"\w+")
+PHRASE_PATTERN = re.compile(r'"([^"]*)"')
+
+# Positions of instruction words start this far after the last title word,
+# so a phrase can never match across the two fields.
+FIELD_GAP = 1000
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+FUZZY_THRESHOLD = 0.25
+FUZZY_EXPANSIONS = 3
+
+
+def tokenize(text):
+    """
+    Splits text into lower-case word tokens.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        list[str]: The tokens in the order they appear.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def trigrams(term):
+    """
+    Returns the character trigrams of a term, padded so that its start and end count too.
+
+    Args:
+        term (str): The term.
+
+    Returns:
+        set[str]: The trigrams.
+    """
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """
+    A full-text index over recipe titles and instructions with BM25 ranking.
+
+    The index is positional: for every term it records the positions at
+    which each recipe uses it, which allows quoted phrases to be matched.
+    Results are ranked with BM25 and the best k are picked with a heap
+    rather than by sorting every match. Query terms that are not in the
+    vocabulary are matched against similar terms found through a trigram
+    index over the vocabulary, which catches most typos.
+
+    Attributes:
+        postings (dict[str, dict[int, list[int]]]): For each term, the positions
+         at which each recipe uses it.
+        document_lengths (dict[int, int]): The number of tokens in each recipe.
+        total_length (int): The sum of document_lengths.
+        term_trigrams (dict[str, set[str]]): The vocabulary terms sharing each trigram.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new, empty instance of SearchIndex.
+        """
+        self.postings = {}
+        self.document_lengths = {}
+        self.total_length = 0
+        self.term_trigrams = {}
+
+    @staticmethod
+    def positions(title, instructions):
+        """
+        Tokenizes a recipe and groups the positions of each term.
+
+        Returns:
+            tuple[dict[str, list[int]], int]: The positions of each term and the number of tokens.
+        """
+        title_tokens = tokenize(title)
+        instruction_tokens = tokenize(instructions)
+        term_positions = {}
+        for position, term in enumerate(title_tokens):
+            term_positions.setdefault(term, []).append(position)
+        offset = len(title_tokens) + FIELD_GAP
+        for position, term in enumerate(instruction_tokens, offset):
+            term_positions.setdefault(term, []).append(position)
+        return term_positions, len(title_tokens) + len(instruction_tokens)
+
+    def add(self, recipe_id, title, instructions):
+        """
+        Indexes a recipe.
+
+        Args:
+            recipe_id (int): The ID of the recipe.
+            title (str): The recipe's title.
+            instructions (str): The recipe's instructions.
+        """
+        term_positions, length = self.positions(title, instructions)
+        for term, positions in term_positions.items():
+            documents = self.postings.get(term)
+            if documents is None:
+                documents = self.postings[term] = {}
+                for trigram in trigrams(term):
+                    self.term_trigrams.setdefault(trigram, set()).add(term)
+            documents[recipe_id] = positions
+        self.document_lengths[recipe_id] = length
+        self.total_length += length
+
+    def remove(self, recipe_id, title, instructions):
+        """
+        Removes a recipe from the index.
+
+        Args:
+            recipe_id (int): The ID of the recipe.
+            title (str): The title the recipe was indexed with.
+            instructions (str): The instructions the recipe was indexed with.
+        """
+        if recipe_id not in self.document_lengths:
+            return
+        for term in set(tokenize(title)) | set(tokenize(instructions)):
+            documents = self.postings.get(term)
+            if documents is None:
+                continue
+            documents.pop(recipe_id, None)
+            if not documents:
+                del self.postings[term]
+                for trigram in trigrams(term):
+                    terms = self.term_trigrams[trigram]
+                    terms.discard(term)
+                    if not terms:
+                        del self.term_trigrams[trigram]
+        self.total_length -= self.document_lengths.pop(recipe_id)
+
+    def similar_terms(self, term):
+        """
+        Finds vocabulary terms spelled similarly to a term, for fuzzy matching.
+
+        Args:
+            term (str): The term, usually one that is not in the vocabulary.
+
+        Returns:
+            list[tuple[str, float]]: Up to FUZZY_EXPANSIONS terms and their trigram
+             similarity, most similar first.
+        """
+        term_trigrams = trigrams(term)
+        shared = {}
+        for trigram in term_trigrams:
+            for candidate in self.term_trigrams.get(trigram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        scored = []
+        for candidate, count in shared.items():
+            similarity = count / (len(term_trigrams) + len(trigrams(candidate)) - count)
+            if similarity >= FUZZY_THRESHOLD:
+                scored.append((similarity, candidate))
+        return [(candidate, similarity) for similarity, candidate in heapq.nlargest(FUZZY_EXPANSIONS, scored)]
+
+    def expand(self, term, fuzzy):
+        """
+        Returns the vocabulary terms a query term should match and their weights.
+        """
+        if term in self.postings:
+            return [(term, 1.0)]
+        return self.similar_terms(term) if fuzzy else []
+
+    def phrase_matches(self, phrase_terms):
+        """
+        Finds the recipes containing a sequence of terms at consecutive positions.
+
+        Args:
+            phrase_terms (list[str]): The terms of the phrase.
+
+        Returns:
+            set[int]: The IDs of the matching recipes.
+        """
+        documents_per_term = [self.postings.get(term) for term in phrase_terms]
+        if not phrase_terms or any(documents is None for documents in documents_per_term):
+            return set()
+        candidates = set(min(documents_per_term, key=len))
+        for documents in documents_per_term:
+            candidates &= documents.keys()
+        matches = set()
+        for recipe_id in candidates:
+            starts = set(documents_per_term[0][recipe_id])
+            for offset, documents in enumerate(documents_per_term[1:], 1):
+                starts &= {position - offset for position in documents[recipe_id]}
+                if not starts:
+                    break
+            if starts:
+                matches.add(recipe_id)
+        return matches
+
+    def search(self, query, limit=10, fuzzy=True):
+        """
+        Searches the index and ranks the matching recipes with BM25.
+
+        Every word of the query contributes to the score; parts of the query
+        in double quotes must also appear in a recipe as an exact phrase.
+
+        Args:
+            query (str): The search query.
+            limit (int, optional): The most results to return. Defaults to 10.
+            fuzzy (bool, optional): Whether unknown words match similarly spelled ones. Defaults to True.
+
+        Returns:
+            list[tuple[float, int]]: The score and recipe ID of the best matches, best first.
+        """
+        document_count = len(self.document_lengths)
+        if not document_count:
+            return []
+        average_length = self.total_length / document_count
+        scores = {}
+        for query_term in set(tokenize(query)):
+            for term, weight in self.expand(query_term, fuzzy):
+                documents = self.postings[term]
+                frequency = len(documents)
+                idf = math.log(1 + (document_count - frequency + 0.5) / (frequency + 0.5))
+                for recipe_id, positions in documents.items():
+                    term_frequency = len(positions)
+                    length_norm = 1 - BM25_B + BM25_B * self.document_lengths[recipe_id] / average_length
+                    score = idf * term_frequency * (BM25_K1 + 1) / (term_frequency + BM25_K1 * length_norm)
+                    scores[recipe_id] = scores.get(recipe_id, 0.0) + weight * score
+        for phrase in PHRASE_PATTERN.findall(query):
+            matches = self.phrase_matches(tokenize(phrase))
+            scores = {recipe_id: score for recipe_id, score in scores.items() if recipe_id in matches}
+        return heapq.nlargest(limit, ((score, recipe_id) for recipe_id, score in scores.items()))
@@ -0,0 +1,277 @@
+from array import array
+from bisect import bisect_left
+
+FIELD_COUNT = 3  # title, ingredients, instructions
+
+
+class RecipeView:
+    """
+    A lightweight, read-only view of one row of a RecipeTable.
+
+    It exposes the same attributes as FavouriteRecipes, decoding the text
+    fields from the table's buffer each time they are read.
+
+    Attributes:
+        table (RecipeTable): The table the row belongs to.
+        row (int): The position of the row within the table.
+    """
+
+    __slots__ = ("table", "row")
+
+    def __init__(self, table, row):
+        """
+        Initializes a new instance of RecipeView.
+
+        Args:
+            table (RecipeTable): The table the row belongs to.
+            row (int): The position of the row within the table.
+        """
+        self.table = table
+        self.row = row
+
+    @property
+    def recipe_id(self):
+        return self.table.ids[self.row]
+
+    @property
+    def title(self):
+        return self.table.read_field(self.row, 0)
+
+    @property
+    def ingredients(self):
+        return self.table.read_field(self.row, 1)
+
+    @property
+    def instructions(self):
+        return self.table.read_field(self.row, 2)
+
+    @property
+    def user_email(self):
+        return self.table.emails[self.table.owners[self.row]]
+
+
+class RecipeTable:
+    """
+    A compact, column-oriented store for a collection of recipes.
+
+    Instead of one object per recipe, the table keeps each column in a flat
+    container: recipe IDs in an array('q'), the owner's email as an index into
+    a table of interned strings, and the three text fields encoded as UTF-8 in
+    a single shared bytearray addressed by offset and length. Rows are read
+    through RecipeView objects, which behave like FavouriteRecipes.
+
+    Recipe IDs must be added in ascending order, which RecipeManager's ID
+    counter guarantees, so a recipe can be found with a binary search rather
+    than a per-row dictionary entry. Deleted rows are only marked as deleted;
+    compact() reclaims their space.
+
+    The table is a standalone structure: RecipeManager keeps its recipes as
+    FavouriteRecipes objects, and a table is built with from_recipes where a
+    compact, read-mostly copy of a collection is wanted.
+
+    Attributes:
+        ids (array): The recipe ID of each row.
+        owners (array): The index into emails of each row's owner.
+        starts (array): The offset in text at which each row's fields begin.
+        lengths (array): The encoded length of each field, three per row.
+        text (bytearray): The UTF-8 encoded text fields of every row.
+        emails (list[str]): The interned owner emails, None included.
+        deleted (bytearray): A flag per row marking rows that have been deleted.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new, empty instance of RecipeTable.
+        """
+        self.ids = array('q')
+        self.owners = array('l')
+        self.starts = array('q')
+        self.lengths = array('l')
+        self.text = bytearray()
+        self.emails = [None]
+        self.email_index = {None: 0}
+        self.deleted = bytearray()
+        self.live_rows = 0
+
+    @classmethod
+    def from_recipes(cls, recipes):
+        """
+        Builds a table from existing recipes.
+
+        Args:
+            recipes (iterable[FavouriteRecipes]): The recipes, in ascending ID order.
+
+        Returns:
+            RecipeTable: The populated table.
+        """
+        table = cls()
+        for recipe in recipes:
+            table.append(recipe.recipe_id, recipe.title, recipe.ingredients,
+                         recipe.instructions, recipe.user_email)
+        return table
+
+    def intern_email(self, email):
+        """
+        Returns the index of an email address in the intern table, adding it if needed.
+
+        Args:
+            email (str): The email address, or None.
+
+        Returns:
+            int: The index of the email address in emails.
+        """
+        index = self.email_index.get(email)
+        if index is None:
+            index = len(self.emails)
+            self.emails.append(email)
+            self.email_index[email] = index
+        return index
+
+    def write_fields(self, title, ingredients, instructions):
+        """
+        Appends the encoded text fields to the buffer.
+
+        Returns:
+            tuple[int, list[int]]: The start offset and the encoded length of each field.
+        """
+        start = len(self.text)
+        lengths = []
+        for value in (title, ingredients, instructions):
+            encoded = value.encode('utf-8')
+            self.text += encoded
+            lengths.append(len(encoded))
+        return start, lengths
+
+    def append(self, recipe_id, title, ingredients, instructions, user_email=None):
+        """
+        Adds a recipe to the end of the table.
+
+        Args:
+            recipe_id (int): The ID of the recipe; must be greater than every ID already in the table.
+            title (str): The title of the recipe.
+            ingredients (str): The ingredients required for the recipe.
+            instructions (str): The cooking instructions for the recipe.
+            user_email (str, optional): The email of the user who added the recipe. Defaults to None.
+
+        Returns:
+            RecipeView: A view of the new row.
+
+        Raises:
+            ValueError: If recipe_id is not greater than the last ID in the table.
+        """
+        if self.ids and recipe_id <= self.ids[-1]:
+            raise ValueError(f"Recipe ID {recipe_id} must be greater than {self.ids[-1]}.")
+        start, lengths = self.write_fields(title, ingredients, instructions)
+        self.ids.append(recipe_id)
+        self.owners.append(self.intern_email(user_email))
+        self.starts.append(start)
+        self.lengths.extend(lengths)
+        self.deleted.append(0)
+        self.live_rows += 1
+        return RecipeView(self, len(self.ids) - 1)
+
+    def find_row(self, recipe_id):
+        """
+        Finds the row holding a recipe.
+
+        Args:
+            recipe_id (int): The ID of the recipe.
+
+        Returns:
+            int: The row of the recipe, or None if it is not in the table.
+        """
+        row = bisect_left(self.ids, recipe_id)
+        if row < len(self.ids) and self.ids[row] == recipe_id and not self.deleted[row]:
+            return row
+        return None
+
+    def read_field(self, row, field):
+        """
+        Decodes one text field of a row.
+
+        Args:
+            row (int): The row to read.
+            field (int): 0 for the title, 1 for the ingredients, 2 for the instructions.
+
+        Returns:
+            str: The decoded text.
+        """
+        base = row * FIELD_COUNT
+        start = self.starts[row]
+        for i in range(field):
+            start += self.lengths[base + i]
+        end = start + self.lengths[base + field]
+        return self.text[start:end].decode('utf-8')
+
+    def get(self, recipe_id):
+        """
+        Looks up a recipe by its ID.
+
+        Args:
+            recipe_id (int): The ID of the recipe.
+
+        Returns:
+            RecipeView: A view of the recipe, or None if it is not in the table.
+        """
+        row = self.find_row(recipe_id)
+        return RecipeView(self, row) if row is not None else None
+
+    def update(self, recipe_id, new_title=None, new_ingredients=None, new_instructions=None):
+        """
+        Updates the text fields of a recipe. Fields left as None keep their current value.
+
+        The new text is appended to the buffer; the old bytes are reclaimed by compact().
+
+        Returns:
+            bool: True if the recipe was updated, False if it was not found.
+        """
+        row = self.find_row(recipe_id)
+        if row is None:
+            return False
+        values = [self.read_field(row, field) for field in range(FIELD_COUNT)]
+        for field, new_value in enumerate((new_title, new_ingredients, new_instructions)):
+            if new_value is not None:
+                values[field] = new_value
+        start, lengths = self.write_fields(*values)
+        self.starts[row] = start
+        self.lengths[row * FIELD_COUNT:(row + 1) * FIELD_COUNT] = array('l', lengths)
+        return True
+
+    def delete(self, recipe_id):
+        """
+        Marks a recipe as deleted.
+
+        Returns:
+            bool: True if the recipe was deleted, False if it was not found.
+        """
+        row = self.find_row(recipe_id)
+        if row is None:
+            return False
+        self.deleted[row] = 1
+        self.live_rows -= 1
+        return True
+
+    def compact(self):
+        """
+        Rebuilds the table without deleted rows or text left behind by updates.
+        The live rows are copied into a new table, whose columns then replace
+        this table's. Views taken before compacting no longer point at their rows.
+        """
+        compacted = RecipeTable.from_recipes(self)
+        self.ids = compacted.ids
+        self.owners = compacted.owners
+        self.starts = compacted.starts
+        self.lengths = compacted.lengths
+        self.text = compacted.text
+        self.emails = compacted.emails
+        self.email_index = compacted.email_index
+        self.deleted = compacted.deleted
+        self.live_rows = compacted.live_rows
+
+    def __iter__(self):
+        for row in range(len(self.ids)):
+            if not self.deleted[row]:
+                yield RecipeView(self, row)
+
+    def __len__(self):
+        return self.live_rows
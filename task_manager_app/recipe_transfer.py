@@ -0,0 +1,262 @@
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+
+from favourite_recipes import FavouriteRecipes
+from storage.journal_data_access import JournalDataAccess
+from storage.sqlite_data_access import SQLiteDataAccess
+
+TEXT_FIELDS = ("title", "ingredients", "instructions")
+EXPORT_FIELDS = ("recipe_id",) + TEXT_FIELDS
+FORMATS = ("jsonl", "csv")
+
+
+class TransferReport:
+    """
+    Summarises an import or export.
+
+    Attributes:
+        rows (int): How many rows were read (import) or written (export).
+        rejected (int): How many rows failed validation and were skipped.
+        seconds (float): How long the transfer took.
+    """
+
+    def __init__(self, rows, rejected, seconds):
+        self.rows = rows
+        self.rejected = rejected
+        self.seconds = seconds
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else float("inf")
+
+    def __str__(self):
+        return (f"{self.rows} rows ({self.rejected} rejected) in {self.seconds:.2f} s, "
+                f"{self.rows_per_second:,.0f} rows/s")
+
+
+def detect_format(path):
+    """
+    Works out the file format from a file name's extension.
+
+    Args:
+        path (str): The file name.
+
+    Returns:
+        str: 'jsonl' or 'csv'.
+
+    Raises:
+        ValueError: If the extension is not recognised.
+    """
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    if extension in ("jsonl", "ndjson"):
+        return "jsonl"
+    if extension == "csv":
+        return "csv"
+    raise ValueError(f"Cannot tell the format of {path}; use --format.")
+
+
+def read_rows(file, file_format):
+    """
+    Lazily reads rows from a JSON Lines or CSV file.
+
+    Args:
+        file (file): A text file open for reading.
+        file_format (str): 'jsonl' or 'csv'.
+
+    Yields:
+        tuple[int, object]: The line number and the parsed row, or the
+         exception raised while parsing a malformed JSON line.
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as error:
+            yield line_number, error
+
+
+def validate_batch(batch):
+    """
+    Validates a batch of parsed rows.
+
+    Args:
+        batch (list[tuple[int, object]]): The line number and parsed row of each row.
+
+    Returns:
+        tuple[list[tuple[str, str, str]], list[tuple[int, str]]]: The title,
+         ingredients and instructions of each valid row, and the line number
+         and reason of each rejected row.
+    """
+    valid = []
+    rejected = []
+    for line_number, row in batch:
+        if isinstance(row, Exception):
+            rejected.append((line_number, f"invalid JSON: {row}"))
+            continue
+        if not isinstance(row, dict):
+            rejected.append((line_number, "expected an object"))
+            continue
+        values = tuple(row.get(field) for field in TEXT_FIELDS)
+        blank = [field for field, value in zip(TEXT_FIELDS, values)
+                 if not isinstance(value, str) or not value.strip()]
+        if blank:
+            rejected.append((line_number, f"missing {', '.join(blank)}"))
+        else:
+            valid.append(values)
+    return valid, rejected
+
+
+def import_recipes(storage, user_email, file, file_format, batch_size=1000, errors=None):
+    """
+    Streams recipes from a file straight into a user's stored collection.
+
+    Rows are read and validated batch_size at a time and each batch of valid
+    rows is handed to the storage backend's insert_recipes, with IDs carrying
+    on from the user's stored ID counter. The collection itself is never
+    loaded, so memory use depends on the batch size, not on the size of the
+    file or of the collection. IDs in the file are ignored.
+
+    Args:
+        storage (DataAccess): The backend holding the user's recipes.
+        user_email (str): The email of the user to import for.
+        file (file): A text file open for reading.
+        file_format (str): 'jsonl' or 'csv'.
+        batch_size (int, optional): How many rows to validate and insert at a time. Defaults to 1000.
+        errors (file, optional): Where to report rejected rows. Defaults to sys.stderr.
+
+    Returns:
+        TransferReport: The number of rows read and rejected and the time taken.
+    """
+    errors = errors or sys.stderr
+    start = time.perf_counter()
+    rows = 0
+    rejected_count = 0
+    next_recipe_id = storage.load_next_recipe_id(user_email)
+    batch = []
+
+    def insert(batch):
+        nonlocal next_recipe_id
+        valid, rejected = validate_batch(batch)
+        recipes = [FavouriteRecipes(next_recipe_id + i, title, ingredients, instructions, user_email)
+                   for i, (title, ingredients, instructions) in enumerate(valid)]
+        try:
+            storage.insert_recipes(recipes)
+        finally:
+            for recipe in recipes:
+                recipe.release()
+        next_recipe_id += len(valid)
+        for line_number, reason in rejected:
+            errors.write(f"line {line_number}: {reason}\n")
+        return len(rejected)
+
+    for parsed in read_rows(file, file_format):
+        batch.append(parsed)
+        rows += 1
+        if len(batch) == batch_size:
+            rejected_count += insert(batch)
+            batch = []
+    rejected_count += insert(batch)
+    storage.flush()
+    return TransferReport(rows, rejected_count, time.perf_counter() - start)
+
+
+def export_recipes(storage, user_email, file, file_format, batch_size=1000):
+    """
+    Streams a user's stored recipes to a file, one row per recipe.
+
+    Recipes are read from the storage backend's iter_recipes batch_size at a
+    time and written as they arrive. The collection itself is never loaded,
+    so memory use depends on the batch size, not on the size of the collection.
+
+    Args:
+        storage (DataAccess): The backend holding the user's recipes.
+        user_email (str): The email of the user to export for.
+        file (file): A text file open for writing.
+        file_format (str): 'jsonl' or 'csv'.
+        batch_size (int, optional): How many recipes to read at a time. Defaults to 1000.
+
+    Returns:
+        TransferReport: The number of rows written and the time taken.
+    """
+    start = time.perf_counter()
+    rows = 0
+    if file_format == "csv":
+        writer = csv.writer(file)
+        writer.writerow(EXPORT_FIELDS)
+        for values in storage.iter_recipes(user_email, batch_size):
+            writer.writerow(values)
+            rows += 1
+    else:
+        for values in storage.iter_recipes(user_email, batch_size):
+            file.write(json.dumps(dict(zip(EXPORT_FIELDS, values)), ensure_ascii=False) + "\n")
+            rows += 1
+    return TransferReport(rows, 0, time.perf_counter() - start)
+
+
+def open_file(path, mode, standard_stream):
+    """
+    Opens a file for the command line, treating '-' as standard input or output,
+    which is left open afterwards.
+    """
+    if path == "-":
+        return contextlib.nullcontext(standard_stream)
+    return open(path, mode, newline="", encoding="utf-8")
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Import or export a user's recipes as JSON Lines or CSV.")
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("file", help="The file to read from or write to; '-' for standard input/output.")
+    parser.add_argument("--user", required=True, help="The email of the user whose recipes to transfer.")
+    parser.add_argument("--format", choices=FORMATS, help="The file format. Defaults to the file's extension.")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows read and written per batch.")
+    backend = parser.add_mutually_exclusive_group(required=True)
+    backend.add_argument("--db", help="The SQLite database holding the recipes.")
+    backend.add_argument("--journal", help="The journal directory holding the recipes.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Runs the import or export command line.
+
+    Args:
+        argv (list[str], optional): The command line arguments. Defaults to sys.argv.
+
+    Returns:
+        int: The process exit status.
+    """
+    arguments = parse_arguments(argv)
+    file_format = arguments.format or detect_format(arguments.file)
+    storage = SQLiteDataAccess(arguments.db) if arguments.db else JournalDataAccess(arguments.journal)
+    try:
+        account = storage.load_account(arguments.user.strip())
+        if account is None:
+            print(f"User {arguments.user} not found.", file=sys.stderr)
+            return 1
+        user_email = account[0]
+        if arguments.command == "import":
+            with open_file(arguments.file, "r", sys.stdin) as file:
+                report = import_recipes(storage, user_email, file, file_format, arguments.batch_size)
+        else:
+            with open_file(arguments.file, "w", sys.stdout) as file:
+                report = export_recipes(storage, user_email, file, file_format, arguments.batch_size)
+        print(f"{arguments.command.capitalize()}ed {report}", file=sys.stderr)
+        return 0
+    finally:
+        storage.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,490 @@
+import itertools
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import Future
+
+from batch_runner import BatchError
+from change_events import (AccountCreated, AccountDeleted, RecipeCreated, RecipeDeleted, RecipeUpdated,
+                           change_events)
+from favourite_recipes import FavouriteRecipes
+from globals import all_accounts
+from sharding import RECIPE_FIELDS, ShardError, ShardWorker
+from user import User, admin_user
+
+DEFAULT_MAX_BATCH = 256
+# Followers never log anyone in, so their copies of accounts carry no usable password hash.
+NO_PASSWORD_HASH = "!"
+
+
+class ReplicaWorker(ShardWorker):
+    """
+    Keeps a read-only copy of the accounts and recipes inside a follower
+    process, applying the primary's changes in sequence order.
+
+    It answers the read operations account, list, get, search,
+    find_by_ingredients, users and count_users, each naming the user it
+    reads for under "as", like a shard worker. Operations that would make
+    changes are not accepted; changes only arrive from the primary.
+
+    Attributes:
+        sequence (int): The sequence number of the last change applied.
+    """
+
+    def __init__(self, accounts):
+        """
+        Initializes a new instance of ReplicaWorker.
+
+        Args:
+            accounts (AccountRegistry): The registry to keep the copy in.
+        """
+        super().__init__(accounts)
+        for operation in ("login", "create_account", "create", "update", "delete", "remove_account"):
+            del self.handlers[operation]
+        self.handlers.update({
+            "get": self.get_recipe,
+            "search": self.search,
+            "find_by_ingredients": self.find_by_ingredients,
+        })
+        self.sequence = 0
+        self.appliers = {
+            AccountCreated: self.account_created,
+            AccountDeleted: self.account_deleted,
+            RecipeCreated: self.recipe_created,
+            RecipeUpdated: self.recipe_updated,
+            RecipeDeleted: self.recipe_deleted,
+        }
+
+    def load_snapshot(self, sequence, accounts):
+        """
+        Replaces the copy with a snapshot of the primary.
+
+        Args:
+            sequence (int): The primary's sequence number when the snapshot was started.
+            accounts (list[tuple]): Each account's email, admin flag, next recipe ID and
+             recipes, as tuples of RECIPE_FIELDS followed by the version.
+        """
+        for account in list(self.accounts):
+            self.accounts.remove(account)
+        for email, is_admin, next_recipe_id, recipes in accounts:
+            user = User(email, None, is_admin, password_hash=NO_PASSWORD_HASH)
+            self.accounts.add(user)
+            recipe_manager = user.recipe_manager
+            for recipe_id, title, ingredients, instructions, version in recipes:
+                recipe = FavouriteRecipes(recipe_id, title, ingredients, instructions, email)
+                recipe.version = version
+                recipe_manager.add_recipe(recipe)
+            recipe_manager.next_recipe_id = next_recipe_id
+        self.sequence = sequence
+
+    def apply_change(self, event):
+        """
+        Applies one of the primary's changes. Changes may overlap with the
+        snapshot the copy was started from, so applying one that is already
+        reflected leaves the copy as it is.
+
+        Args:
+            event (ChangeEvent): The change.
+        """
+        applier = self.appliers.get(type(event))
+        if applier is not None:
+            applier(event)
+        self.sequence = event.sequence
+
+    def recipe_manager_of(self, email):
+        account = self.accounts.get(email) if email is not None else None
+        return account.recipe_manager if account is not None else None
+
+    def account_created(self, event):
+        self.accounts.remove_email(event.email)
+        self.accounts.add(User(event.email, None, event.is_admin, password_hash=NO_PASSWORD_HASH))
+
+    def account_deleted(self, event):
+        self.accounts.remove_email(event.email)
+
+    def recipe_created(self, event):
+        recipe_manager = self.recipe_manager_of(event.user_email)
+        if recipe_manager is None:
+            return
+        if event.recipe_id in recipe_manager:
+            recipe_manager.update_recipe(event.recipe_id, event.title, event.ingredients, event.instructions)
+        elif event.recipe_id >= recipe_manager.next_recipe_id:
+            recipe_manager.add_recipe(FavouriteRecipes(event.recipe_id, event.title, event.ingredients,
+                                                       event.instructions, event.user_email))
+            recipe_manager.next_recipe_id = event.recipe_id + 1
+        # Otherwise the recipe was deleted again before the snapshot was taken.
+
+    def recipe_updated(self, event):
+        recipe_manager = self.recipe_manager_of(event.user_email)
+        if recipe_manager is not None and recipe_manager.update_recipe(event.recipe_id, event.title,
+                                                                       event.ingredients, event.instructions):
+            recipe_manager.get(event.recipe_id).version = event.version
+
+    def recipe_deleted(self, event):
+        recipe_manager = self.recipe_manager_of(event.user_email)
+        if recipe_manager is not None:
+            recipe_manager.delete_recipe(event.recipe_id)
+
+    def get_recipe(self, fields):
+        recipe_id = self.integer_field(fields, "id")
+        recipe = self.current_user().recipe_manager.get(recipe_id)
+        if recipe is None:
+            raise BatchError(f"Recipe with ID: {recipe_id} not found.")
+        result = {field: getattr(recipe, field) for field in RECIPE_FIELDS}
+        result["version"] = recipe.version
+        return result
+
+    def search(self, fields):
+        results = self.current_user().recipe_manager.search(self.text_field(fields, "query", True),
+                                                            self.integer_field(fields, "limit", False) or 10)
+        return {"results": [{"recipe_id": recipe.recipe_id, "title": recipe.title, "score": score}
+                            for recipe, score in results]}
+
+    def users(self, fields):
+        page = super().users(fields)["users"]
+        return {"users": [{"email": email, "is_admin": is_admin} for _, email, is_admin in page]}
+
+    def find_by_ingredients(self, fields):
+        recipes = self.current_user().recipe_manager.find_by_ingredients(
+            fields.get("all_of", ()), fields.get("any_of", ()), fields.get("none_of", ()))
+        return {"recipes": [{"recipe_id": recipe.recipe_id, "title": recipe.title} for recipe in recipes]}
+
+
+def serve_replica(connection):
+    """
+    Runs a follower until the primary closes the connection. It is the
+    target of each follower process.
+
+    The primary sends a snapshot, then batches of changes and read
+    operations, all over the one pipe. Each batch of changes is acknowledged
+    with the sequence number reached. A read that asks for a sequence number
+    the follower has not reached yet waits until it has.
+
+    Args:
+        connection (multiprocessing.connection.Connection): The follower's end of its pipe to the primary.
+    """
+    # The copy is filled from the primary's snapshot, administrator included.
+    all_accounts.remove(admin_user)
+    worker = ReplicaWorker(all_accounts)
+    waiting = []
+    try:
+        while True:
+            try:
+                message = connection.recv()
+            except EOFError:
+                break
+            if message is None:
+                break
+            kind = message[0]
+            if kind == "snapshot":
+                worker.load_snapshot(message[1], message[2])
+                connection.send(("ack", worker.sequence))
+            elif kind == "changes":
+                for event in message[1]:
+                    worker.apply_change(event)
+                connection.send(("ack", worker.sequence))
+            elif kind == "read":
+                waiting.append(message[1:])
+            still_waiting = []
+            for read_id, fields, min_sequence in waiting:
+                if min_sequence is not None and min_sequence > worker.sequence:
+                    still_waiting.append((read_id, fields, min_sequence))
+                    continue
+                result = worker.handle([fields])[0]
+                result["sequence"] = worker.sequence
+                connection.send(("result", read_id, result))
+            waiting = still_waiting
+    finally:
+        connection.close()
+
+
+class Replica:
+    """
+    The primary's end of one follower: its process, the pipe to it and the
+    changes waiting to be shipped.
+
+    Attributes:
+        index (int): The index of the follower.
+        process (multiprocessing.Process): The follower process.
+        connection (multiprocessing.connection.Connection): The primary's end of the pipe.
+        pending (queue.SimpleQueue): The changes waiting to be shipped.
+        shipper (threading.Thread): The thread shipping changes in batches.
+        receiver (threading.Thread): The thread reading acknowledgements and results.
+        sequence (int): The last sequence number the follower acknowledged.
+        reads (dict[int, Future]): The reads waiting for a result, by ID.
+        reads_lock (threading.Lock): Guards reads and exited.
+        exited (bool): Whether the follower has exited, so no more results will come.
+        send_lock (threading.Lock): Keeps the shipper's and readers' messages from interleaving.
+        ready (threading.Event): Set once the follower has loaded its snapshot.
+    """
+
+    __slots__ = ("index", "process", "connection", "pending", "shipper", "receiver", "sequence", "reads",
+                 "reads_lock", "exited", "send_lock", "ready")
+
+    def __init__(self, index, process, connection):
+        self.index = index
+        self.process = process
+        self.connection = connection
+        self.pending = queue.SimpleQueue()
+        self.shipper = None
+        self.receiver = None
+        self.sequence = 0
+        self.reads = {}
+        self.reads_lock = threading.Lock()
+        self.exited = False
+        self.send_lock = threading.Lock()
+        self.ready = threading.Event()
+
+    def send(self, message):
+        with self.send_lock:
+            self.connection.send(message)
+
+
+class ReplicaSet:
+    """
+    Runs follower processes that keep read-only copies of this process's
+    accounts and recipes, fed from the change-event stream.
+
+    This process stays the primary: every write happens here as before and
+    is published on the change_events bus. When started, the replica set
+    subscribes to the bus first, then takes a snapshot of every account and
+    its recipes (loading collections kept in storage) and sends it to each
+    follower. Changes made while the snapshot is taken and sent wait in the
+    followers' queues rather than in the bus's bounded buffer, so however
+    many there are none is lost; changes already in the snapshot are
+    applied again harmlessly. Each change is queued for each follower and
+    shipped in order by a thread per follower, in batches of up to
+    max_batch, over a multiprocessing pipe. If starting fails part way, the
+    followers already started are terminated before the error is raised.
+
+    Reads are sent to the followers in turn. Followers acknowledge each
+    batch with the sequence number they have reached, so lag reports how
+    many changes each one is behind. A read may give min_sequence, such as
+    the value of change_events.sequence after the caller's own write, and
+    the follower then answers only once it has applied that change, which
+    gives read-your-writes consistency.
+
+    Attributes:
+        replica_count (int): The number of follower processes.
+        bus (EventBus): The stream the changes are read from.
+        accounts (AccountRegistry): The accounts the snapshot is taken of.
+        max_batch (int): The most changes to ship in one message.
+        replicas (list[Replica]): The followers, once started.
+    """
+
+    def __init__(self, replica_count, bus=change_events, accounts=all_accounts, max_batch=DEFAULT_MAX_BATCH):
+        """
+        Initializes a new instance of ReplicaSet. The followers are started by start.
+
+        Args:
+            replica_count (int): The number of follower processes.
+            bus (EventBus, optional): The stream to read changes from. Defaults to change_events.
+            accounts (AccountRegistry, optional): The accounts to replicate. Defaults to all_accounts.
+            max_batch (int, optional): The most changes per message. Defaults to DEFAULT_MAX_BATCH.
+        """
+        if replica_count < 1:
+            raise ValueError("replica_count must be at least 1.")
+        self.replica_count = replica_count
+        self.bus = bus
+        self.accounts = accounts
+        self.max_batch = max_batch
+        self.replicas = []
+        self.subscription = None
+        self.read_ids = itertools.count(1)
+        self.next_replica = itertools.cycle(range(replica_count))
+
+    def start(self):
+        """
+        Starts the followers, sends them a snapshot and starts shipping changes,
+        returning once every follower has loaded the snapshot.
+        """
+        context = multiprocessing.get_context("spawn")
+        try:
+            for index in range(self.replica_count):
+                connection, follower_connection = context.Pipe()
+                process = context.Process(target=serve_replica, args=(follower_connection,), daemon=True,
+                                          name=f"replica-{index}")
+                process.start()
+                follower_connection.close()
+                self.replicas.append(Replica(index, process, connection))
+            sequence = self.bus.sequence
+            self.subscription = self.bus.subscribe(self.queue_change, after=sequence)
+            snapshot = self.snapshot()
+            for replica in self.replicas:
+                replica.send(("snapshot", sequence, snapshot))
+                replica.shipper = threading.Thread(target=self.ship_changes, args=(replica,), daemon=True,
+                                                   name=f"replica-{replica.index}-shipper")
+                replica.receiver = threading.Thread(target=self.receive, args=(replica,), daemon=True,
+                                                    name=f"replica-{replica.index}-receiver")
+                replica.shipper.start()
+                replica.receiver.start()
+        except BaseException:
+            self.terminate()
+            raise
+        for replica in self.replicas:
+            replica.ready.wait()
+        return self
+
+    def close(self):
+        """
+        Stops the followers once every change already queued has been shipped.
+        """
+        if self.subscription is not None:
+            self.subscription.close()
+            self.subscription = None
+        for replica in self.replicas:
+            replica.pending.put(None)
+        for replica in self.replicas:
+            replica.shipper.join()
+            replica.process.join()
+            replica.receiver.join()
+        self.replicas = []
+
+    def terminate(self):
+        """
+        Stops the followers at once, dropping any changes not yet shipped.
+        """
+        if self.subscription is not None:
+            self.subscription.close()
+            self.subscription = None
+        for replica in self.replicas:
+            replica.process.terminate()
+            replica.pending.put(None)
+        for replica in self.replicas:
+            replica.process.join()
+            for thread in (replica.shipper, replica.receiver):
+                if thread is not None:
+                    thread.join()
+            replica.connection.close()
+        self.replicas = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def snapshot(self):
+        """
+        Returns every account and its recipes, in the form ReplicaWorker.load_snapshot takes.
+        """
+        snapshot = []
+        for account in self.accounts:
+            recipe_manager = account.recipe_manager
+            with recipe_manager.lock:
+                recipes = [(recipe.recipe_id, recipe.title, recipe.ingredients, recipe.instructions, recipe.version)
+                           for recipe in recipe_manager.iter_recipes()]
+                next_recipe_id = recipe_manager.next_recipe_id
+            snapshot.append((account.email, account.is_admin, next_recipe_id, recipes))
+        return snapshot
+
+    def queue_change(self, event):
+        """
+        Queues a change for every follower; called by the bus as each change is made.
+        """
+        for replica in self.replicas:
+            replica.pending.put(event)
+
+    def ship_changes(self, replica):
+        """
+        Ships a follower's queued changes in batches until the replica set is closed.
+        """
+        closing = False
+        while not closing:
+            event = replica.pending.get()
+            if event is None:
+                break
+            batch = [event]
+            while len(batch) < self.max_batch:
+                try:
+                    event = replica.pending.get_nowait()
+                except queue.Empty:
+                    break
+                if event is None:
+                    closing = True
+                    break
+                batch.append(event)
+            try:
+                replica.send(("changes", batch))
+            except OSError:
+                break
+        try:
+            replica.send(None)
+        except OSError:
+            pass
+
+    def receive(self, replica):
+        """
+        Reads a follower's acknowledgements and read results until it exits.
+        """
+        while True:
+            try:
+                message = replica.connection.recv()
+            except (EOFError, OSError):
+                break
+            if message[0] == "ack":
+                replica.sequence = message[1]
+                replica.ready.set()
+            else:
+                _, read_id, result = message
+                replica.sequence = max(replica.sequence, result["sequence"])
+                with replica.reads_lock:
+                    future = replica.reads.pop(read_id)
+                future.set_result(result)
+        replica.ready.set()
+        with replica.reads_lock:
+            replica.exited = True
+            futures = list(replica.reads.values())
+            replica.reads.clear()
+        for future in futures:
+            future.set_exception(ShardError(f"Replica {replica.index} exited."))
+        replica.connection.close()
+
+    def read(self, fields, as_email=None, min_sequence=None):
+        """
+        Sends a read to the next follower.
+
+        Args:
+            fields (dict): The read operation, such as {"op": "list", "limit": 20}.
+            as_email (str, optional): The email of the user the read is for.
+            min_sequence (int, optional): Answer only once the follower has applied the
+             change with this sequence number. Defaults to answering at once.
+
+        Returns:
+            Future: Completes with the result, which includes the follower's sequence
+             number when it answered under "sequence".
+        """
+        replica = self.replicas[next(self.next_replica)]
+        read_id = next(self.read_ids)
+        future = Future()
+        with replica.reads_lock:
+            if replica.exited:
+                future.set_exception(ShardError(f"Replica {replica.index} exited."))
+                return future
+            replica.reads[read_id] = future
+        replica.send(("read", read_id, dict(fields, **{"as": as_email}), min_sequence))
+        return future
+
+    def request(self, fields, as_email=None, min_sequence=None, timeout=None):
+        """
+        Runs a read on the next follower and waits for the result.
+
+        Returns:
+            dict: The result, with "ok" set to whether the read succeeded.
+        """
+        return self.read(fields, as_email, min_sequence).result(timeout)
+
+    def lag(self):
+        """
+        Returns how many changes each follower is behind the primary, by its last acknowledgement.
+        """
+        sequence = self.bus.sequence
+        return [sequence - replica.sequence for replica in self.replicas]
+
+    def stats(self):
+        """
+        Returns the primary's sequence number and each follower's sequence number and lag.
+        """
+        sequence = self.bus.sequence
+        return {"sequence": sequence, "replicas": [{"sequence": replica.sequence, "lag": sequence - replica.sequence}
+                                                   for replica in self.replicas]}
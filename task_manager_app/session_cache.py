@@ -0,0 +1,175 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = 30 * 60
+DEFAULT_MAX_SESSIONS = 100_000
+
+
+class SessionCache:
+    """
+    Maps opaque session tokens to logged-in users, so a front end checks a
+    password once at login and afterwards only looks the token up.
+
+    Sessions are kept in an ordered dictionary in least-recently-used order.
+    Every successful lookup moves the session to the end and pushes its
+    expiry ttl seconds into the future, so the order of the dictionary is
+    also the order in which sessions expire: expired sessions are always at
+    the front and are dropped from there, and when the cache is full the
+    least recently used session is evicted. Issuing, looking up and
+    invalidating a session all cost O(1). The tokens of each user are also
+    indexed by email, so all of a user's sessions can be ended at once when
+    the account is deleted.
+
+    Attributes:
+        ttl (float): Seconds a session stays valid after it was last used.
+        max_sessions (int): The most sessions to keep.
+        sessions (OrderedDict[str, tuple[User, float]]): Each token's user and
+         expiry time, least recently used first.
+        tokens_by_email (dict[str, set[str]]): The tokens of each user, keyed by
+         lower-cased email.
+        hits (int): How many lookups found a valid session.
+        misses (int): How many lookups found no session.
+        expirations (int): How many sessions expired.
+        evictions (int): How many sessions were evicted to stay within max_sessions.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_sessions=DEFAULT_MAX_SESSIONS, clock=time.monotonic):
+        """
+        Initializes a new, empty instance of SessionCache.
+
+        Args:
+            ttl (float, optional): Seconds a session stays valid after it was last used.
+             Defaults to DEFAULT_TTL.
+            max_sessions (int, optional): The most sessions to keep. Defaults to DEFAULT_MAX_SESSIONS.
+            clock (callable, optional): Returns the current time in seconds. Defaults to time.monotonic.
+        """
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self.sessions = OrderedDict()
+        self.tokens_by_email = {}
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def create(self, user):
+        """
+        Starts a session for a user who has just logged in.
+
+        Args:
+            user (User): The authenticated user.
+
+        Returns:
+            str: The session's token.
+        """
+        token = secrets.token_urlsafe(32)
+        with self.lock:
+            self.sessions[token] = (user, self.clock() + self.ttl)
+            self.tokens_by_email.setdefault(user.email.lower(), set()).add(token)
+            while len(self.sessions) > self.max_sessions:
+                self.drop(*self.sessions.popitem(last=False))
+                self.evictions += 1
+        return token
+
+    def get(self, token):
+        """
+        Looks up the user a token belongs to, extending the session if it is valid.
+
+        Args:
+            token (str): The session token.
+
+        Returns:
+            User: The session's user, or None if the token is unknown or expired.
+        """
+        now = self.clock()
+        with self.lock:
+            self.expire(now)
+            session = self.sessions.get(token)
+            if session is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.sessions[token] = (session[0], now + self.ttl)
+            self.sessions.move_to_end(token)
+            return session[0]
+
+    def invalidate(self, token):
+        """
+        Ends a session, for example on logout.
+
+        Args:
+            token (str): The session token.
+
+        Returns:
+            bool: True if the session existed, False otherwise.
+        """
+        with self.lock:
+            session = self.sessions.pop(token, None)
+            if session is None:
+                return False
+            self.drop(token, session)
+            return True
+
+    def invalidate_user(self, email):
+        """
+        Ends every session of a user, for example when the account is deleted.
+
+        Args:
+            email (str): The user's email address.
+
+        Returns:
+            int: How many sessions were ended.
+        """
+        with self.lock:
+            tokens = self.tokens_by_email.pop(email.lower(), set())
+            for token in tokens:
+                del self.sessions[token]
+            return len(tokens)
+
+    def expire(self, now):
+        """
+        Drops the sessions that expired before now. The caller must hold the lock.
+        """
+        while self.sessions:
+            token, session = next(iter(self.sessions.items()))
+            if session[1] > now:
+                break
+            del self.sessions[token]
+            self.drop(token, session)
+            self.expirations += 1
+
+    def drop(self, token, session):
+        """
+        Removes a token that has left the sessions from its user's index. The caller must hold the lock.
+        """
+        email = session[0].email.lower()
+        tokens = self.tokens_by_email.get(email)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self.tokens_by_email[email]
+
+    def clear(self):
+        with self.lock:
+            self.sessions.clear()
+            self.tokens_by_email.clear()
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def stats(self):
+        """
+        Returns the session cache's counters.
+
+        Returns:
+            dict[str, int]: The hits, misses, expirations, evictions and active sessions.
+        """
+        return {"hits": self.hits, "misses": self.misses, "expirations": self.expirations,
+                "evictions": self.evictions, "active": len(self.sessions)}
+
+
+session_cache = SessionCache()
@@ -0,0 +1,442 @@
+import heapq
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from operator import itemgetter
+
+from account_registry import AccountRegistry
+from batch_runner import BatchError, BatchRunner
+from concurrency import shard_index
+from globals import all_accounts
+from password_hashing import password_hasher
+from storage.sqlite_data_access import SQLiteDataAccess
+from user import User, admin_user
+
+DEFAULT_MAX_BATCH = 128
+RECIPE_FIELDS = ("recipe_id", "title", "ingredients", "instructions")
+
+
+class ShardError(Exception):
+    """
+    A shard worker process that could not be reached.
+    """
+
+
+class ShardWorker(BatchRunner):
+    """
+    Carries out the operations routed to one shard, inside its worker process.
+
+    A worker owns the accounts whose email hashes to its shard, and their
+    recipe collections. It accepts the batch operations login, create_account,
+    create, update and delete, and the shard operations account, list, users,
+    count_users and remove_account. The router is trusted: instead of logging
+    in first, each operation names the user it acts for under "as", and
+    permission checks that span shards, such as whether an administrator may
+    delete a user, are made by the router.
+    """
+
+    def __init__(self, accounts):
+        """
+        Initializes a new instance of ShardWorker.
+
+        Args:
+            accounts (AccountRegistry): The accounts of the shard.
+        """
+        super().__init__(accounts)
+        del self.handlers["logout"], self.handlers["delete_user"]
+        self.handlers.update({
+            "account": self.account,
+            "list": self.list_recipes,
+            "users": self.users,
+            "count_users": self.count_users,
+            "remove_account": self.remove_account,
+        })
+
+    def handle(self, requests):
+        """
+        Runs a batch of operations in order.
+
+        Args:
+            requests (list[dict]): The operations, each with the email of the user it acts for under "as".
+
+        Returns:
+            list[dict]: The result of each operation.
+        """
+        results = []
+        for fields in requests:
+            email = fields.get("as")
+            self.user = self.accounts.get(email) if email else None
+            results.append(self.apply(fields))
+        self.user = None
+        return results
+
+    def account(self, fields):
+        user = self.current_user()
+        return {"email": user.email, "is_admin": user.is_admin}
+
+    def list_recipes(self, fields):
+        recipe_manager = self.current_user().recipe_manager
+        recipes = [dict(zip(RECIPE_FIELDS, values)) for values in recipe_manager.iter_recipes(
+            0, self.integer_field(fields, "after", False), self.integer_field(fields, "limit", False) or 20,
+            RECIPE_FIELDS)]
+        return {"recipes": recipes, "total": len(recipe_manager)}
+
+    def users(self, fields):
+        accounts = self.accounts.page(fields.get("after"), self.integer_field(fields, "limit"),
+                                      fields.get("prefix", ""), fields.get("domain"), fields.get("exclude"))
+        return {"users": [(self.accounts.normalise_email(account.email), account.email, account.is_admin)
+                          for account in accounts]}
+
+    def count_users(self, fields):
+        return {"count": self.accounts.count(fields.get("prefix", ""), fields.get("domain")),
+                "admins": self.accounts.admin_count}
+
+    def remove_account(self, fields):
+        email = self.text_field(fields, "email", True)
+        if self.accounts.remove_email(email) is None:
+            raise BatchError(f"User {email} not found.")
+        return {"email": email}
+
+
+def serve_shard(connection, shard, shard_count, directory=None, hash_cost=None):
+    """
+    Runs a shard worker until the router closes the connection. It is the
+    target of each worker process.
+
+    Args:
+        connection (multiprocessing.connection.Connection): The worker's end of its pipe to the router.
+        shard (int): The index of the shard.
+        shard_count (int): The number of shards.
+        directory (str, optional): A directory to keep the shard's SQLite database in,
+         as shard-<index>.db. Defaults to keeping the shard in memory only.
+        hash_cost (int, optional): The scrypt cost for new password hashes.
+    """
+    # Every process creates the built-in administrator; only its own shard keeps it.
+    if shard_index(AccountRegistry.normalise_email(admin_user.email), shard_count) != shard:
+        all_accounts.remove(admin_user)
+    password_hasher.configure(n=hash_cost)
+    if directory is not None:
+        all_accounts.attach_storage(SQLiteDataAccess(os.path.join(directory, f"shard-{shard}.db")),
+                                    User.from_record)
+    worker = ShardWorker(all_accounts)
+    try:
+        while True:
+            try:
+                requests = connection.recv()
+            except EOFError:
+                break
+            if requests is None:
+                break
+            connection.send(worker.handle(requests))
+    finally:
+        all_accounts.flush()
+        all_accounts.storage.close()
+        password_hasher.shutdown()
+        connection.close()
+
+
+class Shard:
+    """
+    The router's end of one shard: its worker process, the pipe to it and
+    the queue of requests waiting to be sent.
+
+    Attributes:
+        index (int): The index of the shard.
+        process (multiprocessing.Process): The worker process.
+        connection (multiprocessing.connection.Connection): The router's end of the pipe.
+        pending (queue.SimpleQueue): The requests waiting to be sent, with the futures of their results.
+        sender (threading.Thread): The thread sending the shard's requests in batches.
+        batches (int): How many batches have been sent.
+        requests (int): How many requests have been sent.
+    """
+
+    __slots__ = ("index", "process", "connection", "pending", "sender", "batches", "requests")
+
+    def __init__(self, index, process, connection):
+        self.index = index
+        self.process = process
+        self.connection = connection
+        self.pending = queue.SimpleQueue()
+        self.sender = None
+        self.batches = 0
+        self.requests = 0
+
+
+class ShardRouter:
+    """
+    Partitions users over worker processes by a hash of their email and
+    forwards their operations to the worker that owns them.
+
+    A single process holding every account and collection is bound by the
+    GIL and by one process's memory. The router instead starts shard_count
+    worker processes (see ShardWorker), each owning the accounts whose
+    normalised email hashes to it with concurrency.shard_index, and talks to
+    each over a multiprocessing pipe. Login, account creation and recipe
+    operations go to the owner's shard only.
+
+    Requests are batched: each shard has a queue and a sender thread that
+    takes every request waiting, up to max_batch, and sends them as one
+    message, so concurrent callers and request_many share round trips and
+    pickling overhead. Results come back in the same order and complete the
+    callers' futures.
+
+    Administrator operations that span shards are scattered to every shard
+    and gathered: view_all_users merges each shard's page of accounts in
+    email order, and count_users adds up the counts. If a shard fails, its
+    failure is returned instead, naming the shard. The router checks with
+    the administrator's own shard that they are an administrator first.
+
+    The router trusts its callers to have authenticated the user an
+    operation acts for, as a front end does with its sessions.
+
+    Attributes:
+        shard_count (int): The number of worker processes.
+        directory (str): Where each shard keeps its SQLite database, or None to keep shards in memory.
+        hash_cost (int): The scrypt cost for new password hashes in the workers, or None for the default.
+        max_batch (int): The most requests to send to a shard in one message.
+        shards (list[Shard]): The shards, once started.
+    """
+
+    def __init__(self, shard_count, directory=None, hash_cost=None, max_batch=DEFAULT_MAX_BATCH):
+        """
+        Initializes a new instance of ShardRouter. The workers are started by start.
+
+        Args:
+            shard_count (int): The number of worker processes.
+            directory (str, optional): Where each shard keeps its SQLite database. Defaults to memory only.
+            hash_cost (int, optional): The scrypt cost for new password hashes. Defaults to the hasher's.
+            max_batch (int, optional): The most requests per message. Defaults to DEFAULT_MAX_BATCH.
+        """
+        if shard_count < 1:
+            raise ValueError("shard_count must be at least 1.")
+        self.shard_count = shard_count
+        self.directory = directory
+        self.hash_cost = hash_cost
+        self.max_batch = max_batch
+        self.shards = []
+
+    def start(self):
+        """
+        Starts the worker processes and their sender threads.
+        """
+        context = multiprocessing.get_context("spawn")
+        for index in range(self.shard_count):
+            connection, worker_connection = context.Pipe()
+            process = context.Process(target=serve_shard, name=f"shard-{index}", daemon=True,
+                                      args=(worker_connection, index, self.shard_count, self.directory,
+                                            self.hash_cost))
+            process.start()
+            worker_connection.close()
+            shard = Shard(index, process, connection)
+            shard.sender = threading.Thread(target=self.send_batches, args=(shard,), daemon=True,
+                                            name=f"shard-{index}-sender")
+            shard.sender.start()
+            self.shards.append(shard)
+        return self
+
+    def close(self):
+        """
+        Stops the workers once every request already submitted has been answered.
+        """
+        for shard in self.shards:
+            shard.pending.put(None)
+        for shard in self.shards:
+            shard.sender.join()
+            shard.process.join()
+        self.shards = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def send_batches(self, shard):
+        """
+        Sends a shard's queued requests in batches until the router is closed.
+        """
+        closing = False
+        while not closing:
+            item = shard.pending.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    item = shard.pending.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            try:
+                shard.connection.send([fields for fields, _ in batch])
+                results = shard.connection.recv()
+            except (EOFError, OSError) as error:
+                for _, future in batch:
+                    future.set_exception(ShardError(f"Shard {shard.index} is not responding: {error}"))
+                continue
+            shard.batches += 1
+            shard.requests += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        try:
+            shard.connection.send(None)
+        except OSError:
+            pass
+        shard.connection.close()
+
+    def shard_of(self, email):
+        """
+        Returns the shard that owns an email address.
+        """
+        return self.shards[shard_index(AccountRegistry.normalise_email(email), self.shard_count)]
+
+    def submit(self, fields, as_email=None):
+        """
+        Queues an operation for the shard that owns its user.
+
+        Args:
+            fields (dict): The operation, as in a batch script, such as {"op": "create", "title": ...}.
+             login and create_account are routed by their "email".
+            as_email (str, optional): The email of the user the operation acts for.
+
+        Returns:
+            Future: Completes with the operation's result.
+        """
+        email = as_email or fields.get("email")
+        if not isinstance(email, str):
+            raise ValueError("The operation needs a user to act for or an email.")
+        future = Future()
+        self.shard_of(email).pending.put((dict(fields, **{"as": as_email}), future))
+        return future
+
+    def request(self, fields, as_email=None):
+        """
+        Runs an operation on the shard that owns its user and waits for the result.
+
+        Returns:
+            dict: The result, with "ok" set to whether the operation succeeded.
+        """
+        return self.submit(fields, as_email).result()
+
+    def request_many(self, operations):
+        """
+        Runs many operations, batching those for the same shard, and waits for every result.
+
+        Args:
+            operations (Iterable[tuple[dict, str]]): Each operation and the email of the
+             user it acts for, or None.
+
+        Returns:
+            list[dict]: The results, in the order of the operations.
+        """
+        futures = [self.submit(fields, as_email) for fields, as_email in operations]
+        return [future.result() for future in futures]
+
+    def scatter(self, fields):
+        """
+        Runs an operation on every shard and waits for every result.
+
+        Returns:
+            list[dict]: The result from each shard, in shard order.
+        """
+        futures = []
+        for shard in self.shards:
+            future = Future()
+            shard.pending.put((dict(fields, **{"as": None}), future))
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    @staticmethod
+    def first_failure(results):
+        """
+        Returns the first failed result of a scatter, naming the shard that sent it
+        under "shard", or None if every shard succeeded.
+
+        Args:
+            results (list[dict]): The result from each shard, in shard order.
+        """
+        for index, result in enumerate(results):
+            if not result["ok"]:
+                return dict(result, shard=index, error=f"Shard {index}: {result['error']}")
+        return None
+
+    def check_admin(self, admin_email, operation):
+        result = self.request({"op": "account"}, admin_email)
+        if not result["ok"] or not result["is_admin"]:
+            return {"op": operation, "ok": False, "error": "You do not have permission to manage users."}
+        return None
+
+    def view_all_users(self, admin_email, after=None, limit=20, prefix="", domain=None):
+        """
+        Returns one page of every shard's accounts in email order, leaving out the administrator's own.
+
+        Args:
+            admin_email (str): The email of the administrator asking.
+            after (str, optional): Start after the account with this email. Defaults to the start.
+            limit (int, optional): The most accounts to return. Defaults to 20.
+            prefix (str, optional): Only return accounts whose email starts with this.
+            domain (str, optional): Only return accounts of this email domain.
+
+        Returns:
+            dict: The result, with the page under "users" as a list of {"email", "is_admin"} dictionaries.
+        """
+        denied = self.check_admin(admin_email, "users")
+        if denied:
+            return denied
+        pages = self.scatter({"op": "users", "after": after, "limit": limit, "prefix": prefix,
+                              "domain": domain, "exclude": admin_email})
+        failed = self.first_failure(pages)
+        if failed:
+            return failed
+        merged = heapq.merge(*(page["users"] for page in pages), key=itemgetter(0))
+        return {"op": "users", "ok": True, "users": [{"email": email, "is_admin": is_admin}
+                                                     for _, email, is_admin in itertools.islice(merged, limit)]}
+
+    def count_users(self, admin_email, prefix="", domain=None):
+        """
+        Counts the accounts of every shard.
+
+        Returns:
+            dict: The result, with the matching accounts under "count" and the administrators
+             under "admins", or the first shard's failure with its index under "shard".
+        """
+        denied = self.check_admin(admin_email, "count_users")
+        if denied:
+            return denied
+        counts = self.scatter({"op": "count_users", "prefix": prefix, "domain": domain})
+        failed = self.first_failure(counts)
+        if failed:
+            return failed
+        return {"op": "count_users", "ok": True, "count": sum(count["count"] for count in counts),
+                "admins": sum(count["admins"] for count in counts)}
+
+    def delete_user(self, admin_email, email):
+        """
+        Deletes an account and its recipes from the shard that owns it, if the caller is an administrator.
+
+        Returns:
+            dict: The result, with "ok" set to whether the account was deleted.
+        """
+        denied = self.check_admin(admin_email, "remove_account")
+        if denied:
+            return denied
+        return self.request({"op": "remove_account", "email": email})
+
+    def stats(self):
+        """
+        Returns how many requests and batches each shard has been sent.
+
+        Returns:
+            dict[str, object]: The shard count, the totals and the mean batch size.
+        """
+        requests = sum(shard.requests for shard in self.shards)
+        batches = sum(shard.batches for shard in self.shards)
+        return {"shards": self.shard_count, "requests": requests, "batches": batches,
+                "mean_batch": round(requests / batches, 2) if batches else 0.0,
+                "requests_per_shard": [shard.requests for shard in self.shards]}
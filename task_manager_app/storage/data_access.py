@@ -0,0 +1,213 @@
+from abc import ABC, abstractmethod
+
+
+class RecipeExists(ValueError):
+    """
+    Raised by every backend when a recipe is inserted under an ID its owner already has.
+    """
+
+
+class DataAccess(ABC):
+    """
+    Defines the operations a storage backend must provide so that the
+    AccountRegistry and each user's RecipeManager can persist their data.
+
+    The registry and the recipe managers stay the in-memory source of truth
+    while the program runs; they write every change through to the backend
+    and read from it only when an account or a collection is first loaded.
+    Backends are free to buffer writes until flush() is called.
+
+    Every load and write operation is abstract, so a backend that leaves one
+    out fails as soon as it is instantiated rather than on first use.
+
+    Attributes:
+        persistent (bool): Whether data written to the backend outlives the process.
+    """
+
+    persistent = True
+
+    @abstractmethod
+    def load_accounts(self):
+        """
+        Loads every stored account.
+
+        Returns:
+            list[tuple[str, str, bool]]: The email, password hash and admin flag of each account.
+        """
+
+    @abstractmethod
+    def load_account(self, email):
+        """
+        Loads a single stored account.
+
+        Args:
+            email (str): The account's email address, in any case.
+
+        Returns:
+            tuple[str, str, bool]: The email, password hash and admin flag, or None if there is no such account.
+        """
+
+    @abstractmethod
+    def save_account(self, email, password_hash, is_admin):
+        """
+        Inserts or replaces an account.
+
+        Args:
+            email (str): The account's email address.
+            password_hash (str): The hashed password.
+            is_admin (bool): Whether the account has administrative privileges.
+        """
+
+    @abstractmethod
+    def delete_account(self, email):
+        """
+        Deletes an account together with all of its recipes.
+
+        Args:
+            email (str): The account's email address.
+        """
+
+    @abstractmethod
+    def load_recipes(self, user_email):
+        """
+        Loads a user's recipes.
+
+        Args:
+            user_email (str): The email address of the recipes' owner.
+
+        Returns:
+            list[FavouriteRecipes]: The recipes in ascending ID order.
+        """
+
+    @abstractmethod
+    def iter_recipes(self, user_email, batch=1000):
+        """
+        Streams a user's recipes as plain rows, reading batch of them from the
+        backend at a time, so the collection is never held in memory whole.
+        Recipes written while the rows are being read may or may not be included.
+
+        Args:
+            user_email (str): The email address of the recipes' owner.
+            batch (int, optional): How many recipes to read at a time. Defaults to 1000.
+
+        Yields:
+            tuple[int, str, str, str]: The ID, title, ingredients and instructions
+             of each recipe, in ascending ID order.
+        """
+
+    @abstractmethod
+    def load_next_recipe_id(self, user_email):
+        """
+        Loads the next recipe ID to allocate for a user.
+
+        Args:
+            user_email (str): The email address of the recipes' owner.
+
+        Returns:
+            int: The next recipe ID, 1 if the user has never created a recipe.
+        """
+
+    @abstractmethod
+    def insert_recipe(self, recipe):
+        """
+        Stores a newly created recipe and advances its owner's ID counter past it.
+        A recipe whose ID its owner already has is refused, never overwritten,
+        and the refusal is raised to this call even if the write is buffered.
+
+        Args:
+            recipe (FavouriteRecipes): The new recipe.
+
+        Raises:
+            RecipeExists: If the owner already has a recipe with this ID.
+        """
+
+    def insert_recipes(self, recipes):
+        """
+        Stores a batch of newly created recipes. Backends may override this
+        with something faster than inserting the recipes one by one.
+
+        Args:
+            recipes (list[FavouriteRecipes]): The new recipes.
+
+        Raises:
+            RecipeExists: If an owner already has one of the IDs. Backends that
+             override this refuse the whole batch; this version stops at that recipe.
+        """
+        for recipe in recipes:
+            self.insert_recipe(recipe)
+
+    @abstractmethod
+    def update_recipe(self, recipe):
+        """
+        Stores the current title, ingredients and instructions of a recipe.
+
+        Args:
+            recipe (FavouriteRecipes): The updated recipe.
+        """
+
+    @abstractmethod
+    def delete_recipe(self, user_email, recipe_id):
+        """
+        Deletes a recipe.
+
+        Args:
+            user_email (str): The email address of the recipe's owner.
+            recipe_id (int): The ID of the recipe.
+        """
+
+    def flush(self):
+        """
+        Makes every buffered write durable.
+        """
+
+    def close(self):
+        """
+        Flushes buffered writes and releases the backend's resources.
+        """
+        self.flush()
+
+
+class InMemoryDataAccess(DataAccess):
+    """
+    The default backend, which keeps nothing beyond what the AccountRegistry and
+    the RecipeManagers already hold in memory. Every write is a no-op and
+    every load comes back empty, so data lasts only as long as the process.
+    """
+
+    persistent = False
+
+    def load_accounts(self):
+        return []
+
+    def load_account(self, email):
+        return None
+
+    def save_account(self, email, password_hash, is_admin):
+        pass
+
+    def delete_account(self, email):
+        pass
+
+    def load_recipes(self, user_email):
+        return []
+
+    def iter_recipes(self, user_email, batch=1000):
+        return iter(())
+
+    def load_next_recipe_id(self, user_email):
+        return 1
+
+    def insert_recipe(self, recipe):
+        pass
+
+    def insert_recipes(self, recipes):
+        pass
+
+    def update_recipe(self, recipe):
+        pass
+
+    def delete_recipe(self, user_email, recipe_id):
+        pass
+
+
+in_memory_data_access = InMemoryDataAccess()
@@ -0,0 +1,496 @@
+import os
+import struct
+import threading
+import zlib
+
+from favourite_recipes import FavouriteRecipes
+from storage.data_access import DataAccess, RecipeExists
+
+RECORD_HEADER = struct.Struct(">II")  # payload length, CRC-32 of the payload
+STRING_LENGTH = struct.Struct(">I")
+INTEGER = struct.Struct(">q")
+NO_STRING = 0xFFFFFFFF
+READ_CHUNK_SIZE = 1 << 20
+
+SAVE_ACCOUNT = 1
+DELETE_ACCOUNT = 2
+INSERT_RECIPE = 3
+UPDATE_RECIPE = 4
+DELETE_RECIPE = 5
+ACCOUNT_STATE = 6
+
+# The type of each field of each operation: "s" for a string (or None), "i" for an integer.
+FIELD_TYPES = {
+    SAVE_ACCOUNT: "ssi",      # email, password hash, is admin
+    DELETE_ACCOUNT: "s",      # email
+    INSERT_RECIPE: "sisss",   # user email, recipe ID, title, ingredients, instructions
+    UPDATE_RECIPE: "sisss",   # user email, recipe ID, title, ingredients, instructions
+    DELETE_RECIPE: "si",      # user email, recipe ID
+    ACCOUNT_STATE: "ssii",    # email, password hash, is admin, next recipe ID (snapshots only)
+}
+
+SNAPSHOT_FILE = "snapshot.bin"
+SNAPSHOT_MAGIC = b"RECIPES1"
+SNAPSHOT_HEADER = struct.Struct(">8sQ")  # magic, first journal generation to replay on top
+# A record's location is one integer: the file it is in, 0 for the snapshot
+# and generation + 1 for a journal, above the record's offset in that file.
+OFFSET_BITS = 40
+OFFSET_MASK = (1 << OFFSET_BITS) - 1
+SNAPSHOT_FILE_NUMBER = 0
+
+
+def encode_record(operation, *values):
+    """
+    Encodes an operation as a length-prefixed, checksummed journal record.
+
+    Args:
+        operation (int): The operation code.
+        *values: The operation's fields, matching FIELD_TYPES.
+
+    Returns:
+        bytes: The encoded record.
+    """
+    parts = [bytes((operation,))]
+    for field_type, value in zip(FIELD_TYPES[operation], values):
+        if field_type == "i":
+            parts.append(INTEGER.pack(value))
+        elif value is None:
+            parts.append(STRING_LENGTH.pack(NO_STRING))
+        else:
+            encoded = value.encode('utf-8')
+            parts.append(STRING_LENGTH.pack(len(encoded)))
+            parts.append(encoded)
+    payload = b"".join(parts)
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def decode_payload(payload):
+    """
+    Decodes the payload of a journal record.
+
+    Args:
+        payload (bytes): The payload, without its length and checksum header.
+
+    Returns:
+        tuple[int, list]: The operation code and its fields.
+    """
+    operation = payload[0]
+    values = []
+    offset = 1
+    for field_type in FIELD_TYPES[operation]:
+        if field_type == "i":
+            values.append(INTEGER.unpack_from(payload, offset)[0])
+            offset += INTEGER.size
+        else:
+            length = STRING_LENGTH.unpack_from(payload, offset)[0]
+            offset += STRING_LENGTH.size
+            if length == NO_STRING:
+                values.append(None)
+            else:
+                values.append(payload[offset:offset + length].decode('utf-8'))
+                offset += length
+    return operation, values
+
+
+def read_records(file, start=0):
+    """
+    Reads journal records from a file, stopping at the first record that is
+    incomplete or fails its checksum, as happens when the program stops in
+    the middle of a write.
+
+    Args:
+        file (file): A binary file open for reading.
+        start (int, optional): The offset of the first record. Defaults to 0.
+
+    Yields:
+        tuple[int, list, int]: The operation code, its fields and the offset just past the record.
+    """
+    file.seek(start)
+    buffer = b""
+    position = 0
+    consumed = start
+    while True:
+        chunk = file.read(READ_CHUNK_SIZE)
+        if not chunk:
+            return
+        buffer = buffer[position:] + chunk
+        position = 0
+        while position + RECORD_HEADER.size <= len(buffer):
+            length, checksum = RECORD_HEADER.unpack_from(buffer, position)
+            end = position + RECORD_HEADER.size + length
+            if end > len(buffer):
+                break
+            payload = buffer[position + RECORD_HEADER.size:end]
+            if zlib.crc32(payload) != checksum:
+                return
+            consumed += end - position
+            position = end
+            operation, values = decode_payload(payload)
+            yield operation, values, consumed
+
+
+def sync_directory(directory):
+    """
+    Flushes a directory's entries to disk so renames and new files survive a crash.
+    """
+    descriptor = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+class JournalDataAccess(DataAccess):
+    """
+    Stores accounts and recipes as an append-only journal of operations,
+    compacted from time to time into a snapshot of the current state.
+
+    Every write is appended to the current journal file as a record made of
+    its length, a CRC-32 checksum and the encoded operation. Records are
+    fsynced in batches of sync_every, or when flush() or close() is called.
+    After snapshot_every records the whole state is written to a new
+    snapshot and a fresh journal file (the next "generation") is started,
+    so a restart loads the latest snapshot and replays only the records
+    written since. A torn record at the end of the journal is discarded on
+    start-up.
+
+    Only an index is kept in memory: where the latest record of each account
+    and each live recipe is, in the snapshot or a journal file, and each
+    account's next recipe ID. Loading a user's recipes reads their records
+    back from disk, and a snapshot is written by copying the records the
+    index points to, so titles, ingredients and instructions are held only
+    by the recipe collections that are loaded.
+
+    Attributes:
+        directory (str): The directory holding the snapshot and journal files.
+        sync_every (int): How many records are written between fsyncs.
+        snapshot_every (int): How many records are written between snapshots.
+        generation (int): The number of the journal file being appended to.
+        accounts (dict[str, list[int]]): The location of each account's latest record
+         and its next recipe ID, keyed by lower-cased email.
+        recipes (dict[str, dict[int, int]]): The location of the latest record of each
+         of a user's recipes keyed by recipe ID, keyed by lower-cased email.
+    """
+
+    def __init__(self, directory, sync_every=64, snapshot_every=100_000):
+        """
+        Opens the journal in a directory, creating it if needed, and indexes
+        the latest snapshot and the journal records written after it.
+
+        Args:
+            directory (str): The directory holding the snapshot and journal files.
+            sync_every (int, optional): How many records to write between fsyncs. Defaults to 64.
+            snapshot_every (int, optional): How many records to write between snapshots. Defaults to 100000.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.sync_every = sync_every
+        self.snapshot_every = snapshot_every
+        self.accounts = {}
+        self.recipes = {}
+        self.readers = {}
+        self.unsynced = 0
+        self.since_snapshot = 0
+        self.lock = threading.Lock()
+        self.generation = self.load_snapshot()
+        self.replay_journals()
+        self.journal = open(self.journal_path(self.generation), "ab")
+        self.journal_size = self.journal.tell()
+
+    def journal_path(self, generation):
+        return os.path.join(self.directory, f"journal-{generation:08d}.log")
+
+    def journal_generations(self):
+        """
+        Lists the generations of the journal files in the directory.
+
+        Returns:
+            list[int]: The generations in ascending order.
+        """
+        generations = []
+        for name in os.listdir(self.directory):
+            if name.startswith("journal-") and name.endswith(".log"):
+                generations.append(int(name[len("journal-"):-len(".log")]))
+        return sorted(generations)
+
+    def file_path(self, file_number):
+        """
+        Returns the path of the snapshot (file number 0) or of a journal (its generation plus one).
+        """
+        if file_number == SNAPSHOT_FILE_NUMBER:
+            return os.path.join(self.directory, SNAPSHOT_FILE)
+        return self.journal_path(file_number - 1)
+
+    def read_at(self, location):
+        """
+        Reads back the record at a location in the index. The caller must hold
+        the lock and have flushed the journal's write buffer.
+
+        Args:
+            location (int): The record's file number and offset.
+
+        Returns:
+            list: The record's fields.
+        """
+        file_number = location >> OFFSET_BITS
+        reader = self.readers.get(file_number)
+        if reader is None:
+            reader = self.readers[file_number] = open(self.file_path(file_number), "rb")
+        reader.seek(location & OFFSET_MASK)
+        length, _ = RECORD_HEADER.unpack(reader.read(RECORD_HEADER.size))
+        return decode_payload(reader.read(length))[1]
+
+    def close_readers(self):
+        for reader in self.readers.values():
+            reader.close()
+        self.readers = {}
+
+    def load_snapshot(self):
+        """
+        Indexes the snapshot, if there is one.
+
+        Returns:
+            int: The first journal generation that still has to be replayed.
+        """
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return 0
+        with open(path, "rb") as file:
+            magic, generation = SNAPSHOT_HEADER.unpack(file.read(SNAPSHOT_HEADER.size))
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not a recipe snapshot.")
+            offset = SNAPSHOT_HEADER.size
+            for operation, values, end in read_records(file, offset):
+                self.apply(operation, values, SNAPSHOT_FILE_NUMBER << OFFSET_BITS | offset)
+                offset = end
+        return generation
+
+    def replay_journals(self):
+        """
+        Indexes every journal file from the current generation onwards and
+        cuts off any torn record at the end of the last one.
+        """
+        for generation in self.journal_generations():
+            if generation < self.generation:
+                continue
+            path = self.journal_path(generation)
+            valid_length = 0
+            with open(path, "rb") as file:
+                for operation, values, end in read_records(file):
+                    self.apply(operation, values, (generation + 1) << OFFSET_BITS | valid_length)
+                    valid_length = end
+                    self.since_snapshot += 1
+            if valid_length < os.path.getsize(path):
+                os.truncate(path, valid_length)
+            self.generation = generation
+
+    def apply(self, operation, values, location):
+        """
+        Applies an operation to the index.
+
+        Args:
+            operation (int): The operation code.
+            values (list): The operation's fields.
+            location (int): Where the operation's record is.
+        """
+        if operation == SAVE_ACCOUNT:
+            key = values[0].lower()
+            account = self.accounts.get(key)
+            self.accounts[key] = [location, account[1] if account else 1]
+        elif operation == ACCOUNT_STATE:
+            self.accounts[values[0].lower()] = [location, values[3]]
+        elif operation == DELETE_ACCOUNT:
+            self.accounts.pop(values[0].lower(), None)
+            self.recipes.pop(values[0].lower(), None)
+        elif operation in (INSERT_RECIPE, UPDATE_RECIPE):
+            user_email, recipe_id = values[0], values[1]
+            key = user_email.lower() if user_email is not None else None
+            user_recipes = self.recipes.setdefault(key, {})
+            if operation == UPDATE_RECIPE and recipe_id not in user_recipes:
+                return
+            user_recipes[recipe_id] = location
+            account = self.accounts.get(key)
+            if operation == INSERT_RECIPE and account is not None:
+                account[1] = max(account[1], recipe_id + 1)
+        elif operation == DELETE_RECIPE:
+            user_email, recipe_id = values
+            key = user_email.lower() if user_email is not None else None
+            self.recipes.get(key, {}).pop(recipe_id, None)
+
+    def has_recipe(self, user_email, recipe_id):
+        """
+        Returns whether a user has a recipe with the given ID. The caller must hold the lock.
+        """
+        key = user_email.lower() if user_email is not None else None
+        return recipe_id in self.recipes.get(key, ())
+
+    def append(self, operation, *values):
+        """
+        Appends an operation to the journal and indexes it, syncing and
+        snapshotting when the configured number of records is reached.
+
+        Args:
+            operation (int): The operation code.
+            *values: The operation's fields.
+
+        Raises:
+            RecipeExists: If a recipe is inserted under an ID its owner already has.
+        """
+        with self.lock:
+            if operation == INSERT_RECIPE and self.has_recipe(values[0], values[1]):
+                raise RecipeExists(f"Recipe {values[1]} of {values[0]} already exists.")
+            record = encode_record(operation, *values)
+            self.apply(operation, values, (self.generation + 1) << OFFSET_BITS | self.journal_size)
+            self.journal.write(record)
+            self.journal_size += len(record)
+            self.unsynced += 1
+            self.since_snapshot += 1
+            if self.unsynced >= self.sync_every:
+                self.sync()
+            if self.since_snapshot >= self.snapshot_every:
+                self.write_snapshot()
+
+    def sync(self):
+        """
+        Writes buffered records to the journal file and fsyncs it. The caller must hold the lock.
+        """
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        self.unsynced = 0
+
+    def write_snapshot(self):
+        """
+        Writes the current state to a new snapshot, copying each record the
+        index points to, and starts the next journal generation, deleting the
+        journal files the snapshot replaces. The caller must hold the lock.
+        """
+        self.sync()
+        next_generation = self.generation + 1
+        temporary_path = os.path.join(self.directory, SNAPSHOT_FILE + ".tmp")
+        accounts = {}
+        recipes = {}
+        with open(temporary_path, "wb") as file:
+            file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, next_generation))
+            for key, (location, next_recipe_id) in self.accounts.items():
+                email, password_hash, is_admin = self.read_at(location)[:3]
+                accounts[key] = [file.tell(), next_recipe_id]
+                file.write(encode_record(ACCOUNT_STATE, email, password_hash, int(is_admin), next_recipe_id))
+            for key, user_recipes in self.recipes.items():
+                copied = recipes[key] = {}
+                for recipe_id, location in user_recipes.items():
+                    copied[recipe_id] = file.tell()
+                    file.write(encode_record(INSERT_RECIPE, *self.read_at(location)))
+            file.flush()
+            os.fsync(file.fileno())
+        self.close_readers()
+        os.replace(temporary_path, os.path.join(self.directory, SNAPSHOT_FILE))
+        sync_directory(self.directory)
+        # Offsets in the new snapshot need no file number, as the snapshot's is 0.
+        self.accounts = accounts
+        self.recipes = recipes
+
+        self.journal.close()
+        for generation in self.journal_generations():
+            if generation < next_generation:
+                os.remove(self.journal_path(generation))
+        self.generation = next_generation
+        self.journal = open(self.journal_path(self.generation), "ab")
+        self.journal_size = 0
+        self.since_snapshot = 0
+
+    def snapshot(self):
+        """
+        Compacts the journal into a new snapshot straight away.
+        """
+        with self.lock:
+            self.write_snapshot()
+
+    def flush(self):
+        """
+        Syncs the journal. Once it is closed every record is already synced, so this does nothing.
+        """
+        with self.lock:
+            if not self.journal.closed:
+                self.sync()
+
+    def close(self):
+        with self.lock:
+            self.sync()
+            self.journal.close()
+            self.close_readers()
+
+    def load_accounts(self):
+        with self.lock:
+            self.journal.flush()
+            accounts = []
+            for location, _ in self.accounts.values():
+                email, password_hash, is_admin = self.read_at(location)[:3]
+                accounts.append((email, password_hash, bool(is_admin)))
+            return accounts
+
+    def load_account(self, email):
+        with self.lock:
+            account = self.accounts.get(email.lower())
+            if account is None:
+                return None
+            self.journal.flush()
+            email, password_hash, is_admin = self.read_at(account[0])[:3]
+            return email, password_hash, bool(is_admin)
+
+    def save_account(self, email, password_hash, is_admin):
+        self.append(SAVE_ACCOUNT, email, password_hash, int(is_admin))
+
+    def delete_account(self, email):
+        self.append(DELETE_ACCOUNT, email)
+
+    def load_recipes(self, user_email):
+        key = user_email.lower() if user_email is not None else None
+        with self.lock:
+            self.journal.flush()
+            user_recipes = self.recipes.get(key, {})
+            recipes = []
+            for recipe_id in sorted(user_recipes):
+                stored_email, _, title, ingredients, instructions = self.read_at(user_recipes[recipe_id])
+                recipes.append(FavouriteRecipes(recipe_id, title, ingredients, instructions, stored_email))
+            return recipes
+
+    def iter_recipes(self, user_email, batch=1000):
+        key = user_email.lower() if user_email is not None else None
+        with self.lock:
+            recipe_ids = sorted(self.recipes.get(key, ()))
+        for start in range(0, len(recipe_ids), batch):
+            with self.lock:
+                self.journal.flush()
+                user_recipes = self.recipes.get(key, {})
+                rows = []
+                for recipe_id in recipe_ids[start:start + batch]:
+                    location = user_recipes.get(recipe_id)
+                    if location is not None:
+                        _, _, title, ingredients, instructions = self.read_at(location)
+                        rows.append((recipe_id, title, ingredients, instructions))
+            yield from rows
+
+    def load_next_recipe_id(self, user_email):
+        with self.lock:
+            account = self.accounts.get(user_email.lower()) if user_email is not None else None
+            return account[1] if account else 1
+
+    def insert_recipe(self, recipe):
+        self.append(INSERT_RECIPE, recipe.user_email, recipe.recipe_id, recipe.title,
+                    recipe.ingredients, recipe.instructions)
+
+    def insert_recipes(self, recipes):
+        with self.lock:
+            taken = [recipe for recipe in recipes if self.has_recipe(recipe.user_email, recipe.recipe_id)]
+        if taken:
+            raise RecipeExists("; ".join(f"Recipe {recipe.recipe_id} of {recipe.user_email} already exists."
+                                         for recipe in taken))
+        for recipe in recipes:
+            self.insert_recipe(recipe)
+
+    def update_recipe(self, recipe):
+        self.append(UPDATE_RECIPE, recipe.user_email, recipe.recipe_id, recipe.title,
+                    recipe.ingredients, recipe.instructions)
+
+    def delete_recipe(self, user_email, recipe_id):
+        self.append(DELETE_RECIPE, user_email, recipe_id)
@@ -0,0 +1,226 @@
+import sqlite3
+import threading
+
+from favourite_recipes import FavouriteRecipes
+from storage.data_access import DataAccess, RecipeExists
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    email TEXT PRIMARY KEY COLLATE NOCASE,
+    password_hash TEXT NOT NULL,
+    is_admin INTEGER NOT NULL,
+    next_recipe_id INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS recipes (
+    user_email TEXT NOT NULL COLLATE NOCASE,
+    recipe_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    ingredients TEXT NOT NULL,
+    instructions TEXT NOT NULL,
+    PRIMARY KEY (user_email, recipe_id)
+) WITHOUT ROWID;
+"""
+
+SAVE_ACCOUNT = ("INSERT INTO accounts (email, password_hash, is_admin) VALUES (?, ?, ?) "
+                "ON CONFLICT (email) DO UPDATE SET password_hash = excluded.password_hash, "
+                "is_admin = excluded.is_admin")
+DELETE_ACCOUNT_RECIPES = "DELETE FROM recipes WHERE user_email = ?"
+DELETE_ACCOUNT = "DELETE FROM accounts WHERE email = ?"
+INSERT_RECIPE = ("INSERT INTO recipes (user_email, recipe_id, title, ingredients, instructions) "
+                 "VALUES (?, ?, ?, ?, ?)")
+ADVANCE_RECIPE_ID = "UPDATE accounts SET next_recipe_id = MAX(next_recipe_id, ?) WHERE email = ?"
+UPDATE_RECIPE = ("UPDATE recipes SET title = ?, ingredients = ?, instructions = ? "
+                 "WHERE user_email = ? AND recipe_id = ?")
+DELETE_RECIPE = "DELETE FROM recipes WHERE user_email = ? AND recipe_id = ?"
+SELECT_ACCOUNTS = "SELECT email, password_hash, is_admin FROM accounts ORDER BY rowid"
+SELECT_ACCOUNT = "SELECT email, password_hash, is_admin FROM accounts WHERE email = ?"
+SELECT_RECIPES = ("SELECT recipe_id, title, ingredients, instructions, user_email FROM recipes "
+                  "WHERE user_email = ? ORDER BY recipe_id")
+SELECT_RECIPE_PAGE = ("SELECT recipe_id, title, ingredients, instructions FROM recipes "
+                      "WHERE user_email = ? AND recipe_id > ? ORDER BY recipe_id LIMIT ?")
+SELECT_NEXT_RECIPE_ID = "SELECT next_recipe_id FROM accounts WHERE email = ?"
+SELECT_RECIPE_IDS = ("SELECT recipe_id FROM recipes WHERE user_email = ? AND recipe_id BETWEEN ? AND ?")
+
+
+class SQLiteDataAccess(DataAccess):
+    """
+    Stores accounts and recipes in a SQLite database.
+
+    The database runs in write-ahead-log mode so readers never wait for a
+    writer. Writes are not executed straight away: they are queued and
+    committed together in a single transaction once batch_size of them have
+    accumulated, when flush() or close() is called, or before any load, so
+    a burst of creates, updates and deletes costs one commit instead of one
+    each. Every statement is a fixed SQL string, which sqlite3 prepares once
+    and reuses from its statement cache.
+
+    Recipes are keyed by (user_email, recipe_id) and accounts by email, and
+    both keys are indexed. Since inserts are queued, an insert is checked
+    against the database and the queued inserts when it is made, so a
+    recipe whose ID its owner already has is refused to the caller that
+    inserted it rather than to whichever caller commits the batch.
+
+    If a batch fails to commit, it is rolled back and put back at the front
+    of the queue, and the error is raised; the writes are retried with the
+    next commit.
+
+    Attributes:
+        connection (sqlite3.Connection): The open database connection.
+        batch_size (int): How many writes are queued before they are committed.
+        pending (list[tuple[str, tuple]]): The queued statements and their parameters.
+        pending_inserts (set[tuple[str, int]]): The lower-cased owner and ID of each queued recipe insert.
+        pending_deletes (set[str]): The lower-cased owners with a queued recipe or account delete.
+    """
+
+    def __init__(self, path, batch_size=64):
+        """
+        Opens, and if necessary creates, the database.
+
+        Args:
+            path (str): The path of the database file.
+            batch_size (int, optional): How many writes to queue before committing. Defaults to 64.
+        """
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.batch_size = batch_size
+        self.pending = []
+        self.pending_inserts = set()
+        self.pending_deletes = set()
+        self.lock = threading.Lock()
+
+    def queue(self, *statements, deletes_from=None):
+        """
+        Queues one or more statements, committing the batch once it is full.
+
+        Args:
+            *statements (tuple[str, tuple]): The SQL and parameters of each statement.
+            deletes_from (str, optional): The owner whose recipes the statements delete, if any.
+        """
+        with self.lock:
+            if deletes_from is not None:
+                self.pending_deletes.add(deletes_from.lower())
+            self.pending.extend(statements)
+            if len(self.pending) >= self.batch_size:
+                self.commit_pending()
+
+    def commit_pending(self):
+        """
+        Executes every queued statement in one transaction. Runs of the same
+        statement are sent to executemany together. If the transaction fails,
+        the statements are queued again, ahead of any queued since, and the
+        error is raised. The caller must hold the lock.
+        """
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("BEGIN")
+            start = 0
+            while start < len(pending):
+                sql = pending[start][0]
+                end = start
+                while end < len(pending) and pending[end][0] == sql:
+                    end += 1
+                cursor.executemany(sql, [parameters for _, parameters in pending[start:end]])
+                start = end
+            cursor.execute("COMMIT")
+        except BaseException:
+            if self.connection.in_transaction:
+                cursor.execute("ROLLBACK")
+            self.pending = pending + self.pending
+            raise
+        self.pending_inserts.clear()
+        self.pending_deletes.clear()
+
+    def refuse_existing(self, recipes):
+        """
+        Raises RecipeExists if any of the recipes' IDs is already stored or queued
+        for its owner. The caller must hold the lock.
+        """
+        by_owner = {}
+        for recipe in recipes:
+            by_owner.setdefault(recipe.user_email.lower(), []).append(recipe.recipe_id)
+        if not by_owner.keys().isdisjoint(self.pending_deletes):
+            # A queued delete may free an ID the database still holds.
+            self.commit_pending()
+        taken = []
+        for owner, recipe_ids in by_owner.items():
+            taken.extend((owner, recipe_id) for recipe_id in recipe_ids if (owner, recipe_id) in self.pending_inserts)
+            taken.extend((owner, recipe_id) for recipe_id, in self.connection.execute(
+                SELECT_RECIPE_IDS, (owner, min(recipe_ids), max(recipe_ids))) if recipe_id in recipe_ids)
+        if taken:
+            raise RecipeExists("; ".join(f"Recipe {recipe_id} of {owner} already exists." for owner, recipe_id in taken))
+
+    def flush(self):
+        with self.lock:
+            self.commit_pending()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def query(self, sql, parameters=()):
+        """
+        Flushes queued writes and runs a query, so reads always see earlier writes.
+
+        Returns:
+            list[tuple]: The rows returned by the query.
+        """
+        with self.lock:
+            self.commit_pending()
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def load_accounts(self):
+        return [(email, password_hash, bool(is_admin))
+                for email, password_hash, is_admin in self.query(SELECT_ACCOUNTS)]
+
+    def load_account(self, email):
+        rows = self.query(SELECT_ACCOUNT, (email,))
+        return (rows[0][0], rows[0][1], bool(rows[0][2])) if rows else None
+
+    def save_account(self, email, password_hash, is_admin):
+        self.queue((SAVE_ACCOUNT, (email, password_hash, int(is_admin))))
+
+    def delete_account(self, email):
+        self.queue((DELETE_ACCOUNT_RECIPES, (email,)), (DELETE_ACCOUNT, (email,)), deletes_from=email)
+
+    def load_recipes(self, user_email):
+        return [FavouriteRecipes(*row) for row in self.query(SELECT_RECIPES, (user_email,))]
+
+    def iter_recipes(self, user_email, batch=1000):
+        after_id = 0
+        while True:
+            rows = self.query(SELECT_RECIPE_PAGE, (user_email, after_id, batch))
+            yield from rows
+            if len(rows) < batch:
+                return
+            after_id = rows[-1][0]
+
+    def load_next_recipe_id(self, user_email):
+        rows = self.query(SELECT_NEXT_RECIPE_ID, (user_email,))
+        return rows[0][0] if rows else 1
+
+    def insert_recipe(self, recipe):
+        self.insert_recipes([recipe])
+
+    def insert_recipes(self, recipes):
+        if not recipes:
+            return
+        with self.lock:
+            self.refuse_existing(recipes)
+            self.pending_inserts.update((recipe.user_email.lower(), recipe.recipe_id) for recipe in recipes)
+            self.pending.extend((INSERT_RECIPE, (recipe.user_email, recipe.recipe_id, recipe.title,
+                                                 recipe.ingredients, recipe.instructions)) for recipe in recipes)
+            self.pending.append((ADVANCE_RECIPE_ID, (recipes[-1].recipe_id + 1, recipes[-1].user_email)))
+            if len(self.pending) >= self.batch_size:
+                self.commit_pending()
+
+    def update_recipe(self, recipe):
+        self.queue((UPDATE_RECIPE, (recipe.title, recipe.ingredients, recipe.instructions,
+                                    recipe.user_email, recipe.recipe_id)))
+
+    def delete_recipe(self, user_email, recipe_id):
+        self.queue((DELETE_RECIPE, (user_email, recipe_id)), deletes_from=user_email)
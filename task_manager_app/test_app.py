@@ -1,12 +1,50 @@
+import asyncio
+import base64
+import gc
+import io
+import json
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import tracemalloc
 import unittest
+from unittest import mock
 
+from account_registry import AccountRegistry
+from blob_store import blob_store
+from batch_runner import BatchRunner
+from api_server import ApiServer, RecipeApi
+from concurrency import ReadWriteLock
+from change_events import (AccountCreated, AccountDeleted, EventBus, EventsLost, RecipeCreated,
+                           RecipeDeleted, RecipeEvent, RecipeUpdated, change_events)
+from console import Console
 from favourite_recipes import FavouriteRecipes
+from ingredient_table import ingredient_table
+from metrics import Metrics, metrics
+from password_hashing import PasswordHasher, password_hasher
 from recipe_manager import RecipeManager
+from recipe_history import RecipeHistory
+from recipe_manager_cache import RecipeManagerCache
+from recipe_table import RecipeTable
+from replication import ReplicaSet
+from recipe_transfer import export_recipes, import_recipes
+from session_cache import SessionCache
+from sharding import ShardRouter
+from storage.data_access import DataAccess, RecipeExists
+from storage.journal_data_access import JournalDataAccess
+from storage.sqlite_data_access import SQLiteDataAccess
+from text_compression import text_compressor
 from user import User
 from user_interface import UserInterface
+from user_interface_actions import UserInterfaceActions
 
 all_accounts = []
 
+# Keep key derivation cheap so that tests creating many accounts stay fast.
+password_hasher.configure(n=2 ** 4)
+
 
 class TestRecipeManager(unittest.TestCase):
     """
@@ -101,6 +139,824 @@ class TestRecipeManager(unittest.TestCase):
         self.assertEqual(self.recipe_manager.recipes[0].instructions,
                          "1. Turn on computer 2. Log in 3. Open Pycharm 4. Code ")
 
+    def test_recipe_ids_are_not_reused_after_delete(self):
+        """
+        Tests that deleting a recipe does not cause its ID, or any other, to be handed out again.
+        """
+        self.recipe_manager.perform_create_recipe("Recipe 1", "Ingredients", "Instructions")
+        self.recipe_manager.perform_create_recipe("Recipe 2", "Ingredients", "Instructions")
+        self.assertTrue(self.recipe_manager.perform_delete_recipe(1))
+        new_recipe = self.recipe_manager.perform_create_recipe("Recipe 3", "Ingredients", "Instructions")
+        self.assertEqual(new_recipe.recipe_id, 3)
+        self.assertEqual([recipe.recipe_id for recipe in self.recipe_manager], [2, 3])
+
+    def test_get_recipe_by_id(self):
+        """
+        Tests that get returns the recipe with the given ID, or None when it does not exist.
+        """
+        recipe = self.recipe_manager.perform_create_recipe("Recipe 1", "Ingredients", "Instructions")
+        self.assertIs(self.recipe_manager.get(1), recipe)
+        self.assertIsNone(self.recipe_manager.get(2))
+
+    def test_mutators_report_success(self):
+        """
+        Tests that update and delete return whether the recipe existed.
+        """
+        self.recipe_manager.perform_create_recipe("Recipe 1", "Ingredients", "Instructions")
+        self.assertTrue(self.recipe_manager.perform_update_recipe(1, "New Title", None, None))
+        self.assertFalse(self.recipe_manager.perform_update_recipe(2, "New Title", None, None))
+        self.assertTrue(self.recipe_manager.perform_delete_recipe(1))
+        self.assertFalse(self.recipe_manager.perform_delete_recipe(1))
+
+
+class TestRecipeListing(unittest.TestCase):
+    """
+    A test suite for streaming and paginating recipe listings.
+    """
+
+    def setUp(self):
+        self.recipe_manager = RecipeManager()
+        for i in range(1, 6):
+            self.recipe_manager.perform_create_recipe(f"Recipe {i}", "Ingredients", f"Instructions {i}")
+        self.recipe_manager.perform_delete_recipe(2)
+
+    def test_iter_recipes_by_offset_and_cursor(self):
+        """
+        Tests that listings can start at an offset or after a cursor and return selected fields.
+        """
+        self.assertEqual(list(self.recipe_manager.iter_recipes(offset=1, limit=2, fields=("recipe_id",))),
+                         [(3,), (4,)])
+        self.assertEqual([recipe.recipe_id for recipe in self.recipe_manager.iter_recipes(after_id=3)], [4, 5])
+        self.assertEqual(list(self.recipe_manager.iter_recipes(after_id=5)), [])
+
+    def test_summary_listing_leaves_out_instructions(self):
+        """
+        Tests that a summary listing shows IDs and titles only and returns the cursor for the next page.
+        """
+        stream = io.StringIO()
+        last_id = self.recipe_manager.write_recipes(stream, limit=2, summary=True)
+        self.assertEqual(stream.getvalue(), "ID: 1, Title: Recipe 1\nID: 3, Title: Recipe 3\n")
+        self.assertEqual(last_id, 3)
+
+    def test_read_recipes_pages_forwards_and_backwards(self):
+        """
+        Tests that read_recipes shows one page at a time and follows next/previous choices.
+        """
+        stream = io.StringIO()
+        actions = UserInterfaceActions(self.recipe_manager, [], page_size=2, output=stream)
+        with mock.patch("builtins.input", side_effect=["yes", "n", "n", "p", "q"]):
+            actions.read_recipes()
+        pages = [line for line in stream.getvalue().splitlines() if "page" in line]
+        self.assertEqual(len(pages), 4)
+        self.assertIn("page 2 of 2", pages[2])
+        self.assertIn("page 1 of 2", pages[3])
+        self.assertNotIn("Instructions", stream.getvalue())
+
+
+class TestRecipeTransfer(unittest.TestCase):
+    """
+    A test suite for bulk importing and exporting recipes.
+    """
+
+    def setUp(self):
+        self.recipe_manager = RecipeManager()
+        self.directory = tempfile.TemporaryDirectory()
+        self.storage = SQLiteDataAccess(os.path.join(self.directory.name, "recipes.db"))
+        self.storage.save_account("cook@example.com", "hash", False)
+
+    def tearDown(self):
+        self.storage.close()
+        self.directory.cleanup()
+
+    def test_import_jsonl_rejects_invalid_rows(self):
+        """
+        Tests that valid rows are stored with consecutive IDs after the user's
+        existing ones and invalid rows are reported.
+        """
+        self.storage.insert_recipe(FavouriteRecipes(1, "Pie", "apple", "Bake", "cook@example.com"))
+        lines = io.StringIO('{"title": "Soup", "ingredients": "onion", "instructions": "Boil"}\n'
+                            '{"title": "", "ingredients": "onion", "instructions": "Boil"}\n'
+                            'not json\n'
+                            '{"title": "Stew", "ingredients": "beef", "instructions": "Simmer"}\n')
+        errors = io.StringIO()
+        report = import_recipes(self.storage, "cook@example.com", lines, "jsonl", batch_size=2, errors=errors)
+        self.assertEqual((report.rows, report.rejected), (4, 2))
+        self.assertEqual([(recipe.recipe_id, recipe.title) for recipe in self.storage.load_recipes("cook@example.com")],
+                         [(1, "Pie"), (2, "Soup"), (3, "Stew")])
+        self.assertEqual(self.storage.load_next_recipe_id("cook@example.com"), 4)
+        self.assertIn("line 2: missing title", errors.getvalue())
+        self.assertIn("line 3: invalid JSON", errors.getvalue())
+
+    def test_csv_export_and_import_round_trip(self):
+        """
+        Tests that an exported CSV file, multiline instructions included, imports back unchanged.
+        """
+        original = RecipeManager("cook@example.com", self.storage)
+        original.perform_bulk_create_recipes([("Soup", "onion, carrot", "Chop\nBoil"), ("Stew", "beef", "Simmer")])
+        exported = io.StringIO()
+        self.assertEqual(export_recipes(self.storage, "cook@example.com", exported, "csv", batch_size=1).rows, 2)
+        exported.seek(0)
+        self.storage.save_account("copy@example.com", "hash", False)
+        import_recipes(self.storage, "copy@example.com", exported, "csv")
+        copy = RecipeManager("copy@example.com", self.storage)
+        self.assertEqual([(recipe.title, recipe.ingredients, recipe.instructions) for recipe in copy],
+                         [(recipe.title, recipe.ingredients, recipe.instructions) for recipe in original])
+        self.assertEqual(copy.find_by_ingredients(all_of=["carrot"])[0].title, "Soup")
+        original.close()
+        copy.close()
+
+    def test_export_memory_does_not_grow_with_the_collection(self):
+        """
+        Tests that exporting from either backend reads the collection a batch at
+        a time, so the peak memory is far below the size of the collection.
+        """
+        journal = JournalDataAccess(os.path.join(self.directory.name, "journal"))
+        self.addCleanup(journal.close)
+        journal.save_account("cook@example.com", "hash", False)
+        instructions = "Stir the pot. " * 100
+        for storage in (self.storage, journal):
+            recipes = [FavouriteRecipes(recipe_id, f"Soup {recipe_id}", "onion", f"{recipe_id}. {instructions}",
+                                        "cook@example.com") for recipe_id in range(1, 2001)]
+            storage.insert_recipes(recipes)
+            storage.flush()
+            for recipe in recipes:
+                recipe.release()
+            del recipes
+            with self.subTest(storage=type(storage).__name__), open(os.devnull, "w") as sink:
+                tracemalloc.start()
+                try:
+                    report = export_recipes(storage, "cook@example.com", sink, "jsonl", batch_size=50)
+                    peak = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+                self.assertEqual(report.rows, 2000)
+                self.assertLess(peak, 2000 * len(instructions) // 5)
+
+
+class TestBlobStore(unittest.TestCase):
+    """
+    A test suite for sharing recipe bodies between users.
+    """
+
+    def test_bodies_are_shared_and_copied_on_write(self):
+        """
+        Tests that identical recipes share one body, that an update only changes
+        the edited recipe, and that deleting a recipe or a user releases their
+        references at once, even while the collection is still referenced.
+        """
+        instructions = "1. Preheat the oven\n2. Bake the unique shared pie for 40 minutes"
+        registry = AccountRegistry()
+        users = [User(f"baker{i}@example.com", "Password123") for i in range(3)]
+        for user in users:
+            registry.add(user)
+            user.recipe_manager.create_recipe("Pie", "flour, apples", instructions)
+        bodies = {id(user.recipe_manager.get(1).body) for user in users}
+        self.assertEqual(len(bodies), 1)
+        body = users[0].recipe_manager.get(1).body
+        self.assertEqual(body.references, 3)
+        before = blob_store.stats()
+
+        users[0].recipe_manager.perform_update_recipe(1, None, None, instructions + "\n3. Serve")
+        self.assertEqual(users[1].recipe_manager.get(1).instructions, instructions)
+        self.assertEqual(body.references, 2)
+        users[1].recipe_manager.delete_recipe(1)
+        still_open = users[2].recipe_manager
+        registry.remove(users[2])
+        self.assertEqual(len(still_open), 0)
+        self.assertEqual(body.references, 0)
+        self.assertNotIn(body.digest, blob_store.bodies)
+        after = blob_store.stats()
+        self.assertEqual(after["references"], before["references"] - 2)
+        self.assertEqual(before["bytes_saved"] - after["bytes_saved"], 2 * body.size())
+
+
+class TestTextCompression(unittest.TestCase):
+    """
+    A test suite for keeping recipe instructions compressed in memory.
+    """
+
+    def setUp(self):
+        self.training_bytes = text_compressor.training_bytes
+        text_compressor.training_bytes = 2000
+        text_compressor.configure(enabled=True)
+
+    def tearDown(self):
+        text_compressor.configure(enabled=False)
+        text_compressor.training_bytes = self.training_bytes
+
+    def test_instructions_are_compressed_and_read_back(self):
+        """
+        Tests that instructions stored before the dictionary was trained are
+        compressed once it is, that every text reads back unchanged and that
+        repeated reads come from the cache.
+        """
+        recipe_manager = RecipeManager()
+        texts = [f"1. Preheat the oven to 180C\n2. Chop {i} onions finely\n3. Simmer for {i} minutes\n"
+                 f"4. Season to taste with salt and pepper" for i in range(40)]
+        for i, text in enumerate(texts):
+            recipe_manager.create_recipe(f"Stew {i}", "onion", text)
+        self.assertTrue(all(isinstance(recipe_manager.get(i + 1).body.packed_instructions, bytes)
+                            for i in range(len(texts))))
+        before = text_compressor.stats()
+        self.assertEqual([recipe_manager.get(i + 1).instructions for i in range(len(texts))], texts)
+        self.assertEqual(recipe_manager.get(1).instructions, texts[0])
+        after = text_compressor.stats()
+        self.assertGreater(after["compression_ratio"], 2)
+        self.assertGreater(after["cache_hits"], before["cache_hits"])
+        self.assertEqual(len(recipe_manager.search("simmer", limit=100)), len(texts))
+        recipe_manager.create_recipe("Toast", "bread", "Toast it.")
+        self.assertIsInstance(recipe_manager.get(41).body.packed_instructions, str)
+
+
+class TestChangeEvents(unittest.TestCase):
+    """
+    A test suite for the stream of account and recipe changes.
+    """
+
+    def test_mutations_are_published_in_order(self):
+        """
+        Tests that recipe and account changes are published with increasing
+        sequence numbers, and that an aggregate kept up to date by a subscriber
+        can catch up from the replay buffer after missing events.
+        """
+        registry = AccountRegistry()
+        recipes_per_user = {}
+
+        def count(event):
+            change = 1 if isinstance(event, RecipeCreated) else -1
+            recipes_per_user[event.user_email] = recipes_per_user.get(event.user_email, 0) + change
+
+        start = change_events.sequence
+        subscription = change_events.subscribe(count, types=(RecipeCreated, RecipeDeleted))
+        user = User("events@example.com", "Password123")
+        registry.add(user)
+        user.recipe_manager.create_recipe("Soup", "leek", "Boil.")
+        user.recipe_manager.perform_bulk_create_recipes([("Stew", "beef", "Simmer."), ("Pie", "apple", "Bake.")])
+        subscription.close()
+        user.recipe_manager.update_recipe(1, new_title="Leek soup")
+        user.recipe_manager.delete_recipe(2)
+        registry.remove(user)
+        self.assertEqual(recipes_per_user, {"events@example.com": 3})
+
+        events = change_events.replay(start)
+        self.assertEqual([type(event) for event in events], [AccountCreated, RecipeCreated, RecipeCreated,
+                                                             RecipeCreated, RecipeUpdated, RecipeDeleted,
+                                                             AccountDeleted])
+        self.assertEqual([event.sequence for event in events], list(range(start + 1, start + 8)))
+        self.assertEqual((events[4].version, events[4].title, events[4].instructions), (2, "Leek soup", None))
+        caught_up = change_events.subscribe(count, types=(RecipeCreated, RecipeDeleted), after=start + 4)
+        caught_up.close()
+        self.assertEqual(recipes_per_user, {"events@example.com": 2})
+
+    def test_subscribers_may_change_the_registry(self):
+        """
+        Tests that a subscriber runs after the publisher's locks are released,
+        so it can look up and register accounts itself.
+        """
+        registry = AccountRegistry(shard_count=1)
+        seen = []
+
+        def add_partner(event):
+            seen.append(registry.get(event.email) is not None)
+            if not event.email.startswith("partner."):
+                registry.add(User("partner." + event.email, "Password123"))
+
+        subscription = change_events.subscribe(add_partner, types=AccountCreated)
+        worker = threading.Thread(target=registry.add, args=(User("lead@example.com", "Password123"),))
+        worker.start()
+        worker.join(10)
+        subscription.close()
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(seen, [True, True])
+        self.assertIn("partner.lead@example.com", registry)
+
+    def test_slow_subscriber_does_not_hold_up_writers(self):
+        """
+        Tests that a writer does not wait for a subscriber another thread is
+        still calling, and that the subscriber still receives its event in order.
+        """
+        entered, release = threading.Event(), threading.Event()
+        titles = []
+
+        def slow(event):
+            titles.append(event.title)
+            entered.set()
+            release.wait(10)
+
+        subscription = change_events.subscribe(slow, types=RecipeCreated)
+        writer = threading.Thread(target=RecipeManager("slow@example.com").create_recipe,
+                                  args=("Soup", "leek", "Boil."))
+        writer.start()
+        entered.wait(10)
+        RecipeManager("quick@example.com").create_recipe("Stew", "beef", "Simmer.")
+        self.assertEqual(titles, ["Soup"])
+        release.set()
+        writer.join(10)
+        subscription.close()
+        self.assertEqual(titles, ["Soup", "Stew"])
+
+    def test_events_share_bodies_and_carry_no_password_hash(self):
+        """
+        Tests that recipe events refer to the recipe's shared body, are pickled
+        with its text instead, and that account events leave the hash out.
+        """
+        start = change_events.sequence
+        registry = AccountRegistry()
+        user = User("shared@example.com", "Password123")
+        registry.add(user)
+        recipe = user.recipe_manager.create_recipe("Soup", "leek", "Boil the leeks.")
+        account_event, recipe_event = change_events.replay(start)
+        self.assertFalse(hasattr(account_event, "password_hash"))
+        self.assertIs(recipe_event.body, recipe.body)
+        copy = pickle.loads(pickle.dumps(recipe_event))
+        self.assertEqual((copy.sequence, copy.title, copy.ingredients, copy.instructions),
+                         (recipe_event.sequence, "Soup", "leek", "Boil the leeks."))
+        registry.remove(user)
+
+    def test_replay_buffer_is_bounded(self):
+        """
+        Tests that replaying from before the oldest buffered event fails.
+        """
+        bus = EventBus(capacity=3)
+        for i in range(5):
+            bus.publish(RecipeDeleted("cook@example.com", i))
+        self.assertEqual([event.recipe_id for event in bus.replay(2)], [2, 3, 4])
+        with self.assertRaises(EventsLost):
+            bus.replay(1)
+
+    def test_async_subscribers_catch_up_after_lagging(self):
+        """
+        Tests that an async subscriber whose queue overflows still reads every
+        event, in order, by catching up from the buffer.
+        """
+        bus = EventBus()
+
+        async def consume():
+            subscription = bus.subscribe_async(types=RecipeEvent, queue_size=2)
+            for i in range(10):
+                bus.publish(RecipeDeleted("cook@example.com", i))
+                bus.publish(AccountDeleted("cook@example.com", False))
+            received = []
+            async for event in subscription:
+                received.append(event.recipe_id)
+                if len(received) == 10:
+                    subscription.close()
+            return received
+
+        self.assertEqual(asyncio.run(consume()), list(range(10)))
+
+
+class TestRecipeHistory(unittest.TestCase):
+    """
+    A test suite for the revision history of recipes.
+    """
+
+    def setUp(self):
+        self.recipe_manager = RecipeManager()
+        self.recipe_manager.create_recipe("Soup", "leek, potato", "1. Chop\n2. Simmer\n3. Serve")
+
+    def test_versions_are_rebuilt_compared_and_reverted(self):
+        """
+        Tests that every earlier version can be rebuilt, compared with the
+        current one and restored, and that a revert can itself be undone.
+        """
+        self.recipe_manager.update_recipe(1, new_instructions="1. Chop\n2. Simmer for 20 minutes\n3. Serve")
+        self.recipe_manager.update_recipe(1, new_title="Leek soup", new_ingredients="leek, potato, cream")
+        self.assertEqual([version for version, _ in self.recipe_manager.recipe_versions(1)], [3, 2, 1])
+        self.assertEqual(self.recipe_manager.get_version(1, 1), ("Soup", "leek, potato", "1. Chop\n2. Simmer\n3. Serve"))
+        self.assertEqual(self.recipe_manager.get_version(1, 2)[2], "1. Chop\n2. Simmer for 20 minutes\n3. Serve")
+        self.assertIsNone(self.recipe_manager.get_version(1, 4))
+        diff = self.recipe_manager.diff_versions(1, 1)
+        self.assertIn("-Title: Soup\n", diff)
+        self.assertIn("+2. Simmer for 20 minutes\n", diff)
+        self.assertNotIn(" 1. Chop\n", [line for line in diff if line.startswith(("-", "+"))])
+
+        self.assertTrue(self.recipe_manager.revert_recipe(1, 1))
+        recipe = self.recipe_manager.get(1)
+        self.assertEqual((recipe.version, recipe.title, recipe.instructions), (4, "Soup", "1. Chop\n2. Simmer\n3. Serve"))
+        self.assertEqual(self.recipe_manager.find_by_ingredients(["cream"]), [])
+        self.assertTrue(self.recipe_manager.revert_recipe(1, 3))
+        self.assertEqual(self.recipe_manager.get(1).title, "Leek soup")
+        self.assertFalse(self.recipe_manager.revert_recipe(1, 5, expected_version=4))
+
+        self.recipe_manager.delete_recipe(1)
+        self.assertEqual(len(self.recipe_manager.history), 0)
+
+    def test_update_that_changes_nothing_is_not_recorded(self):
+        """
+        Tests that an update with no new values keeps the version and adds no revision.
+        """
+        recipe = self.recipe_manager.get(1)
+        self.assertTrue(self.recipe_manager.update_recipe(1))
+        self.assertTrue(self.recipe_manager.update_recipe(1, recipe.title, recipe.ingredients, recipe.instructions,
+                                                          expected_version=1))
+        self.assertEqual(recipe.version, 1)
+        self.assertEqual(len(self.recipe_manager.history), 0)
+        self.assertFalse(self.recipe_manager.update_recipe(1, expected_version=2))
+
+    def test_history_is_bounded_by_count_and_age(self):
+        """
+        Tests that only the newest versions are kept and that old ones expire.
+        """
+        now = [1000.0]
+        self.recipe_manager.history = RecipeHistory(max_revisions=3, max_age=60, clock=lambda: now[0])
+        for step in range(5):
+            self.recipe_manager.update_recipe(1, new_instructions=f"Step {step}")
+        self.assertEqual([version for version, _ in self.recipe_manager.recipe_versions(1)], [6, 5, 4, 3])
+        self.assertIsNone(self.recipe_manager.get_version(1, 2))
+        now[0] += 61
+        self.assertEqual(self.recipe_manager.recipe_versions(1), [(6, None)])
+        self.assertEqual(len(self.recipe_manager.history), 0)
+
+
+class TestIngredientSearch(unittest.TestCase):
+    """
+    A test suite for finding recipes through the ingredient index.
+    """
+
+    def setUp(self):
+        self.recipe_manager = RecipeManager()
+        self.recipe_manager.perform_create_recipe("Soup", "Onion, carrot, salt", "Boil")
+        self.recipe_manager.perform_create_recipe("Salad", "tomato, onion", "Toss")
+        self.recipe_manager.perform_create_recipe("Chips", "potato,  Salt ", "Fry")
+
+    def find_ids(self, **query):
+        return [recipe.recipe_id for recipe in self.recipe_manager.find_by_ingredients(**query)]
+
+    def test_queries_combine_all_any_and_none(self):
+        """
+        Tests that all_of, any_of and none_of narrow the results as documented.
+        """
+        self.assertEqual(self.find_ids(all_of=["onion"]), [1, 2])
+        self.assertEqual(self.find_ids(all_of=["ONION", "salt"]), [1])
+        self.assertEqual(self.find_ids(any_of=["carrot", "potato"]), [1, 3])
+        self.assertEqual(self.find_ids(all_of=["salt"], any_of=["potato", "tomato"]), [3])
+        self.assertEqual(self.find_ids(none_of=["onion"]), [3])
+        self.assertEqual(self.find_ids(all_of=["saffron"]), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        """
+        Tests that the index reflects changed ingredients and deleted recipes.
+        """
+        self.recipe_manager.perform_update_recipe(2, None, "tomato, basil", None)
+        self.recipe_manager.perform_delete_recipe(1)
+        self.assertEqual(self.find_ids(all_of=["onion"]), [])
+        self.assertEqual(self.find_ids(any_of=["basil", "salt"]), [2, 3])
+
+    def test_ingredients_are_interned_tokens(self):
+        """
+        Tests that ingredients are parsed into shared tokens, the text as entered is
+        still returned, and tokens leave the table with the last recipe using them.
+        """
+        soup, chips = self.recipe_manager.get(1), self.recipe_manager.get(3)
+        self.assertEqual(soup.ingredient_tokens, ("onion", "carrot", "salt"))
+        self.assertIs(soup.ingredient_tokens[2], chips.ingredient_tokens[1])
+        self.assertEqual(chips.ingredients, "potato,  Salt ")
+        self.assertIsNone(self.recipe_manager.get(2).ingredient_text)
+        self.assertEqual(self.recipe_manager.get(2).ingredients, "tomato, onion")
+        carrots = ingredient_table.counts["carrot"]
+        self.recipe_manager.update_recipe(1, new_ingredients="leek, saffron")
+        self.assertIn("saffron", ingredient_table)
+        self.assertEqual(ingredient_table.counts.get("carrot", 0), carrots - 1)
+        self.recipe_manager.delete_recipe(1)
+        self.assertNotIn("saffron", ingredient_table)
+
+
+class TestRecipeSearch(unittest.TestCase):
+    """
+    A test suite for full-text search over recipe titles and instructions.
+    """
+
+    def setUp(self):
+        self.recipe_manager = RecipeManager()
+        self.recipe_manager.perform_create_recipe("Tomato soup", "tomato", "Chop the tomatoes.\nSimmer gently.")
+        self.recipe_manager.perform_create_recipe("Roast chicken", "chicken", "Preheat the oven.\nRoast the chicken.")
+        self.recipe_manager.perform_create_recipe("Chicken soup", "chicken", "Simmer the chicken in stock.")
+
+    def search_ids(self, query):
+        return [recipe.recipe_id for recipe, _ in self.recipe_manager.search(query)]
+
+    def test_results_are_ranked(self):
+        """
+        Tests that recipes matching more of the query rank higher.
+        """
+        self.assertEqual(self.search_ids("chicken soup")[0], 3)
+        self.assertEqual(set(self.search_ids("chicken")), {2, 3})
+
+    def test_phrases_and_typos(self):
+        """
+        Tests that quoted phrases must match exactly and misspelled words still match.
+        """
+        self.assertEqual(self.search_ids('"roast the chicken"'), [2])
+        self.assertEqual(self.search_ids('"the roast chicken"'), [])
+        self.assertEqual(self.search_ids("tomatos"), [1])
+
+    def test_index_follows_updates_and_deletes(self):
+        """
+        Tests that search reflects updated titles and deleted recipes.
+        """
+        self.recipe_manager.perform_update_recipe(1, "Gazpacho", None, None)
+        self.recipe_manager.perform_delete_recipe(3)
+        self.assertEqual(self.search_ids("gazpacho"), [1])
+        self.assertEqual(self.search_ids("soup"), [])
+
+
+class TestRecipeTable(unittest.TestCase):
+    """
+    A test suite for the column-oriented RecipeTable.
+    """
+
+    def setUp(self):
+        self.table = RecipeTable.from_recipes([
+            FavouriteRecipes(1, "Soup", "onion, carrot", "Boil", "a@example.com"),
+            FavouriteRecipes(2, "Crème brûlée", "cream, sugar", "Bake\nTorch", "a@example.com"),
+        ])
+
+    def test_views_expose_recipe_attributes(self):
+        """
+        Tests that rows read back through views match the recipes they were built from.
+        """
+        view = self.table.get(2)
+        self.assertEqual((view.recipe_id, view.title, view.ingredients, view.instructions, view.user_email),
+                         (2, "Crème brûlée", "cream, sugar", "Bake\nTorch", "a@example.com"))
+        self.assertEqual(self.table.emails.count("a@example.com"), 1)
+
+    def test_update_delete_and_compact(self):
+        """
+        Tests that updates and deletes are visible and survive compaction.
+        """
+        self.assertTrue(self.table.update(1, new_title="Onion soup"))
+        self.assertTrue(self.table.delete(2))
+        self.assertIsNone(self.table.get(2))
+        self.table.compact()
+        self.assertEqual([(view.recipe_id, view.title, view.ingredients) for view in self.table],
+                         [(1, "Onion soup", "onion, carrot")])
+        self.assertEqual((len(self.table), len(self.table.ids), bytes(self.table.text)),
+                         (1, 1, "Onion souponion, carrotBoil".encode("utf-8")))
+        self.assertEqual(self.table.append(3, "Stew", "beef", "Simmer").title, "Stew")
+
+    def test_ids_must_ascend(self):
+        """
+        Tests that appending an ID lower than the last one is rejected.
+        """
+        self.assertRaises(ValueError, self.table.append, 1, "Title", "Ingredients", "Instructions")
+
+
+class TestSQLiteDataAccess(unittest.TestCase):
+    """
+    A test suite for persisting accounts and recipes through the SQLite backend.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "recipes.db")
+        self.storage = SQLiteDataAccess(self.path, batch_size=4)
+
+    def tearDown(self):
+        self.storage.close()
+        self.directory.cleanup()
+
+    def test_accounts_and_recipes_survive_a_restart(self):
+        """
+        Tests that accounts, recipes and the recipe ID counter are reloaded after reopening the database.
+        """
+        registry = AccountRegistry(storage=self.storage)
+        user = User("cook@example.com", "Password123", storage=self.storage)
+        registry.add(user)
+        user.recipe_manager.perform_create_recipe("Soup", "onion", "Boil")
+        user.recipe_manager.perform_create_recipe("Stew", "beef", "Simmer")
+        user.recipe_manager.perform_update_recipe(1, "Onion soup", None, None)
+        user.recipe_manager.perform_delete_recipe(2)
+        self.storage.close()
+
+        self.storage = SQLiteDataAccess(self.path)
+        registry = AccountRegistry()
+        registry.attach_storage(self.storage, User.from_record)
+        reloaded = registry.authenticate("COOK@example.com", "Password123")
+        self.assertIsNotNone(reloaded)
+        self.assertEqual([(recipe.recipe_id, recipe.title) for recipe in reloaded.recipe_manager],
+                         [(1, "Onion soup")])
+        self.assertEqual(reloaded.recipe_manager.perform_create_recipe("Pie", "apple", "Bake").recipe_id, 3)
+
+    def test_writes_are_batched_until_flushed(self):
+        """
+        Tests that writes are queued until the batch fills up or is flushed.
+        """
+        self.storage.save_account("a@example.com", "hash", False)
+        self.assertEqual(len(self.storage.pending), 1)
+        self.storage.flush()
+        self.assertEqual(self.storage.pending, [])
+        for i in range(4):
+            self.storage.save_account(f"user{i}@example.com", "hash", False)
+        self.assertEqual(self.storage.pending, [])
+
+    def test_deleting_an_account_deletes_its_recipes(self):
+        """
+        Tests that removing an account from the registry also removes its stored recipes.
+        """
+        registry = AccountRegistry(storage=self.storage)
+        user = User("cook@example.com", "Password123", storage=self.storage)
+        registry.add(user)
+        user.recipe_manager.perform_create_recipe("Soup", "onion", "Boil")
+        registry.remove(user)
+        self.assertEqual(self.storage.load_accounts(), [])
+        self.assertEqual(self.storage.load_recipes("cook@example.com"), [])
+
+    def test_inserting_an_existing_recipe_id_is_refused(self):
+        """
+        Tests that an insert under a recipe ID its owner already has, stored or
+        still queued, is refused to its own caller, and that other writes go on.
+        """
+        self.storage.save_account("cook@example.com", "hash", False)
+        self.storage.insert_recipe(FavouriteRecipes(1, "Soup", "onion", "Boil", "cook@example.com"))
+        self.assertRaises(RecipeExists, self.storage.insert_recipe,
+                          FavouriteRecipes(1, "Stew", "beef", "Simmer", "COOK@example.com"))
+        self.storage.flush()
+        self.assertRaises(RecipeExists, self.storage.insert_recipes,
+                          [FavouriteRecipes(2, "Pie", "apple", "Bake", "cook@example.com"),
+                           FavouriteRecipes(1, "Stew", "beef", "Simmer", "cook@example.com")])
+        self.storage.insert_recipe(FavouriteRecipes(1, "Stew", "beef", "Simmer", "other@example.com"))
+        self.storage.flush()
+        self.assertEqual([recipe.title for recipe in self.storage.load_recipes("cook@example.com")], ["Soup"])
+        self.storage.delete_recipe("cook@example.com", 1)
+        self.storage.insert_recipe(FavouriteRecipes(1, "Stew", "beef", "Simmer", "cook@example.com"))
+        self.assertEqual([recipe.title for recipe in self.storage.load_recipes("cook@example.com")], ["Stew"])
+
+        recipe_manager = RecipeManager("cook@example.com", self.storage)
+        recipe_manager.next_recipe_id = 1
+        self.assertRaises(RecipeExists, recipe_manager.create_recipe, "Soup", "onion", "Boil")
+        self.assertEqual(len(recipe_manager), 1)
+
+    def test_failed_commit_keeps_the_batch(self):
+        """
+        Tests that writes in a batch that fails to commit are queued again rather than lost.
+        """
+        self.storage.save_account("cook@example.com", "hash", False)
+        self.storage.insert_recipe(FavouriteRecipes(1, None, "onion", "Boil", "cook@example.com"))
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.storage.flush()
+        self.assertEqual(len(self.storage.pending), 3)
+        self.assertFalse(self.storage.connection.in_transaction)
+        self.storage.pending.clear()
+
+    def test_incomplete_backend_cannot_be_created(self):
+        """
+        Tests that a backend missing one of the interface's operations fails when instantiated.
+        """
+        class Incomplete(DataAccess):
+            def load_accounts(self):
+                return []
+
+        self.assertRaises(TypeError, Incomplete)
+
+
+class TestJournalDataAccess(unittest.TestCase):
+    """
+    A test suite for the append-only journal backend and its snapshots.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.storage = JournalDataAccess(self.directory.name, snapshot_every=5)
+
+    def tearDown(self):
+        self.storage.close()
+        self.directory.cleanup()
+
+    def reopen(self):
+        self.storage.close()
+        self.storage = JournalDataAccess(self.directory.name, snapshot_every=5)
+
+    def test_state_is_rebuilt_from_snapshot_and_journal_tail(self):
+        """
+        Tests that a restart sees every write, whether it was compacted into a snapshot or not.
+        """
+        user = User("cook@example.com", "Password123", storage=self.storage)
+        AccountRegistry(storage=self.storage).add(user)
+        for i in range(6):
+            user.recipe_manager.perform_create_recipe(f"Recipe {i}", "onion", "Boil")
+        user.recipe_manager.perform_delete_recipe(2)
+        user.recipe_manager.perform_update_recipe(3, "Renamed", None, None)
+        self.assertEqual(self.storage.generation, 1)
+        self.reopen()
+
+        registry = AccountRegistry()
+        registry.attach_storage(self.storage, User.from_record)
+        reloaded = registry.get("cook@example.com")
+        self.assertEqual([recipe.recipe_id for recipe in reloaded.recipe_manager], [1, 3, 4, 5, 6])
+        self.assertEqual(reloaded.recipe_manager.get(3).title, "Renamed")
+        self.assertEqual(reloaded.recipe_manager.next_recipe_id, 7)
+
+    def test_only_record_locations_are_kept_in_memory(self):
+        """
+        Tests that the backend indexes where records are instead of holding
+        their contents, and reads unsynced records back from the journal.
+        """
+        self.storage.save_account("cook@example.com", "hash", False)
+        self.storage.insert_recipe(FavouriteRecipes(1, "Soup", "onion", "Boil", "cook@example.com"))
+        self.storage.update_recipe(FavouriteRecipes(1, "Leek soup", "leek", "Boil", "cook@example.com"))
+        self.assertTrue(all(isinstance(location, int)
+                            for location in self.storage.recipes["cook@example.com"].values()))
+        self.assertEqual([(recipe.title, recipe.ingredients) for recipe in self.storage.load_recipes("cook@example.com")],
+                         [("Leek soup", "leek")])
+        self.assertRaises(RecipeExists, self.storage.insert_recipe,
+                          FavouriteRecipes(1, "Stew", "beef", "Simmer", "cook@example.com"))
+
+    def test_torn_record_at_end_of_journal_is_discarded(self):
+        """
+        Tests that a partially written record does not stop the journal from loading.
+        """
+        self.storage.save_account("cook@example.com", "hash", False)
+        self.storage.flush()
+        with open(self.storage.journal_path(self.storage.generation), "ab") as journal:
+            journal.write(b"\x00\x00\x00\x40partial")
+        self.reopen()
+        self.assertEqual(self.storage.load_accounts(), [("cook@example.com", "hash", False)])
+        self.storage.save_account("other@example.com", "hash", True)
+        self.reopen()
+        self.assertEqual(len(self.storage.load_accounts()), 2)
+
+
+class TestRecipeManagerCache(unittest.TestCase):
+    """
+    A test suite for lazily loading and evicting recipe collections.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.storage = SQLiteDataAccess(os.path.join(self.directory.name, "recipes.db"))
+        self.cache = RecipeManagerCache(max_collections=2)
+
+    def tearDown(self):
+        self.storage.close()
+        self.directory.cleanup()
+
+    def test_collections_are_loaded_once_and_reused(self):
+        """
+        Tests that the first lookup loads the collection and later lookups hit the cache.
+        """
+        manager = self.cache.get("cook@example.com", self.storage)
+        self.assertIs(self.cache.get("COOK@example.com", self.storage), manager)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_collection_on_another_backend_is_flushed_and_closed(self):
+        """
+        Tests that asking for a user's collection on a different backend flushes
+        and closes the one held for the old backend before loading the new one.
+        """
+        old = self.cache.get("cook@example.com", self.storage)
+        old.perform_create_recipe("Soup", "onion", "Boil")
+        other = SQLiteDataAccess(os.path.join(self.directory.name, "other.db"))
+        self.addCleanup(other.close)
+        new = self.cache.get("cook@example.com", other)
+        self.assertIsNot(new, old)
+        self.assertEqual((len(old), len(new)), (0, 0))
+        self.assertEqual(self.storage.pending, [])
+        self.assertEqual([recipe.title for recipe in self.storage.load_recipes("cook@example.com")], ["Soup"])
+
+    def test_least_recently_used_collection_is_evicted_and_written_back(self):
+        """
+        Tests that going over budget evicts the least recently used collection,
+        flushing its writes so that it reloads intact.
+        """
+        first = self.cache.get("a@example.com", self.storage)
+        first.perform_create_recipe("Soup", "onion", "Boil")
+        self.cache.get("b@example.com", self.storage)
+        self.cache.get("c@example.com", self.storage)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+        self.assertEqual(self.cache.stats()["write_backs"], 1)
+        self.assertEqual(self.storage.pending, [])
+        del first
+        gc.collect()
+        reloaded = self.cache.get("a@example.com", self.storage)
+        self.assertEqual(self.cache.misses, 4)
+        self.assertEqual(reloaded.get(1).title, "Soup")
+
+    def test_evicted_collection_still_in_use_is_handed_back(self):
+        """
+        Tests that a collection evicted while something else holds it is
+        returned again rather than loaded twice, so recipe IDs are not reused.
+        """
+        self.cache.max_collections = 1
+        held = self.cache.get("a@example.com", self.storage)
+        held.perform_create_recipe("Soup", "onion", "Boil")
+        self.cache.get("b@example.com", self.storage)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+        self.assertIs(self.cache.get("a@example.com", self.storage), held)
+        self.cache.get("a@example.com", self.storage).perform_create_recipe("Stew", "beef", "Simmer")
+        self.assertEqual(held.perform_create_recipe("Pie", "apple", "Bake").recipe_id, 3)
+        self.storage.flush()
+        self.assertEqual([recipe.title for recipe in self.storage.load_recipes("a@example.com")],
+                         ["Soup", "Stew", "Pie"])
+
+    def test_in_memory_users_keep_their_collection(self):
+        """
+        Tests that users without persistent storage keep one collection for their lifetime.
+        """
+        user = User("memory@example.com", "Password123")
+        user.recipe_manager.perform_create_recipe("Soup", "onion", "Boil")
+        self.assertEqual(len(user.recipe_manager), 1)
+
 
 class TestUserInterface(unittest.TestCase):
     def setUp(self):
@@ -113,9 +969,645 @@ class TestUserInterface(unittest.TestCase):
         Tests the login method with valid credentials.
         """
         ui = UserInterface(self.test_user)
-        result = ui.login(self.test_user.email, self.test_user.password)
+        result = ui.login(self.test_user.email, "Password123")
         self.assertEqual(result, self.test_user)
 
+    def test_plain_text_password_is_not_kept(self):
+        """
+        Tests that a user holds only the password hash, never the password itself.
+        """
+        self.assertFalse(hasattr(self.test_user, "password"))
+        self.assertNotIn("Password123", [value for value in vars(self.test_user).values() if isinstance(value, str)])
+        self.assertTrue(self.test_user.check_password("Password123"))
+
+    def test_view_all_users_pages(self):
+        """
+        Tests that the admin listing pages through other users filtered by domain.
+        """
+        registry = AccountRegistry([User("admin@example.com", "Password123", is_admin=True),
+                                    User("b@example.com", "Password123"), User("a@example.com", "Password123"),
+                                    User("c@other.com", "Password123")])
+        options = UserInterfaceActions(None, [], page_size=1)
+        with mock.patch("user_interface_actions.all_accounts", registry), \
+                mock.patch("builtins.input", side_effect=["@example.com", "n", "n", "q"]), \
+                mock.patch("sys.stdout", new_callable=io.StringIO) as output:
+            options.view_all_users(registry.get("admin@example.com"))
+        listed = [line for line in output.getvalue().splitlines() if line.startswith("Email:")]
+        self.assertEqual(listed, ["Email: a@example.com, Admin: False", "Email: b@example.com, Admin: False"])
+        self.assertIn("3 users match '@example.com'.", output.getvalue())
+
+
+class TestAccountRegistry(unittest.TestCase):
+    """
+    A test suite for the email-indexed AccountRegistry.
+    """
+
+    def setUp(self):
+        self.registry = AccountRegistry()
+        self.user = User("Someone@Example.com", "Password123")
+        self.registry.add(self.user)
+
+    def test_lookup_is_case_insensitive(self):
+        """
+        Tests that accounts can be found regardless of the email's case or surrounding whitespace.
+        """
+        self.assertIs(self.registry.get(" someone@example.COM "), self.user)
+        self.assertIn("SOMEONE@example.com", self.registry)
+
+    def test_duplicate_email_is_rejected(self):
+        """
+        Tests that a second account with the same email is not registered.
+        """
+        self.assertFalse(self.registry.add(User("someone@example.com", "Password456")))
+        self.assertEqual(len(self.registry), 1)
+
+    def test_authenticate(self):
+        """
+        Tests that authentication needs both a registered email and the matching password.
+        """
+        self.assertIs(self.registry.authenticate("someone@example.com", "Password123"), self.user)
+        self.assertIsNone(self.registry.authenticate("someone@example.com", "wrong"))
+        self.assertIsNone(self.registry.authenticate("nobody@example.com", "Password123"))
+
+    def test_sorted_pages_and_counts(self):
+        """
+        Tests cursor pages in email order, prefix and domain filters, and maintained counts.
+        """
+        for email in ["carol@b.org", "alice@a.com", "bob@b.org", "Admin@a.com"]:
+            self.registry.add(User(email, "Password123", is_admin=email.startswith("Admin")))
+        first = self.registry.page(limit=2, exclude="someone@example.com")
+        self.assertEqual([user.email for user in first], ["Admin@a.com", "alice@a.com"])
+        rest = self.registry.page(after=first[-1].email, limit=10, exclude="someone@example.com")
+        self.assertEqual([user.email for user in rest], ["bob@b.org", "carol@b.org"])
+        self.assertEqual([user.email for user in self.registry.page(domain="B.org")], ["bob@b.org", "carol@b.org"])
+        self.assertEqual([user.email for user in self.registry.page(prefix="al")], ["alice@a.com"])
+        self.assertEqual((self.registry.count(), self.registry.count(domain="a.com"),
+                          self.registry.count(prefix="b"), self.registry.admin_count), (5, 2, 1, 1))
+        self.registry.remove_email("admin@a.com")
+        self.assertEqual((self.registry.count(domain="a.com"), self.registry.admin_count), (1, 0))
+
+    def test_remove_and_iterate(self):
+        """
+        Tests that iteration follows insertion order and removed accounts disappear.
+        """
+        other = User("other@example.com", "Password123")
+        self.registry.add(other)
+        self.assertEqual(list(self.registry), [self.user, other])
+        self.registry.remove(self.user)
+        self.assertEqual(list(self.registry), [other])
+        self.assertRaises(ValueError, self.registry.remove, self.user)
+
+
+class TestConcurrency(unittest.TestCase):
+    """
+    A test suite for using the registry and recipe collections from several threads.
+    """
+
+    def run_threads(self, target, count=8):
+        threads = [threading.Thread(target=target, args=(number,)) for number in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_compare_and_set_update(self):
+        """
+        Tests that a stale version is refused and that concurrent increments are never lost.
+        """
+        recipe_manager = RecipeManager()
+        recipe = recipe_manager.create_recipe("Zero", "salt", "Count.")
+        self.assertTrue(recipe_manager.update_recipe(1, "0", expected_version=1))
+        self.assertFalse(recipe_manager.update_recipe(1, "stale", expected_version=1))
+
+        def increment(_):
+            for _ in range(200):
+                while True:
+                    version, value = recipe.version, int(recipe.title)
+                    if recipe_manager.update_recipe(1, str(value + 1), expected_version=version):
+                        break
+
+        self.run_threads(increment)
+        self.assertEqual(recipe.title, "1600")
+        self.assertEqual(recipe_manager.search("1600")[0][0], recipe)
+
+    def test_registry_from_many_threads(self):
+        """
+        Tests that accounts added and removed concurrently leave the registry consistent.
+        """
+        registry = AccountRegistry()
+
+        def churn(number):
+            for i in range(100):
+                email = f"user{number}-{i}@example.com"
+                registry.add(User(email, "Password123"))
+                self.assertIsNotNone(registry.get(email))
+                if i % 2:
+                    registry.remove_email(email)
+
+        self.run_threads(churn)
+        self.assertEqual(len(registry), 400)
+        self.assertEqual(len(list(registry)), 400)
+
+    def test_read_write_lock(self):
+        """
+        Tests that readers share the lock and a writer excludes them.
+        """
+        lock = ReadWriteLock()
+        lock.acquire_read()
+        lock.acquire_read()
+        self.assertEqual(lock.readers, 2)
+        writer = threading.Thread(target=lock.acquire_write)
+        writer.start()
+        writer.join(0.05)
+        self.assertTrue(writer.is_alive())
+        lock.release_read()
+        lock.release_read()
+        writer.join()
+        self.assertTrue(lock.writing)
+
+
+class TestPasswordHashing(unittest.TestCase):
+    """
+    A test suite for salted password hashing and its verification cache.
+    """
+
+    def test_hashes_are_salted_and_verified(self):
+        """
+        Tests that the same password hashes differently each time and still verifies.
+        """
+        hasher = PasswordHasher(n=2 ** 4)
+        first, second = hasher.hash("Password123"), hasher.hash("Password123")
+        self.assertNotEqual(first, second)
+        self.assertTrue(hasher.verify("Password123", first))
+        self.assertFalse(hasher.verify("Password124", first))
+        self.assertTrue(hasher.verify("Password123", first))
+        self.assertEqual(hasher.stats(), {"hits": 1, "misses": 2, "cached": 1})
+        hasher.shutdown()
+
+    def test_process_pool(self):
+        """
+        Tests hashing on a process pool.
+        """
+        hasher = PasswordHasher("process", workers=1, n=2 ** 4)
+        self.assertTrue(hasher.verify("Password123", hasher.hash("Password123")))
+        hasher.shutdown()
+
+    def test_legacy_hash_is_upgraded_on_login(self):
+        """
+        Tests that an unsalted SHA-256 hash still logs in and is replaced by a scrypt hash.
+        """
+        legacy = "008c70392e3abfbd0fa47bbc2ed96aa99bd49e159727fcba0f2e6abeb3a9d601"
+        user = User("old@example.com", None, password_hash=legacy)
+        registry = AccountRegistry([user])
+        self.assertIsNone(registry.authenticate("old@example.com", "Password124"))
+        self.assertIs(registry.authenticate("old@example.com", "Password123"), user)
+        self.assertTrue(user.password_hash.startswith("scrypt$"))
+        self.assertTrue(user.check_password("Password123"))
+
+
+    def test_legacy_hash_upgrade_skips_a_removed_account(self):
+        """
+        Tests that an account removed while its upgraded hash was being computed
+        is not written back to storage.
+        """
+        legacy = "008c70392e3abfbd0fa47bbc2ed96aa99bd49e159727fcba0f2e6abeb3a9d601"
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        storage = SQLiteDataAccess(os.path.join(directory.name, "accounts.db"))
+        self.addCleanup(storage.close)
+        user = User("old@example.com", None, storage=storage, password_hash=legacy)
+        registry = AccountRegistry([user], storage=storage)
+        hash_password = user.hash_password
+
+        def remove_while_hashing(password):
+            registry.remove(user)
+            return hash_password(password)
+
+        with mock.patch.object(user, "hash_password", side_effect=remove_while_hashing):
+            self.assertIs(registry.authenticate("old@example.com", "Password123"), user)
+        self.assertEqual(user.password_hash, legacy)
+        self.assertIsNone(storage.load_account("old@example.com"))
+
+class TestBatchRunner(unittest.TestCase):
+    """
+    A test suite for replaying scripted operations without prompts.
+    """
+
+    def test_script_streams_results(self):
+        """
+        Tests that each operation of a script produces one JSON result and failures do not stop the script.
+        """
+        admin = User("admin@example.com", "Password123", is_admin=True)
+        registry = AccountRegistry([admin])
+        script = [
+            '{"op": "create", "title": "Soup", "ingredients": "leek", "instructions": "Boil."}',
+            '{"op": "create_account", "email": "cook@example.com", "password": "Password123"}',
+            '{"op": "login", "email": "cook@example.com", "password": "Password123"}',
+            '{"op": "create", "title": "Soup", "ingredients": "leek", "instructions": "Boil."}',
+            '# a comment',
+            '{"op": "update", "id": 1, "title": "Leek soup", "version": 1}',
+            '{"op": "update", "id": 1, "title": "Potato soup", "version": 1}',
+            '{"op": "delete_user", "email": "admin@example.com"}',
+            '{"op": "delete", "id": 1}',
+            '{"op": "login", "email": "admin@example.com", "password": "Password123"}',
+            '{"op": "delete_user", "email": "cook@example.com"}',
+            'not json',
+        ]
+        output = io.StringIO()
+        summary = BatchRunner(registry).run(script, output)
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([result["ok"] for result in results],
+                         [False, True, True, True, True, False, False, True, True, True, False])
+        self.assertEqual(results[0]["error"], "Log in first.")
+        self.assertEqual(results[4], {"line": 6, "op": "update", "ok": True, "id": 1, "version": 2})
+        self.assertEqual(results[5]["error"], "Recipe with ID: 1 was changed by someone else.")
+        self.assertEqual(results[9]["line"], 11)
+        self.assertNotIn("cook@example.com", registry)
+        self.assertEqual((summary["operations"], summary["errors"]), (11, 4))
+
+    def test_storage_failures_are_reported_per_line(self):
+        """
+        Tests that an operation the storage backend refuses or fails to write is
+        counted as an error and reported on its own line, and the script goes on.
+        """
+        registry = AccountRegistry([User("cook@example.com", "Password123")])
+        create = '{"op": "create", "title": "Soup", "ingredients": "leek", "instructions": "Boil."}'
+        script = ['{"op": "login", "email": "cook@example.com", "password": "Password123"}',
+                  create, create, create, '{"op": "logout"}']
+        failures = [RecipeExists("Recipe 1 of cook@example.com already exists."),
+                    sqlite3.OperationalError("database is locked"), OSError("No space left on device")]
+        output = io.StringIO()
+        with mock.patch.object(RecipeManager, "create_recipe", side_effect=failures):
+            summary = BatchRunner(registry).run(script, output)
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([result["ok"] for result in results], [True, False, False, False, True])
+        self.assertEqual([result.get("error") for result in results[1:4]],
+                         [str(failure) for failure in failures])
+        self.assertEqual((summary["operations"], summary["errors"]), (5, 3))
+
+    def test_console_drives_the_menus(self):
+        """
+        Tests that the menus read from and write to an injected console rather than the terminal.
+        """
+        output = io.StringIO()
+        console = Console.from_lines(["Soup", "leek", "Boil.", "", "yes", "5"], output)
+        ui = UserInterface(User("cook@example.com", "Password123"), console)
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as terminal:
+            ui.options.create_recipe()
+            ui.options.read_recipes()
+            ui.options.recipe_manager.perform_delete_recipe(2, console=console)
+        self.assertEqual(terminal.getvalue(), "")
+        with mock.patch("builtins.input", side_effect=AssertionError):
+            ui.run()
+        self.assertIn("Recipe 'Soup', with ID 1 created successfully!", output.getvalue())
+        self.assertIn("Recipe with ID: 2 not found.", output.getvalue())
+        self.assertIn("1, Title: Soup", output.getvalue())
+        self.assertIn("Exiting...", output.getvalue())
+        with self.assertRaises(EOFError):
+            ui.user_interface_manager.display_menu_and_get_choice()
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    A test suite for the call counters and latency histograms.
+    """
+
+    def test_counts_errors_and_percentiles(self):
+        """
+        Tests that calls and errors are counted and percentiles come from the histogram.
+        """
+        registry = Metrics()
+
+        @registry.timed("divide")
+        def divide(a, b):
+            return a / b
+
+        for _ in range(99):
+            divide(1, 2)
+        with self.assertRaises(ZeroDivisionError):
+            divide(1, 0)
+        operation = registry.operations["divide"]
+        operation.reset()
+        for elapsed in [1_000] * 95 + [100_000] * 5:
+            operation.record(elapsed)
+        figures = registry.snapshot()["divide"]
+        self.assertEqual((figures["calls"], figures["errors"]), (100, 0))
+        self.assertLessEqual(1.0, figures["p50_us"])
+        self.assertLessEqual(figures["p50_us"], 1.25)
+        self.assertLessEqual(100.0, figures["p99_us"])
+        self.assertIn("divide", registry.to_text())
+        registry.enabled = False
+        divide(1, 2)
+        self.assertEqual(operation.calls, 100)
+
+    def test_actions_are_instrumented(self):
+        """
+        Tests that the menu actions and the recipe operations beneath them are recorded.
+        """
+        metrics.reset()
+        manager = RecipeManager()
+        actions = UserInterfaceActions(manager, [], output=io.StringIO())
+        with mock.patch("builtins.input", side_effect=["Soup", "leek", "Boil.", ""]):
+            actions.create_recipe()
+        with mock.patch("builtins.input", side_effect=["not a number"]), self.assertRaises(ValueError):
+            actions.delete_recipe()
+        figures = json.loads(metrics.to_json())
+        self.assertEqual(figures["action.create_recipe"]["calls"], 1)
+        self.assertEqual(figures["recipe.create"]["calls"], 1)
+        self.assertEqual(figures["action.delete_recipe"]["errors"], 1)
+
+
+class TestShardRouter(unittest.TestCase):
+    """
+    A test suite for partitioning users over worker processes.
+    """
+
+    def test_operations_are_routed_and_admin_listings_gathered(self):
+        """
+        Tests that each user's operations reach the shard that owns them, that
+        listing and counting users gathers every shard, and that only an
+        administrator may do so or delete a user.
+        """
+        emails = [f"cook{i}@example.com" for i in range(12)]
+        with ShardRouter(3, hash_cost=2 ** 4) as router:
+            results = router.request_many([({"op": "create_account", "email": email, "password": "Password123"},
+                                             None) for email in emails])
+            self.assertTrue(all(result["ok"] for result in results))
+            self.assertFalse(router.request({"op": "login", "email": emails[0], "password": "Wrong123"})["ok"])
+            self.assertTrue(router.request({"op": "login", "email": emails[0], "password": "Password123"})["ok"])
+            created = router.request({"op": "create", "title": "Soup", "ingredients": "leek",
+                                      "instructions": "Boil."}, emails[0])
+            self.assertEqual(created["id"], 1)
+            self.assertEqual(router.request({"op": "list"}, emails[0])["total"], 1)
+            self.assertEqual(router.request({"op": "list"}, emails[1])["total"], 0)
+
+            page = router.view_all_users("admin@example.com", limit=5)
+            self.assertEqual([user["email"] for user in page["users"]], sorted(emails)[:5])
+            after = router.view_all_users("admin@example.com", after=sorted(emails)[4], limit=100)
+            self.assertEqual([user["email"] for user in after["users"]], sorted(emails)[5:])
+            self.assertFalse(router.view_all_users(emails[0])["ok"])
+            self.assertFalse(router.delete_user(emails[0], emails[1])["ok"])
+            self.assertTrue(router.delete_user("admin@example.com", emails[1])["ok"])
+            self.assertEqual(router.count_users("admin@example.com")["count"], len(emails))
+            stats = router.stats()
+        self.assertEqual(len([count for count in stats["requests_per_shard"] if count]), 3)
+
+    def test_failed_shard_is_reported(self):
+        """
+        Tests that a shard failing part of a gathered operation is reported instead of merged.
+        """
+        replies = [{"op": "count_users", "ok": True, "count": 2, "admins": 1},
+                   {"op": "count_users", "ok": False, "error": "Log in first."}]
+        with ShardRouter(2, hash_cost=2 ** 4) as router, mock.patch.object(router, "scatter", return_value=replies):
+            result = router.count_users("admin@example.com")
+        self.assertEqual((result["ok"], result["shard"], result["error"]), (False, 1, "Shard 1: Log in first."))
+
+
+class TestReplicaSet(unittest.TestCase):
+    """
+    A test suite for read replicas fed from the change-event stream.
+    """
+
+    def test_followers_serve_reads_and_read_your_writes(self):
+        """
+        Tests that a follower starts from a snapshot, applies later changes in
+        order, waits for a requested sequence number before answering and
+        refuses writes.
+        """
+        registry = AccountRegistry()
+        user = User("replicated@example.com", "Password123")
+        registry.add(user)
+        user.recipe_manager.create_recipe("Soup", "leek", "Boil.")
+        with ReplicaSet(1, accounts=registry) as replicas:
+            listing = replicas.request({"op": "list"}, user.email, timeout=10)
+            self.assertEqual([recipe["title"] for recipe in listing["recipes"]], ["Soup"])
+
+            user.recipe_manager.update_recipe(1, new_title="Leek soup")
+            user.recipe_manager.create_recipe("Stew", "beef", "Simmer the beef.")
+            written = change_events.sequence
+            recipe = replicas.request({"op": "get", "id": 1}, user.email, min_sequence=written, timeout=10)
+            self.assertEqual((recipe["title"], recipe["version"]), ("Leek soup", 2))
+            self.assertGreaterEqual(recipe["sequence"], written)
+            found = replicas.request({"op": "search", "query": "beef"}, user.email, timeout=10)
+            self.assertEqual([result["title"] for result in found["results"]], ["Stew"])
+            self.assertFalse(replicas.request({"op": "create", "title": "Pie"}, user.email, timeout=10)["ok"])
+
+            registry.remove(user)
+            users = replicas.request({"op": "users", "limit": 10}, min_sequence=change_events.sequence,
+                                     timeout=10)
+            self.assertEqual(users["users"], [])
+            self.assertEqual(replicas.lag(), [0])
+
+    def test_changes_made_during_the_snapshot_are_not_lost(self):
+        """
+        Tests that more changes than the bus can buffer, made while the snapshot
+        is being taken, still all reach the followers.
+        """
+        bus = EventBus(capacity=4)
+        registry = AccountRegistry()
+        user = User("snapshot@example.com", "Password123")
+        registry.add(user)
+        user.recipe_manager.create_recipe("Soup", "leek", "Boil.")
+        body = blob_store.acquire("beef", "Simmer.")
+        self.addCleanup(blob_store.release, body)
+        take_snapshot = ReplicaSet.snapshot
+
+        def snapshot_while_writing(replicas):
+            snapshot = take_snapshot(replicas)
+            for recipe_id in range(2, 12):
+                bus.publish(RecipeCreated(user.email, recipe_id, f"Stew {recipe_id}", body))
+                bus.deliver()
+            return snapshot
+
+        with mock.patch.object(ReplicaSet, "snapshot", snapshot_while_writing), \
+                ReplicaSet(1, bus=bus, accounts=registry) as replicas:
+            listing = replicas.request({"op": "list"}, user.email, min_sequence=bus.sequence, timeout=10)
+            self.assertEqual([recipe["recipe_id"] for recipe in listing["recipes"]], list(range(1, 12)))
+
+    def test_failed_start_terminates_the_followers(self):
+        """
+        Tests that if starting fails part way, the follower processes already
+        started are stopped and the replica set stops listening to the bus.
+        """
+        bus = EventBus()
+        started = []
+
+        def failing_snapshot(replicas):
+            started.extend(replica.process for replica in replicas.replicas)
+            raise RuntimeError("snapshot failed")
+
+        replicas = ReplicaSet(2, bus=bus, accounts=AccountRegistry())
+        with mock.patch.object(ReplicaSet, "snapshot", failing_snapshot):
+            self.assertRaises(RuntimeError, replicas.start)
+        self.assertEqual(len(started), 2)
+        self.assertFalse(any(process.is_alive() for process in started))
+        self.assertEqual((replicas.replicas, replicas.subscription, bus.subscribers), ([], None, []))
+
+
+class TestSessionCache(unittest.TestCase):
+    """
+    A test suite for the session cache.
+    """
+
+    def setUp(self):
+        self.now = 0.0
+        self.sessions = SessionCache(ttl=10, max_sessions=2, clock=lambda: self.now)
+        self.user = User("someone@example.com", "Password123")
+
+    def test_sessions_expire_after_idle_ttl(self):
+        """
+        Tests that using a session extends it and an idle one expires.
+        """
+        token = self.sessions.create(self.user)
+        self.now = 8
+        self.assertIs(self.sessions.get(token), self.user)
+        self.now = 16
+        self.assertIs(self.sessions.get(token), self.user)
+        self.now = 27
+        self.assertIsNone(self.sessions.get(token))
+        self.assertEqual(self.sessions.stats(), {"hits": 2, "misses": 1, "expirations": 1,
+                                                 "evictions": 0, "active": 0})
+
+    def test_least_recently_used_session_is_evicted(self):
+        """
+        Tests that the cache never holds more than max_sessions sessions.
+        """
+        first = self.sessions.create(self.user)
+        second = self.sessions.create(self.user)
+        self.sessions.get(first)
+        self.sessions.create(self.user)
+        self.assertIsNone(self.sessions.get(second))
+        self.assertIs(self.sessions.get(first), self.user)
+        self.assertEqual(self.sessions.stats()["evictions"], 1)
+
+    def test_invalidate_user(self):
+        """
+        Tests that all of a user's sessions end together.
+        """
+        tokens = [self.sessions.create(self.user) for _ in range(2)]
+        self.assertEqual(self.sessions.invalidate_user("SOMEONE@example.com"), 2)
+        self.assertEqual([self.sessions.get(token) for token in tokens], [None, None])
+
+
+class TestRecipeApi(unittest.TestCase):
+    """
+    A test suite for the JSON API and its HTTP server.
+    """
+
+    def setUp(self):
+        self.registry = AccountRegistry([User("admin@example.com", "Password123", is_admin=True)])
+        self.api = RecipeApi(self.registry)
+        self.api.handle("POST", "/accounts", {}, b'{"email": "cook@example.com", "password": "Password123"}')
+
+    def tearDown(self):
+        self.api.close()
+
+    def request(self, method, target, email="cook@example.com", payload=None):
+        credentials = base64.b64encode(f"{email}:Password123".encode()).decode()
+        body = json.dumps(payload).encode() if payload is not None else b""
+        return self.api.handle(method, target, {"authorization": f"Basic {credentials}"}, body)
+
+    def test_account_validation(self):
+        """
+        Tests that account creation applies the same rules as the command line.
+        """
+        status, _ = self.api.handle("POST", "/accounts", {}, b'{"email": "bad", "password": "Password123"}')
+        self.assertEqual(status, 400)
+        status, _ = self.api.handle("POST", "/accounts", {}, b'{"email": "a@example.com", "password": "weak"}')
+        self.assertEqual(status, 400)
+        status, _ = self.api.handle("POST", "/accounts", {}, b'{"email": "COOK@example.com", "password": "Password123"}')
+        self.assertEqual(status, 409)
+        self.assertEqual(self.request("POST", "/login", payload={})[0], 200)
+        self.assertEqual(self.api.handle("POST", "/login", {}, b"")[0], 401)
+
+    def test_recipe_crud_and_search(self):
+        """
+        Tests creating, reading, updating, listing, searching and deleting recipes.
+        """
+        status, recipe = self.request("POST", "/recipes", payload={
+            "title": "Leek Soup", "ingredients": "leek, potato", "instructions": "Simmer the leeks."})
+        self.assertEqual((status, recipe["recipe_id"]), (201, 1))
+        self.assertEqual(self.request("POST", "/recipes", payload={"title": "No body"})[0], 400)
+        status, recipe = self.request("PATCH", "/recipes/1", payload={"title": "Potato Soup"})
+        self.assertEqual((status, recipe["title"], recipe["ingredients"]), (200, "Potato Soup", "leek, potato"))
+        self.assertEqual(self.request("GET", "/recipes?summary=1")[1],
+                         {"recipes": [{"recipe_id": 1, "title": "Potato Soup"}], "total": 1})
+        self.assertEqual(self.request("GET", "/recipes/search?q=leeks")[1]["recipes"][0]["recipe_id"], 1)
+        self.assertEqual(len(self.request("GET", "/recipes/by-ingredients?all_of=leek")[1]["recipes"]), 1)
+        self.assertEqual(self.request("GET", "/recipes/1", email="admin@example.com")[0], 404)
+        self.assertEqual(self.request("DELETE", "/recipes/1")[0], 200)
+        self.assertEqual(self.request("GET", "/recipes/1")[0], 404)
+        self.assertEqual(self.request("PUT", "/recipes")[0], 405)
+
+    def test_admin_routes(self):
+        """
+        Tests that only administrators can list and delete users.
+        """
+        self.assertEqual(self.request("GET", "/users")[0], 403)
+        status, payload = self.request("GET", "/users?limit=1", email="admin@example.com")
+        self.assertEqual((status, payload["users"][0]["email"], payload["total"]), (200, "admin@example.com", 2))
+        payload = self.request("GET", f"/users?after={payload['next']}", email="admin@example.com")[1]
+        self.assertEqual([user["email"] for user in payload["users"]], ["cook@example.com"])
+        self.assertEqual(self.request("GET", "/stats", email="admin@example.com")[1]["users"]["users"], 2)
+        self.assertEqual(self.request("DELETE", "/users/cook%40example.com", email="admin@example.com")[0], 200)
+        self.assertNotIn("cook@example.com", self.registry)
+        counts = self.request("GET", "/stats", email="admin@example.com")[1]["users"]
+        self.assertEqual((counts["users"], counts["admins"]), (1, 1))
+
+    def test_session_tokens(self):
+        """
+        Tests that a token from /login authenticates without checking the password
+        again, and stops working on logout or when the user is deleted.
+        """
+        token = self.request("POST", "/login")[1]["token"]
+        bearer = {"authorization": f"Bearer {token}"}
+        with mock.patch("password_hashing.PasswordHasher.verify", side_effect=AssertionError):
+            self.assertEqual(self.api.handle("GET", "/recipes", bearer, b"")[0], 200)
+        self.assertEqual(self.api.handle("POST", "/logout", bearer, b"")[0], 200)
+        self.assertEqual(self.api.handle("GET", "/recipes", bearer, b"")[0], 401)
+        bearer = {"authorization": f"Bearer {self.request('POST', '/login')[1]['token']}"}
+        self.request("DELETE", "/users/cook@example.com", email="admin@example.com")
+        self.assertEqual(self.api.handle("GET", "/recipes", bearer, b"")[0], 401)
+
+    def exchange(self, count, target="/login"):
+        """
+        Sends count requests over one HTTP/1.1 connection and returns each status and payload.
+        """
+        async def run():
+            server = ApiServer(self.api, port=0)
+            port = await server.start()
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            credentials = base64.b64encode(b"cook@example.com:Password123").decode()
+            responses = []
+            for _ in range(count):
+                writer.write(f"POST {target} HTTP/1.1\r\nAuthorization: Basic {credentials}\r\n"
+                             f"Content-Length: 0\r\n\r\n".encode())
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = int(head.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+                responses.append((head.split(b" ")[1], json.loads(await reader.readexactly(length))))
+            writer.close()
+            await server.stop()
+            return responses
+
+        return asyncio.run(run())
+
+    def test_keep_alive_over_http(self):
+        """
+        Tests that several requests are served over one HTTP/1.1 connection.
+        """
+        self.assertEqual([(status, payload["email"]) for status, payload in self.exchange(2)],
+                         [(b"200", "cook@example.com")] * 2)
+
+    def test_unexpected_error_is_answered_with_500(self):
+        """
+        Tests that a handler raising an unexpected exception gets a 500
+        response and the connection keeps serving requests.
+        """
+        with mock.patch.object(self.api, "handle", side_effect=[RuntimeError("boom"), (200, {"ok": True})]), \
+                mock.patch("sys.stderr", new_callable=io.StringIO):
+            responses = self.exchange(2)
+        self.assertEqual(responses, [(b"500", {"error": "Internal server error."}), (b"200", {"ok": True})])
+
 
 if __name__ == '__main__':
     unittest.main()
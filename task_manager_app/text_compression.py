@@ -0,0 +1,236 @@
+import re
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+
+DICTIONARY_SIZE = 32 * 1024
+DEFAULT_MIN_LENGTH = 64
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_TRAINING_BYTES = 256 * 1024
+# Raw deflate streams, without the zlib header and checksum, which would
+# add six bytes to every text.
+WINDOW_BITS = -15
+STEP_NUMBER = re.compile(r"^\s*\d+[.)]\s*")
+
+
+def train_dictionary(texts, size=DICTIONARY_SIZE):
+    """
+    Builds a preset dictionary for zlib from sample texts.
+
+    Instructions repeat the same steps ('Preheat the oven to 180C', 'Season to
+    taste') across recipes, so the dictionary is made of the lines that
+    recur most, with their step numbers left off, weighted by how many bytes
+    they would save. Words that recur fill what room is left. zlib refers
+    back to nearer bytes more cheaply, so the most valuable lines go last.
+
+    Args:
+        texts (Iterable[str]): The sample texts.
+        size (int, optional): The most bytes the dictionary may take. Defaults to DICTIONARY_SIZE.
+
+    Returns:
+        bytes: The dictionary, which may be empty if nothing recurs.
+    """
+    lines = Counter()
+    words = Counter()
+    for text in texts:
+        for line in text.splitlines():
+            line = STEP_NUMBER.sub("", line).strip()
+            if line:
+                lines[line] += 1
+                words.update(line.split())
+    chosen = []
+    used = 0
+    candidates = [(count * len(line), line) for line, count in lines.items() if count > 1]
+    candidates += [(count * len(word), word) for word, count in words.items() if count > 1 and len(word) > 3]
+    for _, piece in sorted(candidates, reverse=True):
+        encoded = piece.encode("utf-8")
+        if used + len(encoded) + 1 > size:
+            continue
+        chosen.append(encoded)
+        used += len(encoded) + 1
+    return b"\n".join(reversed(chosen))
+
+
+class TextCompressor:
+    """
+    Compresses long recipe texts at rest with zlib and a preset dictionary.
+
+    Texts are compressed against a dictionary of the phrases that recur in
+    the corpus, which is what makes short texts compressible at all: on its
+    own a 200-byte text barely shrinks, but most of its lines are already in
+    the dictionary. The dictionary is trained from the first texts seen once
+    compression is enabled, which are kept as they are until then; train
+    can also be called directly with a sample of the corpus.
+
+    Compressed texts are decompressed lazily when they are read, and the
+    most recently read are kept in a small LRU cache so hot recipes are only
+    decompressed once. Each compressed text starts with the number of the
+    dictionary it was compressed with, so texts compressed before a
+    dictionary was retrained can still be read.
+
+    Attributes:
+        enabled (bool): Whether new texts are compressed.
+        min_length (int): Texts shorter than this are never compressed.
+        cache_size (int): The most decompressed texts to keep.
+        training_bytes (int): How many bytes of text to sample before training a dictionary.
+        dictionaries (list[bytes]): Every dictionary trained so far; the last one is in use.
+        cache (OrderedDict[bytes, str]): Decompressed texts by key, least recently used first.
+        raw_bytes (int): The bytes of every text compressed so far.
+        packed_bytes (int): The bytes those texts were compressed to.
+        hits (int): How many reads found the text in the cache.
+        misses (int): How many reads had to decompress the text.
+        decompress_ns (int): The time spent decompressing, in nanoseconds.
+    """
+
+    def __init__(self, enabled=False, min_length=DEFAULT_MIN_LENGTH, cache_size=DEFAULT_CACHE_SIZE,
+                 training_bytes=DEFAULT_TRAINING_BYTES, level=9):
+        """
+        Initializes a new instance of TextCompressor with no dictionary.
+
+        Args:
+            enabled (bool, optional): Whether new texts are compressed. Defaults to False.
+            min_length (int, optional): Texts shorter than this are never compressed.
+             Defaults to DEFAULT_MIN_LENGTH.
+            cache_size (int, optional): The most decompressed texts to keep. Defaults to DEFAULT_CACHE_SIZE.
+            training_bytes (int, optional): How many bytes of text to sample before training
+             a dictionary. Defaults to DEFAULT_TRAINING_BYTES.
+            level (int, optional): The zlib compression level. Defaults to 9.
+        """
+        self.enabled = enabled
+        self.min_length = min_length
+        self.cache_size = cache_size
+        self.training_bytes = training_bytes
+        self.level = level
+        self.dictionaries = []
+        self.samples = []
+        self.sampled_bytes = 0
+        self.cache = OrderedDict()
+        self.raw_bytes = 0
+        self.packed_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.decompress_ns = 0
+        self.lock = threading.Lock()
+
+    def configure(self, enabled=True, cache_size=None):
+        """
+        Turns compression of new texts on or off and resizes the cache.
+
+        Args:
+            enabled (bool, optional): Whether new texts are compressed. Defaults to True.
+            cache_size (int, optional): The most decompressed texts to keep. Defaults to the current size.
+        """
+        with self.lock:
+            self.enabled = enabled
+            if cache_size is not None:
+                self.cache_size = cache_size
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+
+    @property
+    def generation(self):
+        """
+        The number of dictionaries trained so far, which changes whenever a new one is trained.
+        """
+        return len(self.dictionaries)
+
+    def train(self, texts):
+        """
+        Trains a new dictionary from sample texts and uses it for texts compressed from now on.
+
+        Args:
+            texts (Iterable[str]): A sample of the corpus.
+        """
+        dictionary = train_dictionary(texts)
+        with self.lock:
+            if len(self.dictionaries) == 255:
+                raise ValueError("Too many dictionaries have been trained.")
+            self.dictionaries.append(dictionary)
+            self.samples = []
+            self.sampled_bytes = 0
+
+    def pack(self, text):
+        """
+        Compresses a text if compression is enabled and it makes the text smaller.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            str | bytes: The compressed text, or the text itself if it was not compressed.
+        """
+        if not self.enabled or len(text) < self.min_length:
+            return text
+        if not self.dictionaries:
+            with self.lock:
+                self.samples.append(text)
+                self.sampled_bytes += len(text)
+                samples = None
+                if self.sampled_bytes >= self.training_bytes:
+                    samples, self.samples, self.sampled_bytes = self.samples, [], 0
+            if samples:
+                self.train(samples)
+            return text
+        index = len(self.dictionaries) - 1
+        encoded = text.encode("utf-8")
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, WINDOW_BITS, zdict=self.dictionaries[index])
+        packed = bytes((index,)) + compressor.compress(encoded) + compressor.flush()
+        if len(packed) >= len(encoded):
+            return text
+        with self.lock:
+            self.raw_bytes += len(encoded)
+            self.packed_bytes += len(packed)
+        return packed
+
+    def unpack(self, key, packed):
+        """
+        Returns the text of a value made by pack, from the cache if it was read recently.
+
+        Args:
+            key (Hashable): Identifies the text in the cache; it must always refer to the same text.
+            packed (str | bytes): The value returned by pack.
+
+        Returns:
+            str: The text.
+        """
+        if isinstance(packed, str):
+            return packed
+        with self.lock:
+            text = self.cache.get(key)
+            if text is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return text
+        started = time.perf_counter_ns()
+        decompressor = zlib.decompressobj(WINDOW_BITS, zdict=self.dictionaries[packed[0]])
+        text = (decompressor.decompress(packed[1:]) + decompressor.flush()).decode("utf-8")
+        elapsed = time.perf_counter_ns() - started
+        with self.lock:
+            self.misses += 1
+            self.decompress_ns += elapsed
+            if self.cache_size:
+                self.cache[key] = text
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return text
+
+    def stats(self):
+        """
+        Returns how well texts compress and what reading them costs.
+
+        Returns:
+            dict[str, float]: Whether compression is enabled, the dictionary size, the
+             bytes compressed and the ratio of raw to compressed bytes, the cache hits
+             and misses, and the mean time to decompress a text in microseconds.
+        """
+        with self.lock:
+            return {"enabled": self.enabled,
+                    "dictionary_bytes": len(self.dictionaries[-1]) if self.dictionaries else 0,
+                    "raw_bytes": self.raw_bytes, "packed_bytes": self.packed_bytes,
+                    "compression_ratio": round(self.raw_bytes / self.packed_bytes, 3) if self.packed_bytes else 1.0,
+                    "cache_hits": self.hits, "cache_misses": self.misses,
+                    "mean_decompress_us": round(self.decompress_ns / self.misses / 1000, 3) if self.misses else 0.0}
+
+
+text_compressor = TextCompressor()
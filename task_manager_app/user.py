@@ -1,6 +1,9 @@
-import hashlib
+import threading
+from password_hashing import password_hasher
 from recipe_manager import RecipeManager
+from recipe_manager_cache import recipe_manager_cache
 from globals import all_accounts
+from storage.data_access import in_memory_data_access
 
 
 class User:
@@ -15,54 +18,127 @@ class User:
     Attributes:
         email (str): The user's email address, used for identification and
                      communication.
-        password (str): The user's password, stored as a plain text string.
-                     Note: In a real-world application, passwords should be
-                     hashed and salted for security reasons.
-        password_hash (str): The hashed version of the user's password, used
+        password_hash (str): The salted scrypt hash of the user's password, used
                              for authentication purposes.
         is_admin (bool): Indicates whether the user has administrative privileges,
                          allowing access to actions only an admin can perform.
         recipe_manager (RecipeManager): An instance of RecipeManager associated
                                       with the user, allowing them to manage
-                                      their recipes.
+                                      their recipes. It is loaded from storage
+                                      the first time it is used.
+        storage (DataAccess): The backend the user's recipes are persisted to.
 
     Notes:
         - An instance of User has been created as an admin account by default,
           granting access to actions only an admin can perform.
-        - Passwords should be handled securely, ideally using hashing and salting
-          mechanisms to protect user data.
+        - Passwords are hashed with salted scrypt by the shared password_hasher,
+          and only the hash is kept; the plain text password is never stored.
     """
 
-    def __init__(self, email, password, is_admin=False):
+    def __init__(self, email, password, is_admin=False, storage=None, password_hash=None):
         """
         Initializes a new instance of User.
 
         Args:
             email (str): The user's email address.
-            password (str): The user's password.
+            password (str): The user's password, or None for an account loaded from storage.
             is_admin (bool, optional): Indicates whether the user has
              administrative privileges. Defaults to False.
+            storage (DataAccess, optional): The backend the user's recipes are
+             persisted to. Defaults to the in-memory backend.
+            password_hash (str, optional): The stored password hash. Defaults to
+             the hash of password.
         """
         self.email = email
-        self.password = password
-        self.password_hash = self.hash_password(password)
+        self.password_hash = password_hash or self.hash_password(password)
         self.is_admin = is_admin
-        self.recipe_manager = RecipeManager()  # Each user has their own RecipeManager
+        self.storage = storage or in_memory_data_access
+        self.in_memory_recipe_manager = None
+        self.lock = threading.Lock()
+
+    @property
+    def recipe_manager(self):
+        """
+        Returns the user's RecipeManager, loading it on first use.
+
+        Collections kept in a persistent backend come from the shared
+        recipe_manager_cache, which may evict them while the user is idle.
+        A collection held only in memory has nowhere to be reloaded from, so
+        it stays with the user for the user's whole lifetime.
+
+        Returns:
+            RecipeManager: The user's recipe collection.
+        """
+        if self.storage.persistent:
+            return recipe_manager_cache.get(self.email, self.storage)
+        if self.in_memory_recipe_manager is None:
+            with self.lock:
+                if self.in_memory_recipe_manager is None:
+                    self.in_memory_recipe_manager = RecipeManager(self.email, self.storage)
+        return self.in_memory_recipe_manager
+
+    def attach_storage(self, storage):
+        """
+        Moves the user's recipes to a different storage backend.
+
+        Args:
+            storage (DataAccess): The new storage backend.
+        """
+        self.recipe_manager.attach_storage(storage)
+        self.storage = storage
+        self.in_memory_recipe_manager = None
+
+    def discard_recipes(self):
+        """
+        Closes the user's in-memory recipe collection, for example after the
+        account is deleted, so the recipe bodies it shared are released.
+        """
+        with self.lock:
+            recipe_manager, self.in_memory_recipe_manager = self.in_memory_recipe_manager, None
+        if recipe_manager is not None:
+            recipe_manager.close()
+
+    @classmethod
+    def from_record(cls, email, password_hash, is_admin, storage):
+        """
+        Rebuilds a user from an account record loaded from a storage backend.
+        Only the password hash is stored, so the plain text password is None.
+
+        Args:
+            email (str): The user's email address.
+            password_hash (str): The stored password hash.
+            is_admin (bool): Whether the user has administrative privileges.
+            storage (DataAccess): The backend the record was loaded from.
+
+        Returns:
+            User: The rebuilt user.
+        """
+        return cls(email, None, is_admin, storage, password_hash=password_hash)
 
     @staticmethod
     def hash_password(password):
         """
-        Hashes a given password using SHA-256.
+        Hashes a given password using salted scrypt on the shared password_hasher's pool.
 
         Args:
             password (str): The password to hash.
 
         Returns:
-            str: The hashed password.
+            str: The hashed password, including its salt and parameters.
+        """
+        return password_hasher.hash(password)
+
+    def check_password(self, password):
+        """
+        Checks a password against the user's stored password hash.
+
+        Args:
+            password (str): The password to check.
+
+        Returns:
+            bool: True if the password is correct, False otherwise.
         """
-        password_bytes = password.encode('utf-8')
-        hash_object = hashlib.sha256(password_bytes)
-        return hash_object.hexdigest()
+        return password_hasher.verify(password, self.password_hash)
 
     def can_access(self, action):
         """
@@ -80,16 +156,6 @@ class User:
             return False
         return True
 
-    @classmethod
-    def get_all_users(cls):
-        """
-        Returns a list of all users, excluding the current user.
-        This method will work in conjunction with view_all_users
-        which will allow the admin to view all the user accounts.
-        :return: A list of all users
-        """
-        return [user for user in all_accounts if user != cls]
-
 
 admin_user = User("admin@example.com", "Password123", is_admin=True)
 all_accounts.append(admin_user)
@@ -0,0 +1,88 @@
+import threading
+
+from change_events import AccountCreated, AccountDeleted, change_events
+
+
+class UserCounts:
+    """
+    The number of registered accounts and administrators, kept up to date
+    from the change-event stream rather than read from the registry.
+
+    start counts the registry once, while holding every shard's read lock so
+    that no account is being added or removed, and notes the bus's sequence
+    number at that moment. It then subscribes from that sequence number, so
+    the changes published since are applied exactly once, and from then on
+    each AccountCreated and AccountDeleted event adjusts the counts.
+
+    Attributes:
+        accounts (AccountRegistry): The registry the counts start from.
+        bus (EventBus): The stream the changes are read from.
+        users (int): How many accounts are registered.
+        admins (int): How many of them are administrators.
+        sequence (int): The sequence number of the last change applied.
+    """
+
+    def __init__(self, accounts, bus=change_events):
+        """
+        Initializes a new instance of UserCounts. The counts are taken by start.
+
+        Args:
+            accounts (AccountRegistry): The registry to count.
+            bus (EventBus, optional): The stream to read changes from. Defaults to change_events.
+        """
+        self.accounts = accounts
+        self.bus = bus
+        self.users = 0
+        self.admins = 0
+        self.sequence = 0
+        self.subscription = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """
+        Counts the registry and subscribes to the changes made since.
+
+        Returns:
+            UserCounts: The counts, for chaining.
+        """
+        for lock in self.accounts.locks:
+            lock.acquire_read()
+        try:
+            self.users = self.accounts.count()
+            self.admins = self.accounts.admin_count
+            self.sequence = self.bus.sequence
+        finally:
+            for lock in self.accounts.locks:
+                lock.release_read()
+        self.subscription = self.bus.subscribe(self.apply, types=(AccountCreated, AccountDeleted),
+                                               after=self.sequence)
+        return self
+
+    def close(self):
+        """
+        Stops following the stream; the counts stay as they were.
+        """
+        if self.subscription is not None:
+            self.subscription.close()
+            self.subscription = None
+
+    def apply(self, event):
+        """
+        Adjusts the counts for an account change; called by the bus.
+        """
+        change = 1 if isinstance(event, AccountCreated) else -1
+        with self.lock:
+            self.users += change
+            if event.is_admin:
+                self.admins += change
+            self.sequence = event.sequence
+
+    def stats(self):
+        """
+        Returns the counts.
+
+        Returns:
+            dict[str, int]: The accounts, the administrators and the sequence number they are up to date with.
+        """
+        with self.lock:
+            return {"users": self.users, "admins": self.admins, "sequence": self.sequence}
@@ -1,3 +1,4 @@
+from console import standard_console
 from user_interface_manager import UserInterfaceManager
 from user_interface_actions import UserInterfaceActions
 
@@ -13,18 +14,21 @@ class UserInterface:
            encapsulating the available actions and their implementations.
            user_interface_manager (UserInterfaceManager): An instance of
            UserInterfaceManager, responsible for displaying menus and handling user choices.
+           console (Console): Where prompts are read and messages written.
     """
 
-    def __init__(self, user):
+    def __init__(self, user, console=None):
         """
         Initializes a new instance of UserInterface.
 
         Args:
             user (User): The user instance for whom the interface is being created.
+            console (Console, optional): Where to prompt and write messages. Defaults to the terminal.
         """
         self.user = user
-        self.options = UserInterfaceActions(user.recipe_manager, [user])
-        self.user_interface_manager = UserInterfaceManager()
+        self.console = console or standard_console
+        self.options = UserInterfaceActions(user.recipe_manager, [user], console=self.console)
+        self.user_interface_manager = UserInterfaceManager(self.console)
 
     def login(self, email, password):
         """
@@ -32,12 +36,12 @@ class UserInterface:
         Returns the user object upon successful login, allowing for further operations.
         """
         # Logic to authenticate the user
-        if email == self.user.email and password == self.user.password:
+        if email == self.user.email and self.user.check_password(password):
             # Perform login action
-            print("Login successful.")
+            self.console.write("Login successful.")
             return self.user  # Return the user object for further operations
         else:
-            print("Login failed.")
+            self.console.write("Login failed.")
             return None  # Return None for failed login
 
     def run(self):
@@ -60,19 +64,29 @@ class UserInterface:
                 elif user_choice == 4:
                     self.options.delete_recipe()
                 elif user_choice == 5:
-                    print("Exiting...")
+                    self.console.write("Exiting...")
                     break
                 elif user_choice == 6:
                     if self.user is not None:
                         self.options.view_all_users(self.user)
                     else:
-                        print("You must be logged in to view all users.")
+                        self.console.write("You must be logged in to view all users.")
                 elif user_choice == 7:
                     if self.user is not None:
                         self.options.delete_user(self.user)
                     else:
-                        print("You must be logged in to delete a user.")
+                        self.console.write("You must be logged in to delete a user.")
+                elif user_choice == 8:
+                    self.options.find_recipes_by_ingredients()
+                elif user_choice == 9:
+                    self.options.search_recipes()
+                elif user_choice == 10:
+                    self.options.recipe_history()
+                elif user_choice == 11:
+                    self.options.compare_recipe_versions()
+                elif user_choice == 12:
+                    self.options.revert_recipe()
                 else:
-                    print("Invalid choice. Try again.")
+                    self.console.write("Invalid choice. Try again.")
             except ValueError:
-                print("Please ensure you enter the relevant number to represent your choice.")
+                self.console.write("Please ensure you enter the relevant number to represent your choice.")
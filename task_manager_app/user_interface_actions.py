@@ -1,5 +1,9 @@
+import datetime
+import sys
+
+from console import standard_console
 from input_utils import InputUtils
-from user import User
+from metrics import metrics
 from globals import all_accounts
 
 
@@ -16,9 +20,12 @@ class UserInterfaceActions:
         deleting other users.
         input_utils_instance (InputUtils): An instance of InputUtils, providing
         utility functions for user input validation and formatting.
+        page_size (int): How many recipes read_recipes shows per page.
+        output (file): Where recipe listings are written, or None for the console's output.
+        console (Console): Where prompts are read and messages written.
     """
 
-    def __init__(self, recipe_manager, user_accounts):
+    def __init__(self, recipe_manager, user_accounts, page_size=20, output=None, console=None):
         """
         Initializes a new instance of UserInterfaceActions with the
         specified RecipeManager and list of users.
@@ -28,11 +35,18 @@ class UserInterfaceActions:
             associated with the user, allowing for recipe management functionalities.
             user_accounts (list[User]): A list of User instances, representing
             all users in the system, used for administrative actions.
+            page_size (int, optional): How many recipes to show per page. Defaults to 20.
+            output (file, optional): Where to write recipe listings. Defaults to the console's output.
+            console (Console, optional): Where to prompt and write messages. Defaults to the terminal.
         """
         self.recipe_manager = recipe_manager
         self.user_accounts = user_accounts
         self.input_utils_instance = InputUtils()
+        self.page_size = page_size
+        self.output = output
+        self.console = console or standard_console
 
+    @metrics.timed("action.create_recipe")
     def create_recipe(self):
         """
         Prompts the user to input details for a new recipe and adds it to the collection.
@@ -46,35 +60,59 @@ class UserInterfaceActions:
         :rtype: None
         """
         title = self.input_utils_instance.get_non_blank_input_and_or_multiline("Enter recipe title: ",
-                                                                               "Please ensure you enter a title")
+                                                                               "Please ensure you enter a title",
+                                                                               console=self.console)
         ingredients = self.input_utils_instance.get_non_blank_input_and_or_multiline(
             "Enter ingredients (separate each ingredient with a comma): ",
-            "Please ensure you enter ingredients.")
+            "Please ensure you enter ingredients.", console=self.console)
         instructions = self.input_utils_instance.get_non_blank_input_and_or_multiline('''
         Please enter your instructions line by line.
         Once you are done, enter an empty line to finish: 
         Example: 
         1. Chop onions
         2. Peel potatoes
-        ''', "Please ensure you enter instructions", multiline=True)
-        self.recipe_manager.perform_create_recipe(title, ingredients, instructions)
+        ''', "Please ensure you enter instructions", multiline=True, console=self.console)
+        self.recipe_manager.perform_create_recipe(title, ingredients, instructions, console=self.console)
 
+    @metrics.timed("action.read_recipes")
     def read_recipes(self):
         """
-        Displays all recipes managed by the user, providing
+        Displays the recipes managed by the user a page at a time, providing
         a comprehensive view of their recipe collection.
 
-        This method lists all recipes associated with the user,
-        including their titles, ingredients, and instructions,
-        allowing users to easily review their recipes.
+        The user can choose to see only the ID and title of each recipe, and
+        moves between pages with 'n' (next) and 'p' (previous); any other
+        entry stops the listing.
 
         Returns:
             None
         """
-        if not self.recipe_manager.recipes:
-            print("\033[1m" + "There are no recipes to display" + "\033[0m")
-        self.recipe_manager.perform_read_recipes()
+        if not len(self.recipe_manager):
+            self.console.write("\033[1m" + "There are no recipes to display" + "\033[0m")
+            return
+        summary = self.input_utils_instance.get_yes_no_input(
+            "Show only recipe IDs and titles? (yes/no): ", console=self.console) == "yes"
+        output = self.output or self.console.output or sys.stdout
+        page_count = (len(self.recipe_manager) + self.page_size - 1) // self.page_size
+        page = 0
+        while True:
+            output.write("\033[1m" + f"Favourite recipes (page {page + 1} of {page_count}): " + "\033[0m\n")
+            self.recipe_manager.write_recipes(output, offset=page * self.page_size,
+                                              limit=self.page_size, summary=summary)
+            output.write("\n")
+            output.flush()
+            if page_count == 1:
+                return
+            choice = self.console.read("Enter 'n' for the next page, 'p' for the previous page "
+                                       "or anything else to stop: ").strip().lower()
+            if choice == "n" and page + 1 < page_count:
+                page += 1
+            elif choice == "p" and page > 0:
+                page -= 1
+            elif choice not in ("n", "p"):
+                return
 
+    @metrics.timed("action.update_recipe")
     def update_recipe(self):
         """
         Enables the user to update the details of an existing recipe,
@@ -89,44 +127,49 @@ class UserInterfaceActions:
         Returns:
             None
         """
-        if not self.recipe_manager.recipes:
-            print("\033[1m" + "There are no recipes to update" + "\033[0m")
+        if not len(self.recipe_manager):
+            self.console.write("\033[1m" + "There are no recipes to update" + "\033[0m")
             return
         try:
-            recipe_id = int(input("Enter the ID of the recipe to update: "))
-            if not any(recipe.recipe_id == recipe_id for recipe in self.recipe_manager.recipes):
-                print(f"Recipe with ID: {recipe_id} not found.\n")
+            recipe_id = int(self.console.read("Enter the ID of the recipe to update: "))
+            recipe = self.recipe_manager.get(recipe_id)
+            if recipe is None:
+                self.console.write(f"Recipe with ID: {recipe_id} not found.\n")
                 return
+            version = recipe.version
 
             title_change = self.input_utils_instance.get_yes_no_input(
-                "Would you like to change the title? (yes/no): ")
+                "Would you like to change the title? (yes/no): ", console=self.console)
             new_title = (
                 self.input_utils_instance.get_non_blank_input_and_or_multiline(
                     "Enter a new title: ",
-                    "Please input a valid title."
+                    "Please input a valid title.",
+                    console=self.console
                 )
                 if title_change == "yes"
                 else None
             )
             ingredients_change = self.input_utils_instance.get_yes_no_input(
-                "Would you like to change the ingredients? (yes/no): ")
+                "Would you like to change the ingredients? (yes/no): ", console=self.console)
             new_ingredients = (self.input_utils_instance.get_non_blank_input_and_or_multiline
                                ("Enter new ingredients: ",
-                                "Please input a valid title.")) \
+                                "Please input a valid title.", console=self.console)) \
                 if ingredients_change == "yes" else None
 
             instructions_change = (self.input_utils_instance.get_yes_no_input
-                                   ("Would you like to change the instructions? (yes/no): "))
+                                   ("Would you like to change the instructions? (yes/no): ", console=self.console))
             new_instructions = self.input_utils_instance.get_non_blank_input_and_or_multiline(
                 "Enter new instructions line by line."
                 " Enter an empty line to finish updating your instructions: ",
-                "Please ensure you enter instructions", multiline=True) \
+                "Please ensure you enter instructions", multiline=True, console=self.console) \
                 if instructions_change == "yes" else None
 
-            self.recipe_manager.perform_update_recipe(recipe_id, new_title, new_ingredients, new_instructions)
+            self.recipe_manager.perform_update_recipe(recipe_id, new_title, new_ingredients, new_instructions,
+                                                      expected_version=version, console=self.console)
         except ValueError:
-            print("Please enter a valid recipe ID.")
+            self.console.write("Please enter a valid recipe ID.")
 
+    @metrics.timed("action.delete_recipe")
     def delete_recipe(self):
         """
         Allows the user to delete a recipe from their collection,
@@ -141,29 +184,168 @@ class UserInterfaceActions:
         Returns:
             None
         """
-        if not self.recipe_manager.recipes:
-            print("\033[1m" + "There are no recipes to delete" + "\033[0m")
+        if not len(self.recipe_manager):
+            self.console.write("\033[1m" + "There are no recipes to delete" + "\033[0m")
             return
-        recipe_id = int(input("Enter recipe ID to delete: "))
+        recipe_id = int(self.console.read("Enter recipe ID to delete: "))
 
         # Confirm deletion with the user before attempting to delete
-        confirm_deletion = InputUtils.get_yes_no_input("Are you sure you want to delete this recipe? (yes/no): ")
+        confirm_deletion = InputUtils.get_yes_no_input("Are you sure you want to delete this recipe? (yes/no): ",
+                                                       console=self.console)
         if confirm_deletion == 'no':
-            print("Deletion cancelled.")
+            self.console.write("Deletion cancelled.")
             return
 
         # Proceed with deletion only if confirmed
-        result = self.recipe_manager.perform_delete_recipe(recipe_id)
+        result = self.recipe_manager.perform_delete_recipe(recipe_id, console=self.console)
         if result:
-            print(f"Recipe with ID {recipe_id} deleted successfully!\n")
+            self.console.write(f"Recipe with ID {recipe_id} deleted successfully!\n")
+
+    @metrics.timed("action.find_recipes_by_ingredients")
+    def find_recipes_by_ingredients(self):
+        """
+        Finds the user's recipes by ingredient. The user may list ingredients
+        that every recipe must use, ingredients of which a recipe must use at
+        least one, and ingredients a recipe must not use; any of the three may
+        be left blank.
+
+        Returns:
+            None
+        """
+        if not len(self.recipe_manager):
+            self.console.write("\033[1m" + "There are no recipes to search" + "\033[0m")
+            return
+        self.console.write("Separate each ingredient with a comma, or leave blank to skip.")
+        all_of = self.console.read("Ingredients the recipe must use: ").split(",")
+        any_of = self.console.read("Ingredients the recipe should use at least one of: ").split(",")
+        none_of = self.console.read("Ingredients the recipe must not use: ").split(",")
+        if not any(ingredient.strip() for ingredient in all_of + any_of + none_of):
+            self.console.write("Please enter at least one ingredient.")
+            return
+        matches = self.recipe_manager.find_by_ingredients(all_of, any_of, none_of)
+        if not matches:
+            self.console.write("No recipes match those ingredients.\n")
+            return
+        self.console.write("\033[1m" + "Matching recipes: " + "\033[0m")
+        for recipe in matches:
+            self.console.write(f"ID: {recipe.recipe_id}, Title: {recipe.title}, Ingredients: {recipe.ingredients}")
+        self.console.write()
+
+    @metrics.timed("action.search_recipes")
+    def search_recipes(self):
+        """
+        Searches the titles and instructions of the user's recipes and shows
+        the best matches first. Misspelled words still find similar words,
+        and words in double quotes must appear together as a phrase.
+
+        Returns:
+            None
+        """
+        if not len(self.recipe_manager):
+            self.console.write("\033[1m" + "There are no recipes to search" + "\033[0m")
+            return
+        query = self.input_utils_instance.get_non_blank_input_and_or_multiline(
+            "Enter words to search for: ", "Please enter something to search for.", console=self.console)
+        results = self.recipe_manager.search(query)
+        if not results:
+            self.console.write("No recipes match your search.\n")
+            return
+        self.console.write("\033[1m" + "Best matches: " + "\033[0m")
+        for recipe, score in results:
+            self.console.write(f"ID: {recipe.recipe_id}, Title: {recipe.title} (score {score:.2f})")
+        self.console.write()
+
+    @metrics.timed("action.recipe_history")
+    def recipe_history(self):
+        """
+        Lists the versions of a recipe that are kept, with when each one was
+        replaced, so the user can pick one to compare or revert to.
+
+        Returns:
+            None
+        """
+        if not len(self.recipe_manager):
+            self.console.write("\033[1m" + "There are no recipes to show the history of" + "\033[0m")
+            return
+        try:
+            recipe_id = int(self.console.read("Enter the ID of the recipe: "))
+        except ValueError:
+            self.console.write("Please enter a valid recipe ID.")
+            return
+        versions = self.recipe_manager.recipe_versions(recipe_id)
+        if versions is None:
+            self.console.write(f"Recipe with ID: {recipe_id} not found.\n")
+            return
+        self.console.write("\033[1m" + "Versions: " + "\033[0m")
+        for version, saved_at in versions:
+            when = "current" if saved_at is None else \
+                "replaced " + datetime.datetime.fromtimestamp(saved_at).strftime("%Y-%m-%d %H:%M")
+            self.console.write(f"Version {version} ({when})")
+        self.console.write()
+
+    @metrics.timed("action.compare_recipe_versions")
+    def compare_recipe_versions(self):
+        """
+        Shows what changed in a recipe between an earlier version and the
+        current one, as a unified diff.
+
+        Returns:
+            None
+        """
+        if not len(self.recipe_manager):
+            self.console.write("\033[1m" + "There are no recipes to compare" + "\033[0m")
+            return
+        try:
+            recipe_id = int(self.console.read("Enter the ID of the recipe: "))
+            version = int(self.console.read("Enter the version to compare with the current one: "))
+        except ValueError:
+            self.console.write("Please enter a valid number.")
+            return
+        diff = self.recipe_manager.diff_versions(recipe_id, version)
+        if diff is None:
+            self.console.write(f"Version {version} of the recipe with ID: {recipe_id} was not found.\n")
+        elif not diff:
+            self.console.write("The two versions are the same.\n")
+        else:
+            self.console.write("".join(diff))
+
+    @metrics.timed("action.revert_recipe")
+    def revert_recipe(self):
+        """
+        Restores an earlier version of a recipe after asking the user to
+        confirm. The current version stays in the history, so the revert can
+        be undone in the same way.
 
+        Returns:
+            None
+        """
+        if not len(self.recipe_manager):
+            self.console.write("\033[1m" + "There are no recipes to revert" + "\033[0m")
+            return
+        try:
+            recipe_id = int(self.console.read("Enter the ID of the recipe to revert: "))
+            version = int(self.console.read("Enter the version to restore: "))
+        except ValueError:
+            self.console.write("Please enter a valid number.")
+            return
+        confirm = InputUtils.get_yes_no_input(f"Are you sure you want to restore version {version}? (yes/no): ",
+                                              console=self.console)
+        if confirm == "no":
+            self.console.write("Revert cancelled.")
+            return
+        self.recipe_manager.perform_revert_recipe(recipe_id, version, console=self.console)
+
+    @metrics.timed("action.view_all_users")
     def view_all_users(self, current_user):
         """
         Displays all users in the system, excluding the current user,
         for administrative purposes.
 
-        This method lists all users in the system, excluding the currently
-        logged-in user, allowing administrators to view and manage other users.
+        This method lists the users in the system a page at a time in email
+        order, excluding the currently logged-in user, allowing administrators
+        to view and manage other users. The listing can be narrowed to emails
+        starting with a prefix or to one domain, and the totals shown come
+        from counts the registry maintains rather than from a scan.
 
         Args:
             current_user (User): The currently logged-in user, used to exclude
@@ -172,13 +354,34 @@ class UserInterfaceActions:
         Returns:
             None
         """
-        if current_user is not None and current_user.can_access("view_all_users"):
-            print("All users:")
-            for account in User.get_all_users():
-                print(f"Email: {account.email}, Admin: {account.is_admin}")
-        else:
-            print("You do not have permission to view all users.")
+        if current_user is None or not current_user.can_access("view_all_users"):
+            self.console.write("You do not have permission to view all users.")
+            return
+        self.console.write(f"{len(all_accounts)} users, of which {all_accounts.admin_count} are administrators.")
+        search = self.console.read("Filter by email prefix, or @domain for one domain "
+                                   "(leave blank for all users): ").strip().lower()
+        prefix, domain = ("", search[1:]) if search.startswith("@") else (search, None)
+        if search:
+            self.console.write(f"{all_accounts.count(prefix, domain)} users match '{search}'.")
+        cursors = [None]
+        while True:
+            page = all_accounts.page(cursors[-1], self.page_size, prefix, domain, exclude=current_user.email)
+            self.console.write(f"All users (page {len(cursors)}):")
+            for account in page:
+                self.console.write(f"Email: {account.email}, Admin: {account.is_admin}")
+            has_next = len(page) == self.page_size
+            if not has_next and len(cursors) == 1:
+                return
+            choice = self.console.read("Enter 'n' for the next page, 'p' for the previous page "
+                                       "or anything else to stop: ").strip().lower()
+            if choice == "n" and has_next:
+                cursors.append(page[-1].email)
+            elif choice == "p" and len(cursors) > 1:
+                cursors.pop()
+            elif choice not in ("n", "p"):
+                return
 
+    @metrics.timed("action.delete_user")
     def delete_user(self, current_user):
         """
         Allows the user to delete another user from the system,
@@ -194,20 +397,17 @@ class UserInterfaceActions:
             None
         """
         if current_user is not None and current_user.can_access("delete_user"):
-            email_to_delete = input("Enter the email of the user to delete: ").strip()
-            for account in all_accounts:
-                if account.email == email_to_delete:
-                    confirmation = InputUtils.get_yes_no_input("Are you certain you want to delete? (yes/no): ")
-                    while True:
-                        if confirmation == "yes":
-                            all_accounts.remove(account)  # Directly remove the user from the all_accounts list
-                            print(f"User {email_to_delete} deleted successfully.")
-                            return
-                        elif confirmation == "no":
-                            print("You have changed your mind")
-                            break
-                        else:
-                            print("Please ensure you type 'yes' or 'no'")
-
+            email_to_delete = self.console.read("Enter the email of the user to delete: ").strip()
+            account = all_accounts.get(email_to_delete)
+            if account is None:
+                self.console.write(f"User {email_to_delete} not found.")
+                return
+            confirmation = InputUtils.get_yes_no_input("Are you certain you want to delete? (yes/no): ",
+                                                       console=self.console)
+            if confirmation == "yes":
+                all_accounts.remove(account)
+                self.console.write(f"User {email_to_delete} deleted successfully.")
+            else:
+                self.console.write("You have changed your mind")
         else:
-            print("You do not have permission to delete a user.")
+            self.console.write("You do not have permission to delete a user.")
@@ -1,5 +1,7 @@
+from console import standard_console
 from input_utils import InputUtils
 from globals import all_accounts
+from metrics import metrics
 from user import User
 
 
@@ -9,18 +11,26 @@ class UserInterfaceManager:
     providing a menu-driven interface for users to interact with the system.
 
     Attributes:
-        all_accounts (list[User]): A list of User instances representing all
-        accounts in the system, used for account management and authentication.
+        all_accounts (AccountRegistry): The registry of all accounts in the
+        system, used for account management and authentication.
+        highest_choice (int): The number of the last option on the menu.
+        console (Console): Where prompts are read and messages written.
     """
 
-    def __init__(self):
+    highest_choice = 12
+
+    def __init__(self, console=None):
         """
         Initializes a new instance of UserInterfaceManager.
 
         The constructor assumes that `all_accounts` is accessible globally
         or passed as an argument, representing all accounts in the system.
+
+        Args:
+            console (Console, optional): Where to prompt and write messages. Defaults to the terminal.
         """
         self.all_accounts = all_accounts
+        self.console = console or standard_console
 
     def display_menu(self):
         """
@@ -30,14 +40,19 @@ class UserInterfaceManager:
         This method prints the available options to the console, allowing
         the user to select an action.
         """
-        print("\nMenu:")
-        print("1. Create a new recipe")
-        print("2. Read all recipes")
-        print("3. Update a recipe")
-        print("4. Delete a recipe")
-        print("5. Log out and exit")
-        print("6. View all users (Admin only)")
-        print("7. Delete a user (Admin only)")
+        self.console.write("\nMenu:")
+        self.console.write("1. Create a new recipe")
+        self.console.write("2. Read all recipes")
+        self.console.write("3. Update a recipe")
+        self.console.write("4. Delete a recipe")
+        self.console.write("5. Log out and exit")
+        self.console.write("6. View all users (Admin only)")
+        self.console.write("7. Delete a user (Admin only)")
+        self.console.write("8. Find recipes by ingredients")
+        self.console.write("9. Search recipes")
+        self.console.write("10. Show the versions of a recipe")
+        self.console.write("11. Compare a recipe with an earlier version")
+        self.console.write("12. Revert a recipe to an earlier version")
 
     def get_user_choice(self):
         """
@@ -45,21 +60,22 @@ class UserInterfaceManager:
         displayed menu and validates the input.
 
         This method repeatedly asks the user for their choice
-        until a valid integer between 1 and 7 is entered.
+        until a valid integer between 1 and highest_choice is entered.
 
         Returns:
             int: The user's choice as an integer.
         """
         while True:
             try:
-                user_choice = int(input("Enter your choice: "))
-                if 1 <= user_choice <= 7:
+                user_choice = int(self.console.read("Enter your choice: "))
+                if 1 <= user_choice <= self.highest_choice:
                     return user_choice
                 else:
-                    print("Invalid choice. Please enter a number between 1 and 7.")
+                    self.console.write(f"Invalid choice. Please enter a number between 1 and {self.highest_choice}.")
             except ValueError:
-                print("Invalid input. Please enter a number.")
+                self.console.write("Invalid input. Please enter a number.")
 
+    @metrics.timed("action.create_account")
     def create_account(self):
         """
         Creates a new user account by prompting the user for an email address and password.
@@ -70,32 +86,27 @@ class UserInterfaceManager:
         Returns:
             bool: True if the account was created successfully, False otherwise.
         """
-        email = InputUtils.get_email_address()
-        print("Password must contain:\n - One uppercase letter\n"
-              " - One lowercase letter\n - One digit\n - Minimum 8 "
-              "characters long.")
-        password = InputUtils.get_password()
+        email = InputUtils.get_email_address(self.console)
+        self.console.write("Password must contain:\n - One uppercase letter\n"
+                           " - One lowercase letter\n - One digit\n - Minimum 8 "
+                           "characters long.")
+        password = InputUtils.get_password(self.console)
         if not email or not password:
-            print("Email and password are required.")
+            self.console.write("Email and password are required.")
             return False
-        if any(account.email == email for account in self.all_accounts):
-            print("Email already exists.")
+        if email in self.all_accounts:
+            self.console.write("Email already exists.")
             return False
-        self.all_accounts.append(User(email, password))
-        print("Account created successfully.")
+        self.all_accounts.add(User(email, password, storage=self.all_accounts.storage))
+        self.console.write("Account created successfully.")
         return True
 
-    @staticmethod
-    def display_menu_and_get_choice():
+    def display_menu_and_get_choice(self):
         """
         Displays the main menu and prompts the user to make a selection.
 
-        This static method creates a temporary instance of UserInterfaceManager
-        to display the menu and get the user's choice.
-
         Returns:
             int: The user's choice as an integer.
         """
-        user_interface_manager = UserInterfaceManager()
-        user_interface_manager.display_menu()
-        return user_interface_manager.get_user_choice()
+        self.display_menu()
+        return self.get_user_choice()